@@ -0,0 +1,34 @@
+"""
+Сборка статики web-интерфейса для отдачи с долгим кэшем.
+
+Ресурсы копируются под именами с хэшем содержимого, ссылки в HTML
+переписываются, рядом с текстовыми файлами кладутся .gz (и .br, если
+установлен пакет brotli). Сервер отдает собранный каталог, если он есть
+(STATIC_BUILD_DIR, по умолчанию static_build), иначе — исходный static/.
+
+Запуск:
+    python build_static.py
+    python build_static.py --source static --target static_build
+"""
+import argparse
+import sys
+
+from packaging_pricing.static_assets import brotli, build_assets
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", default="static", help="Исходный каталог статики")
+    parser.add_argument("--target", default="static_build", help="Каталог сборки (пересоздается)")
+    args = parser.parse_args(argv)
+
+    manifest = build_assets(args.source, args.target)
+    for name, hashed in manifest.items():
+        print(f"{name} -> {hashed}")
+    if brotli is None:
+        print("brotli не установлен: собраны только .gz", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
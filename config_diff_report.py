@@ -0,0 +1,80 @@
+"""
+Отчет о влиянии нового конфига на книгу заказов перед публикацией.
+
+Каждый заказ считается по текущему конфигу и по кандидату в одном проходе;
+отчет отсортирован по абсолютному изменению цены (сначала заказы, которые
+один из конфигов не может посчитать), плюс итоговая статистика.
+Книга читается блоками, строки сортируются внешней сортировкой через временные
+файлы, поэтому память не зависит от размера книги (1M строк и больше).
+
+Книга: CSV с заголовком из имен колонок пакета (product_type;width;fold;...;
+is_wicket;glue_tape;dead_tape;euroslot), разделитель ';' или ','; или JSON lines
+в формате OrderInput (.jsonl).
+
+Запуск:
+    python config_diff_report.py orders.csv --candidate new_config.yaml --output diff.csv
+    python config_diff_report.py orders.jsonl --current config.json --candidate new.json --output diff.xlsx --stats stats.json
+"""
+import argparse
+import json
+import sys
+
+from packaging_pricing.config_diff import ConfigDiff, iter_order_file
+from packaging_pricing.config_source import load_config_file
+from packaging_pricing.defaults import DEFAULT_CONFIG
+from packaging_pricing.prepared import PreparedConfig
+from packaging_pricing.scraps import TableBasedScrapProvider
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("orders", help="Книга заказов (CSV или JSON lines)")
+    parser.add_argument("--candidate", required=True, help="Конфиг-кандидат (JSON/YAML)")
+    parser.add_argument("--current", help="Текущий конфиг (по умолчанию — встроенный DEFAULT_CONFIG)")
+    parser.add_argument("--output", required=True, help="Отчет: .csv или .xlsx")
+    parser.add_argument("--stats", help="Файл для итоговой статистики (JSON)")
+    parser.add_argument("--chunk-rows", type=int, default=50_000, help="Строк в блоке (память ~ блок)")
+    parser.add_argument("--tmpdir", help="Каталог для временных серий сортировки")
+    args = parser.parse_args(argv)
+
+    if args.current:
+        current_config = load_config_file(args.current)
+    else:
+        current_config = DEFAULT_CONFIG
+    candidate_config = load_config_file(args.candidate)
+
+    # Общий провайдер брака: норма брака считается один раз на строку для обоих конфигов
+    provider = TableBasedScrapProvider()
+    current = PreparedConfig(current_config, provider)
+    candidate = PreparedConfig(candidate_config, provider)
+
+    with ConfigDiff(current, candidate, tmpdir=args.tmpdir) as diff:
+        for columns in iter_order_file(args.orders, chunk_rows=args.chunk_rows):
+            diff.add(columns)
+            print(f"\rСтрок: {diff.rows}", end="", file=sys.stderr)
+        print(file=sys.stderr)
+
+        with open(args.output, "wb") as out:
+            if args.output.lower().endswith(".xlsx"):
+                diff.write_xlsx(out)
+            else:
+                diff.write_csv(out)
+        stats = diff.stats()
+
+    print(f"Строк: {stats['rows']}, с ошибками: {stats['invalid']}, посчитано: {stats['priced']}")
+    print(f"Цена изменилась: {stats['final_price_changed']} "
+          f"(выросла {stats['final_price_increased']}, снизилась {stats['final_price_decreased']})")
+    print(f"Выручка по книге: {stats['revenue_current']:,.2f} -> {stats['revenue_candidate']:,.2f}")
+    print("Изменение цены, %:")
+    for bucket, count in stats['final_price_change_percent'].items():
+        print(f"  {bucket:>10}: {count}")
+    print(f"Отчет записан в {args.output}")
+
+    if args.stats:
+        with open(args.stats, "w", encoding="utf-8") as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,324 @@
+"""
+Нагрузочное тестирование API калькулятора (локально, без внешних сервисов).
+
+Поднимает server.py под uvicorn с заданным числом воркеров и воспроизводит
+смесь запросов от имитатора ERP: /api/calculate, /api/preview_table,
+обновления /api/config и /api/export_excel. Запросы отправляются по открытой
+схеме (open-loop): моменты отправки задаются расписанием с целевым RPS и не
+ждут ответов на предыдущие запросы, поэтому задержка считается от
+запланированного момента и не занижается при перегрузке сервера.
+
+Запуск:
+    python loadtest.py --workers 4 --rps 200 --duration 60 --output loadtest_results.json
+    python loadtest.py --url http://127.0.0.1:8000 --rps 50     # уже запущенный сервер
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+DEFAULT_MIX = "calculate=55,preview=25,export=15,config=5"
+
+ENDPOINTS = {
+    "calculate": ("POST", "/api/calculate"),
+    "preview": ("POST", "/api/preview_table"),
+    "export": ("POST", "/api/export_excel"),
+    "config": ("POST", "/api/config"),
+}
+
+
+class ErpClientStub:
+    """
+    Имитатор ERP: генерирует реалистичные заказы и правки конфига.
+    Тиражи распределены по всем ступеням таблицы брака, часть заказов повторяется
+    (как у ERP с ретраями и у менеджеров, пересчитывающих один и тот же заказ).
+    """
+    PRINT_SCHEMES = ["б/печати", "1+0", "2+0", "4+0", "4+4"]
+
+    def __init__(self, seed: int = 42, repeat_share: float = 0.3):
+        self.rng = random.Random(seed)
+        self.repeat_share = repeat_share
+        self.recent: List[dict] = []
+
+    def order(self) -> dict:
+        if self.recent and self.rng.random() < self.repeat_share:
+            return self.rng.choice(self.recent)
+
+        rng = self.rng
+        is_wicket = rng.random() < 0.25
+        glue = not is_wicket and rng.random() < 0.3
+        dead = not is_wicket and not glue and rng.random() < 0.1
+        euroslot = None if is_wicket or rng.random() < 0.8 else rng.choice(["pvd", "bopp"])
+        order = {
+            "product_type": rng.choice(["BOPP", "CPP"]),
+            "width": rng.choice([8, 10, 12, 15, 18, 20, 22, 25, 28, 30, 35, 40]),
+            "fold": rng.choice([0, 0, 0, 3, 5]),
+            "length": rng.choice([15, 20, 25, 30, 35, 40, 50]),
+            "flap": rng.choice([0, 3, 4, 5]),
+            "thickness": rng.choice([20, 25, 30, 35, 40, 50]),
+            # Лог-равномерно от 5 тыс. до 1 млн: попадает во все ступени брака
+            "quantity": int(10 ** rng.uniform(3.7, 6.0)),
+            "print_scheme": rng.choice(self.PRINT_SCHEMES),
+            "features": {
+                "is_wicket": is_wicket,
+                "glue_tape": glue,
+                "dead_tape": dead,
+                "euroslot": euroslot,
+                "clips": is_wicket,
+            },
+        }
+        self.recent.append(order)
+        if len(self.recent) > 200:
+            self.recent.pop(0)
+        return order
+
+    def config_update(self, base: dict) -> dict:
+        """Экономист правит цену сырья на несколько процентов."""
+        config = dict(base)
+        for key in ("material_price_bopp", "material_price_cpp"):
+            config[key] = round(base[key] * self.rng.uniform(0.95, 1.05), 2)
+        return config
+
+
+class Recorder:
+    """Потокобезопасный сбор замеров по эндпоинтам."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[Tuple[float, float, int]]] = {name: [] for name in ENDPOINTS}
+        self.errors: Dict[str, Dict[str, int]] = {name: {} for name in ENDPOINTS}
+
+    def record(self, name: str, latency: float, service: float, status: int) -> None:
+        with self._lock:
+            self.samples[name].append((latency, service, status))
+
+    def error(self, name: str, kind: str) -> None:
+        with self._lock:
+            self.errors[name][kind] = self.errors[name].get(kind, 0) + 1
+
+
+def _percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(q / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+def _connection(host: str, port: int, local: threading.local) -> http.client.HTTPConnection:
+    conn = getattr(local, "conn", None)
+    if conn is None:
+        conn = http.client.HTTPConnection(host, port, timeout=60)
+        local.conn = conn
+    return conn
+
+
+def _send(name: str, body: Optional[dict], scheduled: float, target, local, recorder: Recorder) -> None:
+    method, path = ENDPOINTS[name]
+    host, port = target
+    payload = json.dumps(body).encode("utf-8") if body is not None else None
+    headers = {"Content-Type": "application/json"} if payload is not None else {}
+
+    started = time.perf_counter()
+    try:
+        conn = _connection(host, port, local)
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+        except (http.client.HTTPException, ConnectionError):
+            # Соединение закрыто сервером (keep-alive timeout): одна повторная попытка
+            conn.close()
+            local.conn = None
+            conn = _connection(host, port, local)
+            conn.request(method, path, body=payload, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+    except Exception as e:
+        local.conn = None
+        recorder.error(name, type(e).__name__)
+        return
+
+    finished = time.perf_counter()
+    recorder.record(name, finished - scheduled, finished - started, resp.status)
+    if resp.status >= 400:
+        recorder.error(name, f"HTTP {resp.status}")
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Неизвестный эндпоинт в смеси: {name}. Допустимо: {', '.join(ENDPOINTS)}")
+        mix[name] = float(weight)
+    return mix
+
+
+def run_load(url: str, rps: float, duration: float, mix: Dict[str, float], seed: int,
+             concurrency: int, arrivals: str) -> Tuple[Recorder, float]:
+    parsed = urlparse(url)
+    target = (parsed.hostname, parsed.port or 80)
+    erp = ErpClientStub(seed=seed)
+    rng = random.Random(seed + 1)
+    names = list(mix)
+    weights = [mix[n] for n in names]
+
+    conn = http.client.HTTPConnection(*target, timeout=30)
+    conn.request("GET", "/api/config")
+    base_config = json.loads(conn.getresponse().read())
+    conn.close()
+
+    # Расписание строится заранее: open-loop, моменты отправки не зависят от ответов
+    schedule = []
+    t = 0.0
+    while t < duration:
+        name = rng.choices(names, weights)[0]
+        body = erp.config_update(base_config) if name == "config" else erp.order()
+        schedule.append((t, name, body))
+        t += rng.expovariate(rps) if arrivals == "poisson" else 1.0 / rps
+
+    recorder = Recorder()
+    local = threading.local()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        start = time.perf_counter()
+        for offset, name, body in schedule:
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(_send, name, body, scheduled, target, local, recorder)
+    elapsed = time.perf_counter() - start
+    return recorder, elapsed
+
+
+def build_report(recorder: Recorder, elapsed: float, params: dict) -> dict:
+    endpoints = {}
+    for name, samples in recorder.samples.items():
+        errors = recorder.errors[name]
+        total_errors = sum(errors.values())
+        attempts = len(samples) + sum(v for k, v in errors.items() if not k.startswith("HTTP"))
+        if not attempts:
+            continue
+        latencies = sorted(s[0] for s in samples)
+        services = sorted(s[1] for s in samples)
+        endpoints[name] = {
+            "path": ENDPOINTS[name][1],
+            "requests": attempts,
+            "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+            "errors": total_errors,
+            "error_rate": round(total_errors / attempts, 4),
+            "error_kinds": errors,
+            "latency_ms": {
+                f"p{q}": round(_percentile(latencies, q) * 1000, 2) if latencies else None
+                for q in (50, 95, 99)
+            },
+            "service_time_ms": {
+                f"p{q}": round(_percentile(services, q) * 1000, 2) if services else None
+                for q in (50, 95, 99)
+            },
+        }
+    total = sum(e["requests"] for e in endpoints.values())
+    total_errors = sum(e["errors"] for e in endpoints.values())
+    return {
+        "params": params,
+        "elapsed_seconds": round(elapsed, 3),
+        "total": {
+            "requests": total,
+            "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+            "errors": total_errors,
+            "error_rate": round(total_errors / total, 4) if total else 0.0,
+        },
+        "endpoints": endpoints,
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"\n{'Эндпоинт':<12}{'Запросов':>10}{'RPS':>10}{'Ошибки':>10}{'p50 мс':>10}{'p95 мс':>10}{'p99 мс':>10}")
+    print("-" * 72)
+    for name, e in report["endpoints"].items():
+        lat = e["latency_ms"]
+        print(f"{name:<12}{e['requests']:>10}{e['throughput_rps']:>10}{e['error_rate']:>10.2%}"
+              f"{lat['p50'] or 0:>10}{lat['p95'] or 0:>10}{lat['p99'] or 0:>10}")
+    t = report["total"]
+    print("-" * 72)
+    print(f"{'ИТОГО':<12}{t['requests']:>10}{t['throughput_rps']:>10}{t['error_rate']:>10.2%}")
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    cmd = [
+        sys.executable, "-m", "uvicorn", "server:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(workers), "--log-level", "warning",
+    ]
+    proc = subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)))
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn завершился с кодом {proc.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/api/config")
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("Сервер не поднялся за 30 секунд")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Адрес уже запущенного сервера (по умолчанию поднимается локальный uvicorn)")
+    parser.add_argument("--workers", type=int, default=1, help="Воркеры uvicorn")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--rps", type=float, default=50.0, help="Целевая интенсивность, запросов/с")
+    parser.add_argument("--duration", type=float, default=30.0, help="Длительность, с")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Смесь запросов (по умолчанию {DEFAULT_MIX})")
+    parser.add_argument("--arrivals", choices=["poisson", "uniform"], default="poisson")
+    parser.add_argument("--concurrency", type=int, default=256, help="Максимум одновременных запросов клиента")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="loadtest_results.json", help="Файл с результатами (JSON)")
+    args = parser.parse_args(argv)
+
+    mix = parse_mix(args.mix)
+    proc = None
+    url = args.url
+    if url is None:
+        proc = start_server(args.workers, args.port)
+        url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        recorder, elapsed = run_load(url, args.rps, args.duration, mix, args.seed, args.concurrency, args.arrivals)
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    params = {
+        "url": url,
+        "workers": args.workers if args.url is None else None,
+        "target_rps": args.rps,
+        "duration": args.duration,
+        "mix": mix,
+        "arrivals": args.arrivals,
+        "seed": args.seed,
+    }
+    report = build_report(recorder, elapsed, params)
+    print_report(report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты записаны в {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,6 @@
 import json
 from packaging_pricing.models import OrderInput, PricingConfig, BagType, Features
-from packaging_pricing.pipeline import PricingPipeline
-from packaging_pricing.scraps import TableBasedScrapProvider
-from packaging_pricing.steps import (
-    GeometryCalculationStep,
-    ScrapCalculationStep,
-    LaborCostStep,
-    MaterialCostStep,
-    PricingStep
-)
+from packaging_pricing.registry import build_pipeline
 
 def run_demo():
     # 1. Настройка конфигурации (Роль "Экономист")
@@ -25,18 +17,9 @@ def run_demo():
     )
 
     # 2. Сборка пайплайна (Роль "Архитектор")
-    # Здесь мы внедряем конкретный провайдер расчета отходов.
-    scrap_provider = TableBasedScrapProvider()
-    
-    steps = [
-        GeometryCalculationStep(),
-        ScrapCalculationStep(provider=scrap_provider),
-        LaborCostStep(),
-        MaterialCostStep(),
-        PricingStep()
-    ]
-    
-    pipeline = PricingPipeline(steps=steps, config=config)
+    # Шаги и провайдер расчета отходов берутся из реестра по именам;
+    # по умолчанию — стандартные шаги и табличный провайдер.
+    pipeline = build_pipeline(config)
 
     # 3. Входные данные (Роль "Менеджер")
     
@@ -0,0 +1,571 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import re
+import numpy as np
+from .errors import EUROSLOT_TYPES, FORMULA_ERROR_MSG, UNKNOWN_EUROSLOT_MSG, CalculationError
+from .layout import NO_ROLL_LAYOUT_MSG
+from .models import MAX_QUANTITY, BagType, OrderInput, ProductKind
+from .pipeline import PricingPipeline
+from .prepared import PreparedConfig, RESULT_FIELDS, result_columns
+
+# Пропущенное значение (ключа нет в строке). Отличается от None: None — явное значение.
+MISSING = object()
+
+# Плоские колонки пакета в порядке полей OrderInput/Features (влияет на порядок ошибок)
+ORDER_FIELDS = (
+    'product_kind', 'product_type', 'width', 'fold', 'length', 'flap',
+    'thickness', 'quantity', 'print_scheme'
+)
+FEATURE_FIELDS = ('is_wicket', 'glue_tape', 'dead_tape', 'euroslot', 'clips')
+
+# Ограничения полей — те же, что в models.OrderInput
+_FLOAT_FIELDS = {
+    'width': ('gt', 0.0, None),
+    'fold': ('ge', 0.0, 0.0),
+    'length': ('gt', 0.0, None),
+    'flap': ('ge', 0.0, 0.0),
+    'thickness': ('gt', 0.0, None),
+}
+_REQUIRED = ('product_type', 'width', 'length', 'thickness', 'quantity')
+
+_BOOL_TRUE = {'1', 'on', 't', 'true', 'y', 'yes'}
+_BOOL_FALSE = {'0', 'off', 'f', 'false', 'n', 'no'}
+# Целые, точно представимые во float64
+_EXACT_INT = 2 ** 53
+# float с модулем от 2**63 pydantic не приводит к int
+_FLOAT_INT_LIMIT = 2.0 ** 63
+_INT_STRING = re.compile(r'^[+-]?\d+(_\d+)*(\.0+)?$', re.ASCII)
+
+_FIELD_ORDER = {name: idx for idx, name in enumerate(ORDER_FIELDS + tuple('features.' + f for f in FEATURE_FIELDS))}
+_FEATURES_ORDER = _FIELD_ORDER['features.clips'] + 1
+_EXTRA_ORDER = _FEATURES_ORDER + 1
+# Проверки тарификации (errors.check_features) — после проверок модели
+_PRICING_ORDER = _EXTRA_ORDER + 1
+
+# Сообщения pydantic v2 (тип ошибки -> текст)
+_MESSAGES = {
+    'missing': 'Field required',
+    'extra_forbidden': 'Extra inputs are not permitted',
+    'float_type': 'Input should be a valid number',
+    'float_parsing': 'Input should be a valid number, unable to parse string as a number',
+    'int_type': 'Input should be a valid integer',
+    'int_parsing': 'Input should be a valid integer, unable to parse string as an integer',
+    'int_from_float': 'Input should be a valid integer, got a number with a fractional part',
+    'finite_number': 'Input should be a finite number',
+    'greater_than': 'Input should be greater than 0',
+    'greater_than_equal': 'Input should be greater than or equal to 0',
+    'less_than_equal': f'Input should be less than or equal to {MAX_QUANTITY}',
+    'int_parsing_size': 'Unable to parse input string as an integer, exceeded maximum size',
+    'string_type': 'Input should be a valid string',
+    'bool_type': 'Input should be a valid boolean',
+    'bool_parsing': 'Input should be a valid boolean, unable to interpret input',
+    'enum_product_type': "Input should be 'BOPP' or 'CPP'",
+    'enum_product_kind': "Input should be 'bag'",
+    'model_type': 'Input should be a valid dictionary or instance of Features',
+    'value_error': 'Value error, glue_tape and dead_tape are mutually exclusive',
+    # не pydantic: заказ валиден по модели, но не тарифицируется (как CalculationError шагов)
+    'unknown_euroslot': UNKNOWN_EUROSLOT_MSG,
+}
+
+
+@dataclass
+class BatchValidation:
+    """
+    Результат пакетной проверки.
+    columns — нормализованные колонки (float64, int64, bool, object для строк);
+    значения в невалидных строках не определены, ориентируйтесь на valid.
+    errors — ошибки в формате pydantic (type, loc, msg) с номером строки row.
+    """
+    columns: Dict[str, np.ndarray]
+    valid: np.ndarray
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def error_count(self) -> int:
+        return int((~self.valid).sum())
+
+    def error_column(self) -> Tuple[np.ndarray, List[str]]:
+        """
+        Компактная колонка ошибок: для каждой строки код первой ошибки (-1 — строка
+        валидна) и словарь кодов вида "width: greater_than". Строится по списку
+        ошибок, т.е. за время, пропорциональное числу плохих строк.
+        """
+        codes = np.full(len(self.valid), -1, dtype=np.int32)
+        labels: Dict[str, int] = {}
+        for error in self.errors:
+            row = error['row']
+            if codes[row] < 0:
+                label = f"{'.'.join(str(part) for part in error['loc'])}: {error['type']}"
+                codes[row] = labels.setdefault(label, len(labels))
+        return codes, list(labels)
+
+    def error_labels(self) -> List[Optional[str]]:
+        """Колонка ошибок в виде списка строк (None — строка валидна)."""
+        codes, labels = self.error_column()
+        return [labels[code] if code >= 0 else None for code in codes.tolist()]
+
+
+class _Errors:
+    def __init__(self, n: int):
+        self.items: List[Tuple[int, int, Tuple[Any, ...], str]] = []
+        self.invalid = np.zeros(n, dtype=bool)
+
+    def add(self, rows: np.ndarray, order: int, loc: Tuple[Any, ...], kind: str) -> None:
+        rows = np.flatnonzero(rows) if rows.dtype == bool else rows
+        if len(rows) == 0:
+            return
+        self.invalid[rows] = True
+        self.items.extend((int(r), order, loc, kind) for r in rows)
+
+    def add_one(self, row: int, order: int, loc: Tuple[Any, ...], kind: str) -> None:
+        self.invalid[row] = True
+        self.items.append((row, order, loc, kind))
+
+    def result(self) -> List[Dict[str, Any]]:
+        self.items.sort(key=lambda e: (e[0], e[1]))
+        return [
+            {
+                'row': row,
+                'type': 'enum' if kind.startswith('enum_') else kind,
+                'loc': loc,
+                'msg': _MESSAGES[kind],
+            }
+            for row, _, loc, kind in self.items
+        ]
+
+
+class PipelineBatch:
+    """
+    Построчный расчет пакета пайплайном — для пайплайнов, которые PreparedConfig
+    не повторяет (свои шаги, опции шагов). Подходит вместо PreparedConfig
+    в price_groups/price_validated; строки, которые пайплайн не посчитал,
+    получают ошибки его шагов (CalculationError).
+    """
+
+    def __init__(self, pipeline: PricingPipeline):
+        self.pipeline = pipeline
+        self.config = pipeline.config
+
+    def run_columns(self, columns: Mapping[str, np.ndarray]
+                    ) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray], Dict[int, CalculationError]]:
+        """
+        Колонки CalculationResult, числовые промежуточные значения пайплайна
+        (NaN в строках без значения) и ошибки по номеру строки в columns.
+        """
+        orders = column_orders(columns)
+        n = len(orders)
+        results = {name: np.full(n, np.nan) for name in RESULT_FIELDS}
+        intermediates: Dict[str, np.ndarray] = {}
+        errors: Dict[int, CalculationError] = {}
+        for row, order in enumerate(orders):
+            outcome = self.pipeline.try_run(order)
+            if isinstance(outcome, CalculationError):
+                errors[row] = outcome
+                continue
+            for name in RESULT_FIELDS:
+                results[name][row] = getattr(outcome.final_result, name)
+            for name, value in outcome.intermediates.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    intermediates.setdefault(name, np.full(n, np.nan))[row] = value
+        return results, intermediates, errors
+
+
+def column_orders(columns: Mapping[str, np.ndarray]) -> List[OrderInput]:
+    """Проверенные колонки пакета (validate_columns) обратно в заказы — для построчного расчета."""
+    values = {name: column.tolist() for name, column in columns.items()}
+    return [
+        OrderInput(**{name: values[name][row] for name in ORDER_FIELDS},
+                   features={name: values[name][row] for name in FEATURE_FIELDS})
+        for row in range(len(values['width']))
+    ]
+
+
+def price_validated(prepared: PreparedConfig, validation: BatchValidation,
+                    intermediates: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+    """
+    Расчет валидных строк пакета одним векторным проходом.
+    Возвращает колонки CalculationResult длиной во весь пакет; в невалидных строках NaN.
+    intermediates — как в price_groups.
+    """
+    return price_groups([(prepared, np.ones(len(validation.valid), dtype=bool))], validation, intermediates)
+
+
+def price_groups(groups: Sequence[Tuple[PreparedConfig, np.ndarray]],
+                 validation: BatchValidation,
+                 intermediates: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+    """
+    Расчет пакета по группам строк: (предрасчитанный конфиг, маска строк группы).
+    Каждая группа считается одним векторным проходом со своим конфигом
+    (например, версии конфига по дате котировки). Строки вне групп и невалидные — NaN.
+    Вместо PreparedConfig подходит любой объект с price_results (например, FixedPointEngine)
+    и PipelineBatch (построчно пайплайном).
+
+    Валидные строки, которые конфиг не позволяет посчитать (нет раскладки на рулон
+    из roll_widths), дописываются в validation как ошибки no_roll_layout; строки,
+    на которых свои формулы конфига не дали конечного значения, — как formula_error;
+    у PipelineBatch — ошибки шагов пайплайна.
+
+    Если передан словарь intermediates, в него кладутся неокругленные промежуточные
+    значения (PreparedConfig.price_columns) длиной во весь пакет, NaN вне посчитанных
+    строк; группы тогда должны поддерживать price_columns.
+    """
+    n = len(validation.valid)
+    out = {name: np.full(n, np.nan) for name in RESULT_FIELDS}
+    formula_failed = np.zeros(n, dtype=bool)
+    step_errors: Dict[int, CalculationError] = {}
+    for prepared, rows in groups:
+        rows = rows & validation.valid
+        if not rows.any():
+            continue
+        subset = {name: values[rows] for name, values in validation.columns.items()}
+        if isinstance(prepared, PipelineBatch):
+            results, columns, failures = prepared.run_columns(subset)
+            positions = np.flatnonzero(rows)
+            step_errors.update((int(positions[row]), error) for row, error in failures.items())
+        elif intermediates is None:
+            results, columns = prepared.price_results(subset), {}
+        else:
+            columns = prepared.price_columns(subset)
+            results = result_columns(columns)
+        if intermediates is not None:
+            for name, values in columns.items():
+                intermediates.setdefault(name, np.full(n, np.nan))[rows] = values
+        for name, values in results.items():
+            out[name][rows] = values
+        formula_failed[rows] = formula_failures(prepared, subset, results['final_price'])
+
+    unpriced = np.flatnonzero(validation.valid & np.isnan(out['final_price']))
+    if len(unpriced):
+        validation.valid[unpriced] = False
+        validation.errors.extend(
+            {'row': row, **step_errors[row].to_dict()}
+            if row in step_errors else
+            {'row': row, 'type': 'formula_error', 'loc': ['formulas'], 'msg': FORMULA_ERROR_MSG}
+            if formula_failed[row] else
+            {'row': row, 'type': 'no_roll_layout', 'loc': ['width'], 'msg': NO_ROLL_LAYOUT_MSG}
+            for row in unpriced.tolist()
+        )
+    return out
+
+
+def formula_failures(prepared: PreparedConfig, columns: Mapping[str, np.ndarray],
+                     final_price: np.ndarray) -> np.ndarray:
+    """
+    Маска строк без цены (NaN), которые не посчитали свои формулы конфига
+    (formula_error); остальные строки без цены — без раскладки на рулон (no_roll_layout).
+    """
+    failed = np.zeros(len(final_price), dtype=bool)
+    if getattr(prepared, 'formulas', None):
+        unpriced = np.flatnonzero(np.isnan(final_price))
+        failed[unpriced[_has_layout(prepared, columns, unpriced)]] = True
+    return failed
+
+
+def _has_layout(prepared: PreparedConfig, columns: Mapping[str, np.ndarray], rows: np.ndarray) -> np.ndarray:
+    """Есть ли раскладка на рулон у строк rows (без roll_widths — у всех)."""
+    if not prepared.config.roll_widths:
+        return np.ones(len(rows), dtype=bool)
+    lane_width = columns['width'][rows].astype(np.float64)
+    if 'fold' in columns:
+        lane_width = lane_width + columns['fold'][rows].astype(np.float64)
+    return np.array([prepared.layout_for(float(w)) is not None for w in lane_width], dtype=bool)
+
+
+def rows_to_columns(rows: Sequence[Mapping[str, Any]]) -> Dict[str, List[Any]]:
+    """
+    Строки в формате OrderInput (features вложенным словарем) -> плоские колонки.
+    Отсутствующие ключи становятся MISSING, лишние ключи — отдельными колонками.
+    """
+    n = len(rows)
+    columns: Dict[str, List[Any]] = {}
+
+    def column(name: str) -> List[Any]:
+        if name not in columns:
+            columns[name] = [MISSING] * n
+        return columns[name]
+
+    for idx, row in enumerate(rows):
+        for key, value in row.items():
+            if key == 'features':
+                if isinstance(value, Mapping):
+                    for fkey in FEATURE_FIELDS:
+                        if fkey in value:
+                            column(fkey)[idx] = value[fkey]
+                else:
+                    column('features')[idx] = value
+            else:
+                column(key)[idx] = value
+    return columns
+
+
+def validate_columns(columns: Mapping[str, Sequence[Any]]) -> BatchValidation:
+    """
+    Проверка пакета заказов по колонкам без создания OrderInput на каждую строку.
+    Применяет те же ограничения, что OrderInput/Features (включая extra='forbid'
+    и взаимоисключение glue_tape/dead_tape), и возвращает те же сообщения об ошибках
+    с номерами строк. Колонки из numpy-массивов числовых типов проверяются
+    целиком векторно; списки разбираются поэлементно только там, где есть строки/None.
+    """
+    lengths = {len(v) for v in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f"Колонки разной длины: {sorted(lengths)}")
+    n = lengths.pop() if lengths else 0
+
+    errors = _Errors(n)
+    out: Dict[str, np.ndarray] = {}
+    known = set(ORDER_FIELDS) | set(FEATURE_FIELDS) | {'features'}
+
+    for name in _REQUIRED:
+        if name not in columns:
+            errors.add(np.arange(n), _FIELD_ORDER[name], (name,), 'missing')
+
+    # product_kind / product_type
+    out['product_kind'] = _check_enum(columns, 'product_kind', {k.value for k in ProductKind},
+                                      ProductKind.BAG.value, 'enum_product_kind', errors, n)
+    out['product_type'] = _check_enum(columns, 'product_type', {t.value for t in BagType},
+                                      None, 'enum_product_type', errors, n)
+
+    # Геометрия
+    for name, (op, bound, default) in _FLOAT_FIELDS.items():
+        if name not in columns:
+            out[name] = np.full(n, default if default is not None else np.nan)
+            continue
+        values, present = _parse_floats(columns[name], name, errors)
+        bad = ~(values > bound) if op == 'gt' else ~(values >= bound)
+        errors.add(bad & present, _FIELD_ORDER[name], (name,), 'greater_than' if op == 'gt' else 'greater_than_equal')
+        out[name] = values
+
+    # Тираж
+    if 'quantity' in columns:
+        values, present = _parse_ints(columns['quantity'], errors)
+        errors.add(present & ~(values > 0), _FIELD_ORDER['quantity'], ('quantity',), 'greater_than')
+        out['quantity'] = values
+    else:
+        out['quantity'] = np.zeros(n, dtype=np.int64)
+
+    # Схема печати
+    if 'print_scheme' in columns:
+        scheme = np.empty(n, dtype=object)
+        for idx, value in enumerate(columns['print_scheme']):
+            if value is MISSING:
+                scheme[idx] = 'б/печати'
+            elif isinstance(value, str):
+                scheme[idx] = value
+            else:
+                errors.add_one(idx, _FIELD_ORDER['print_scheme'], ('print_scheme',), 'string_type')
+        out['print_scheme'] = scheme
+    else:
+        out['print_scheme'] = np.full(n, 'б/печати', dtype=object)
+
+    # Опции (Features)
+    features_bad = np.zeros(n, dtype=bool)
+    if 'features' in columns:
+        # Значение features не словарь (rows_to_columns кладет его в отдельную колонку)
+        for idx, value in enumerate(columns['features']):
+            if value is not MISSING:
+                errors.add_one(idx, _FEATURES_ORDER - 1, ('features',), 'model_type')
+                features_bad[idx] = True
+    for name in ('is_wicket', 'glue_tape', 'dead_tape', 'clips'):
+        if name in columns:
+            values, bad = _parse_bools(columns[name], name, errors)
+            features_bad |= bad
+            out[name] = values
+        else:
+            out[name] = np.zeros(n, dtype=bool)
+    slots = np.full(n, None, dtype=object)
+    unknown_slot = np.zeros(n, dtype=bool)
+    if 'euroslot' in columns:
+        for idx, value in enumerate(columns['euroslot']):
+            if value is None or value is MISSING:
+                continue
+            if isinstance(value, str):
+                slots[idx] = value
+                unknown_slot[idx] = bool(value) and value.lower() not in EUROSLOT_TYPES
+            else:
+                errors.add_one(idx, _FIELD_ORDER['features.euroslot'], ('features', 'euroslot'), 'string_type')
+                features_bad[idx] = True
+    out['euroslot'] = slots
+
+    # model_validator Features: проверяется, только если поля опций валидны
+    errors.add(out['glue_tape'] & out['dead_tape'] & ~features_bad, _FEATURES_ORDER, ('features',), 'value_error')
+    out['clips'] = out['clips'] & out['is_wicket']
+
+    # extra='forbid'
+    for name in columns:
+        if name not in known:
+            present = np.fromiter((v is not MISSING for v in columns[name]), dtype=bool, count=n)
+            errors.add(present, _EXTRA_ORDER, (name,), 'extra_forbidden')
+
+    # Тарификация: как MaterialCostStep — только для строк, прошедших проверку модели
+    errors.add(unknown_slot & ~errors.invalid, _PRICING_ORDER, ('features', 'euroslot'), 'unknown_euroslot')
+
+    return BatchValidation(columns=out, valid=~errors.invalid, errors=errors.result())
+
+
+def _check_enum(columns, name, allowed, default, kind, errors: _Errors, n: int) -> np.ndarray:
+    out = np.empty(n, dtype=object)
+    if name not in columns:
+        out[:] = default
+        return out
+    for idx, value in enumerate(columns[name]):
+        if value is MISSING:
+            out[idx] = default
+            if default is None:
+                errors.add_one(idx, _FIELD_ORDER[name], (name,), 'missing')
+        elif isinstance(value, str) and getattr(value, 'value', value) in allowed:
+            out[idx] = getattr(value, 'value', value)
+        else:
+            errors.add_one(idx, _FIELD_ORDER[name], (name,), kind)
+    return out
+
+
+def _parse_floats(values: Sequence[Any], name: str, errors: _Errors) -> Tuple[np.ndarray, np.ndarray]:
+    """Числа (как float в pydantic lax): bool/int/float и строки с числом. Возвращает (значения, есть_значение)."""
+    n = len(values)
+    order = _FIELD_ORDER[name]
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'biuf':
+        return values.astype(np.float64, copy=False), np.ones(n, dtype=bool)
+    if {type(v) for v in values} <= {int, float, bool}:
+        return np.asarray(values, dtype=np.float64), np.ones(n, dtype=bool)
+
+    out = np.full(n, np.nan)
+    present = np.ones(n, dtype=bool)
+    for idx, value in enumerate(values):
+        if value is MISSING:
+            present[idx] = False
+            default = _FLOAT_FIELDS[name][2]
+            if default is None:
+                errors.add_one(idx, order, (name,), 'missing')
+            else:
+                out[idx] = default
+        elif isinstance(value, (bool, int, float, np.integer, np.floating)):
+            out[idx] = float(value)
+        elif isinstance(value, (str, bytes)):
+            text = value.decode() if isinstance(value, bytes) else value
+            try:
+                # Как в pydantic: только ASCII, "_" между цифрами без пробелов по краям
+                if not text.isascii() or ('_' in text and text != text.strip()):
+                    raise ValueError(text)
+                out[idx] = float(text)
+            except ValueError:
+                present[idx] = False
+                errors.add_one(idx, order, (name,), 'float_parsing')
+        else:
+            present[idx] = False
+            errors.add_one(idx, order, (name,), 'float_type')
+    return out, present
+
+
+def _parse_ints(values: Sequence[Any], errors: _Errors) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Тираж (как int в pydantic lax): целые, float без дробной части, строки с целым числом.
+    Целые больше MAX_QUANTITY — ошибка less_than_equal, float за пределами int64 —
+    int_parsing_size; отрицательные целые записываются нулем (greater_than добавляет вызывающий).
+    """
+    n = len(values)
+    order = _FIELD_ORDER['quantity']
+    loc = ('quantity',)
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'biu' and values.dtype != np.uint64:
+        return values.astype(np.int64, copy=False), np.ones(n, dtype=bool)
+    if isinstance(values, np.ndarray) and values.dtype.kind == 'f':
+        floats = values.astype(np.float64, copy=False)
+    elif {type(v) for v in values} <= {int, float, bool}:
+        # Целые за пределами 2**53 теряют точность во float — такие колонки разбираются поштучно
+        exact = all(type(v) is float or -_EXACT_INT <= v <= _EXACT_INT for v in values)
+        if exact and {type(v) for v in values} <= {int, bool}:
+            return np.asarray(values, dtype=np.int64), np.ones(n, dtype=bool)
+        floats = np.asarray(values, dtype=np.float64) if exact else None
+    else:
+        floats = None
+
+    if floats is not None:
+        present = np.ones(n, dtype=bool)
+        finite = np.isfinite(floats)
+        errors.add(~finite, order, loc, 'finite_number')
+        fractional = finite & (np.floor(floats) != floats)
+        errors.add(fractional, order, loc, 'int_from_float')
+        too_big = finite & ~fractional & (np.abs(floats) >= _FLOAT_INT_LIMIT)
+        errors.add(too_big, order, loc, 'int_parsing_size')
+        present &= finite & ~fractional & ~too_big
+        out = np.where(present, floats, 0).astype(np.int64)
+        return out, present
+
+    out = np.zeros(n, dtype=np.int64)
+    present = np.ones(n, dtype=bool)
+    for idx, value in enumerate(values):
+        kind = None
+        number = None
+        if value is MISSING:
+            kind = 'missing'
+        elif isinstance(value, (bool, int, np.integer)):
+            number = int(value)
+        elif isinstance(value, (float, np.floating)):
+            if not np.isfinite(value):
+                kind = 'finite_number'
+            elif value != int(value):
+                kind = 'int_from_float'
+            elif abs(value) >= _FLOAT_INT_LIMIT:
+                kind = 'int_parsing_size'
+            else:
+                number = int(value)
+        elif isinstance(value, str):
+            text = value.strip()
+            if _INT_STRING.match(text):
+                number = int(text.split('.')[0].replace('_', ''))
+            else:
+                kind = 'int_parsing'
+        else:
+            kind = 'int_type'
+        if number is not None:
+            if number > MAX_QUANTITY:
+                kind = 'less_than_equal'
+            else:
+                out[idx] = max(number, 0)
+        if kind is not None:
+            present[idx] = False
+            errors.add_one(idx, order, loc, kind)
+    return out, present
+
+
+def _parse_bools(values: Sequence[Any], name: str, errors: _Errors) -> Tuple[np.ndarray, np.ndarray]:
+    """Флаги опций (как bool в pydantic lax): bool, 0/1, строки yes/no/true/false/on/off..."""
+    n = len(values)
+    bad = np.zeros(n, dtype=bool)
+    if isinstance(values, np.ndarray) and values.dtype == bool:
+        return values, bad
+    if {type(v) for v in values} <= {bool}:
+        return np.asarray(values, dtype=bool), bad
+
+    order = _FIELD_ORDER['features.' + name]
+    loc = ('features', name)
+    out = np.zeros(n, dtype=bool)
+    for idx, value in enumerate(values):
+        kind = None
+        if value is MISSING:
+            continue
+        if isinstance(value, (bool, np.bool_)):
+            out[idx] = bool(value)
+        elif isinstance(value, (int, np.integer)):
+            if value in (0, 1):
+                out[idx] = bool(value)
+            else:
+                kind = 'bool_parsing'
+        elif isinstance(value, (float, np.floating)):
+            if value in (0.0, 1.0):
+                out[idx] = bool(value)
+            else:
+                kind = 'bool_type'
+        elif isinstance(value, str):
+            text = value.lower()
+            if text in _BOOL_TRUE:
+                out[idx] = True
+            elif text in _BOOL_FALSE:
+                out[idx] = False
+            else:
+                kind = 'bool_parsing'
+        else:
+            kind = 'bool_type'
+        if kind is not None:
+            bad[idx] = True
+            errors.add_one(idx, order, loc, kind)
+    return out, bad
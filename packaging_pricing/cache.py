@@ -0,0 +1,80 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+from pydantic import BaseModel
+from .models import OrderInput, PricingConfig
+
+
+class LRUCache:
+    """
+    Ограниченный кэш с вытеснением давно неиспользуемых записей (LRU).
+    Потокобезопасен: синхронные эндпоинты FastAPI выполняются в пуле потоков.
+    """
+    def __init__(self, maxsize: int = 1024):
+        if maxsize <= 0:
+            raise ValueError("maxsize должен быть положительным")
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики для мониторинга."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+
+def _digest(payload: Any) -> str:
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def config_fingerprint(config: PricingConfig) -> str:
+    """
+    Версия конфигурации — хэш ее содержимого.
+    Одинаковый конфиг дает одинаковую версию на всех воркерах и после рестарта.
+    """
+    return _digest(config.model_dump(mode="json"))
+
+
+def order_fingerprint(order: OrderInput, config_version: Optional[str] = None) -> str:
+    """
+    Канонический хэш заказа (и версии конфига, если передана).
+    Используется как ключ кэша результатов и как ETag ответа.
+    """
+    return _digest({"order": order.model_dump(mode="json"), "config": config_version})
+
+
+def request_fingerprint(request: BaseModel, config_version: Optional[str] = None) -> str:
+    """Канонический хэш произвольного запроса (например, пакета заказов) и версии конфига."""
+    return _digest({"request": request.model_dump(mode="json"), "config": config_version})
@@ -0,0 +1,105 @@
+from typing import Any, BinaryIO, Dict, Iterator, List, Union
+import numpy as np
+from .batch import BatchValidation, price_validated
+from .export import COLUMNS, row_columns
+from .prepared import PreparedConfig, RESULT_FIELDS
+
+# Колоночная выгрузка расчета пакета (Arrow / Parquet) для аналитики.
+# pyarrow — необязательная зависимость: импортируется только при вызове.
+
+ARROW_STREAM_MEDIA_TYPE = 'application/vnd.apache.arrow.stream'
+PARQUET_MEDIA_TYPE = 'application/vnd.apache.parquet'
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Для выгрузки Arrow/Parquet нужен пакет pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def arrow_table(prepared: PreparedConfig, validation: BatchValidation) -> Any:
+    """
+    Расчет пакета в виде pyarrow.Table: номер строки, код ошибки (словарная
+    колонка, null у валидных строк), поля CalculationResult и колонки строки
+    экспорта (COLUMNS, из неокругленных промежуточных значений — как
+    generate_row_data с intermediates), в невалидных строках — null.
+    Числовые колонки передаются в Arrow без копирования: таблица ссылается
+    на буферы посчитанных массивов NumPy, маска валидности — отдельный битмап.
+    Вместо PreparedConfig подходит PipelineBatch (построчный расчет пайплайном).
+    """
+    pa = _pyarrow()
+    # Расчет может добавить ошибки (строки без раскладки на рулон) — маска после него
+    intermediates: Dict[str, np.ndarray] = {}
+    results = price_validated(prepared, validation, intermediates)
+    valid = validation.valid
+    null_mask = ~valid
+    rows = row_columns(
+        validation.columns, results, valid,
+        prepared.config.k2_margin_divisor, prepared.config.k3_margin_multiplier, intermediates
+    )
+
+    names: List[str] = ['row']
+    arrays: List[Any] = [pa.array(np.arange(len(valid), dtype=np.int64))]
+    codes, labels = validation.error_column()
+    names.append('error')
+    arrays.append(pa.DictionaryArray.from_arrays(
+        pa.array(codes, mask=codes < 0), pa.array(labels, type=pa.string())
+    ))
+    for name in RESULT_FIELDS:
+        names.append(name)
+        arrays.append(pa.array(results[name], mask=null_mask))
+    for name in COLUMNS:
+        values = rows[name]
+        names.append(name)
+        if isinstance(values, np.ndarray):
+            arrays.append(pa.array(values, mask=null_mask))
+        else:
+            arrays.append(pa.array(values, type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=names)
+
+
+class _ChunkSink:
+    """Файлоподобный приемник: накапливает записанное до следующего take()."""
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_arrow_stream(table: Any, max_chunksize: int = 65536) -> Iterator[bytes]:
+    """
+    Arrow IPC stream по частям: схема, затем по record batch на каждые
+    max_chunksize строк — ответ начинает уходить клиенту до конца сериализации.
+    """
+    pa = _pyarrow()
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, table.schema)
+    yield sink.take()
+    for batch in table.to_batches(max_chunksize=max_chunksize):
+        writer.write_batch(batch)
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+def write_parquet(table: Any, where: Union[str, BinaryIO], compression: str = 'zstd') -> None:
+    """Записать таблицу в Parquet (путь или файлоподобный объект)."""
+    _pyarrow()
+    import pyarrow.parquet as pq
+    pq.write_table(table, where, compression=compression)
@@ -0,0 +1,389 @@
+import codecs
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+from typing import IO, Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+from .batch import formula_failures, rows_to_columns, validate_columns
+from .prepared import PreparedConfig, RESULT_FIELDS, result_columns
+from .xlsx import StreamingXlsxWriter
+
+# Сравнение двух версий конфига на книге заказов перед публикацией кандидата.
+# Книга читается блоками; каждый блок проверяется и считается по обоим конфигам
+# за один проход (объем пленки, ключи таблиц и норма брака общие), строки блока
+# сортируются по |изменению цены| и сбрасываются во временный файл (серия).
+# Отчет — блочное слияние серий (внешняя сортировка) с общим буфером на все серии,
+# поэтому память ограничена размером блока при любом размере книги;
+# итоговая статистика копится по ходу.
+
+DIFF_FIELDS = tuple(RESULT_FIELDS)
+ORDER_REPORT_FIELDS = ('product_type', 'width', 'fold', 'length', 'flap', 'thickness', 'quantity')
+
+_RECORD = np.dtype(
+    [('row', np.int64), ('product_type', 'U4')]
+    + [(name, np.int64 if name == 'quantity' else np.float64) for name in ORDER_REPORT_FIELDS[1:]]
+    + [('sort_key', np.float64)]
+    + [(f'{name}_{side}', np.float64) for name in DIFF_FIELDS for side in ('current', 'candidate')]
+)
+
+# Границы корзин относительного изменения цены, %
+CHANGE_BUCKETS = (-10.0, -5.0, -1.0, 0.0, 1.0, 5.0, 10.0)
+
+# Лимит строк листа Excel (без заголовка)
+XLSX_MAX_ROWS = 1_048_575
+
+# Записей в буферах слияния серий (в сумме) и минимум на одну серию
+_MERGE_ROWS = 65536
+_MIN_RUN_ROWS = 512
+# Записей, переводимых в строки отчета за раз
+_WRITE_ROWS = 8192
+
+
+def report_columns() -> List[str]:
+    """Колонки отчета: строка книги, параметры заказа, по каждому полю — было/стало/разница."""
+    columns = ['row', *ORDER_REPORT_FIELDS]
+    for name in DIFF_FIELDS:
+        columns += [f'{name}_current', f'{name}_candidate', f'{name}_delta']
+    return columns
+
+
+class ConfigDiff:
+    """
+    Потоковое сравнение текущего конфига с кандидатом.
+
+        with ConfigDiff(current, candidate) as diff:
+            for columns in iter_order_file('orders.csv'):
+                diff.add(columns)
+            diff.write_csv(out)        # или write_xlsx(out)
+            stats = diff.stats()
+
+    Строки, не прошедшие проверку, в отчет не попадают (считаются в статистике).
+    Строки, которые один из конфигов не может посчитать (нет рулона или свои
+    формулы конфига не дали значения), идут в начало отчета с пустыми значениями
+    этой стороны; в статистике они считаются отдельно по причине.
+    """
+    def __init__(self, current: PreparedConfig, candidate: PreparedConfig, tmpdir: Optional[str] = None):
+        self.current = current
+        self.candidate = candidate
+        self._dir = tempfile.mkdtemp(prefix='config-diff-', dir=tmpdir)
+        self._runs: List[str] = []
+        self.rows = 0
+        self.invalid = 0
+        self.errors: Dict[str, int] = {}
+        self.no_layout = {'current': 0, 'candidate': 0}
+        self.formula_errors = {'current': 0, 'candidate': 0}
+        self.priced = 0
+        self.changed = 0
+        self.increased = 0
+        self.decreased = 0
+        self.revenue = {'current': 0.0, 'candidate': 0.0}
+        self.buckets = np.zeros(len(CHANGE_BUCKETS) + 2, dtype=np.int64)
+        self._sum = dict.fromkeys(DIFF_FIELDS, 0.0)
+        self._sum_abs = dict.fromkeys(DIFF_FIELDS, 0.0)
+        self._max_up: Dict[str, Tuple[float, int]] = {name: (0.0, -1) for name in DIFF_FIELDS}
+        self._max_down: Dict[str, Tuple[float, int]] = {name: (0.0, -1) for name in DIFF_FIELDS}
+
+    def __enter__(self) -> 'ConfigDiff':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def add(self, columns: Mapping[str, Sequence[Any]]) -> None:
+        """Проверить и посчитать блок книги (плоские колонки, как в batch.validate_columns)."""
+        validation = validate_columns(columns)
+        offset = self.rows
+        n = len(validation.valid)
+        self.rows += n
+        self.invalid += validation.error_count
+        codes, labels = validation.error_column()
+        for code, count in zip(*np.unique(codes[codes >= 0], return_counts=True)):
+            label = labels[code]
+            self.errors[label] = self.errors.get(label, 0) + int(count)
+
+        rows = np.flatnonzero(validation.valid)
+        if len(rows) == 0:
+            return
+        subset = {name: values[rows] for name, values in validation.columns.items()}
+        factors = self.current.order_factors(subset)
+        candidate_factors = factors
+        if self.candidate.scrap_provider is not self.current.scrap_provider:
+            candidate_factors = {**factors, 'scrap_rate': self.candidate.order_factors(subset)['scrap_rate']}
+        old = result_columns(self.current.price_columns(subset, factors))
+        new = result_columns(self.candidate.price_columns(subset, candidate_factors))
+
+        record = np.empty(len(rows), dtype=_RECORD)
+        record['row'] = rows + offset
+        record['product_type'] = subset['product_type']
+        for name in ORDER_REPORT_FIELDS[1:]:
+            record[name] = subset[name]
+        for name in DIFF_FIELDS:
+            record[f'{name}_current'] = old[name]
+            record[f'{name}_candidate'] = new[name]
+        # Ключ — округленная разница, как в отчете, иначе шум float ломает порядок строк при равенстве
+        delta = np.round(new['final_price'] - old['final_price'], RESULT_FIELDS['final_price'][2])
+        record['sort_key'] = np.where(np.isnan(delta), np.inf, np.abs(delta))
+
+        self._accumulate(record, old, new, subset['quantity'], {
+            'current': formula_failures(self.current, subset, old['final_price']),
+            'candidate': formula_failures(self.candidate, subset, new['final_price']),
+        })
+        order = np.lexsort((record['row'], -record['sort_key']))
+        path = os.path.join(self._dir, f'run{len(self._runs):05d}.npy')
+        np.save(path, record[order])
+        self._runs.append(path)
+
+    def _accumulate(self, record: np.ndarray, old: Dict[str, np.ndarray], new: Dict[str, np.ndarray],
+                    quantity: np.ndarray, formula_failed: Mapping[str, np.ndarray]) -> None:
+        old_missing = np.isnan(old['final_price'])
+        new_missing = np.isnan(new['final_price'])
+        for side, missing in (('current', old_missing), ('candidate', new_missing)):
+            formula = int(formula_failed[side].sum())
+            self.formula_errors[side] += formula
+            self.no_layout[side] += int(missing.sum()) - formula
+        both = ~(old_missing | new_missing)
+        self.priced += int(both.sum())
+        if not both.any():
+            return
+
+        rows = record['row'][both]
+        for name in DIFF_FIELDS:
+            delta = new[name][both] - old[name][both]
+            self._sum[name] += float(delta.sum())
+            self._sum_abs[name] += float(np.abs(delta).sum())
+            up, down = int(delta.argmax()), int(delta.argmin())
+            if delta[up] > self._max_up[name][0]:
+                self._max_up[name] = (float(delta[up]), int(rows[up]))
+            if delta[down] < self._max_down[name][0]:
+                self._max_down[name] = (float(delta[down]), int(rows[down]))
+
+        price_old = old['final_price'][both]
+        price_new = new['final_price'][both]
+        self.changed += int((price_new != price_old).sum())
+        self.increased += int((price_new > price_old).sum())
+        self.decreased += int((price_new < price_old).sum())
+        qty = quantity[both].astype(np.float64)
+        self.revenue['current'] += float(price_old @ qty)
+        self.revenue['candidate'] += float(price_new @ qty)
+
+        # Корзины: ниже первой границы, между границами, ровно 0, выше последней
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.where(price_old != 0, (price_new - price_old) / price_old * 100.0, 0.0)
+        unchanged = price_new == price_old
+        bucket = np.searchsorted(CHANGE_BUCKETS, change, side='left')
+        bucket = np.where(bucket > CHANGE_BUCKETS.index(0.0), bucket + 1, bucket)
+        bucket[unchanged] = CHANGE_BUCKETS.index(0.0) + 1
+        self.buckets += np.bincount(bucket, minlength=len(self.buckets))
+
+    def record_blocks(self, merge_rows: int = _MERGE_ROWS) -> Iterator[np.ndarray]:
+        """
+        Записи всех серий по убыванию |изменения цены| (при равенстве — по номеру строки),
+        блоками. Слияние векторное: в буферах серий в сумме не больше merge_rows записей
+        (но не меньше _MIN_RUN_ROWS на серию); за шаг выдается все, что не больше
+        последней записи самой "короткой" серии.
+        """
+        runs = [_RunReader(path) for path in self._runs]
+        block_rows = max(_MIN_RUN_ROWS, merge_rows // max(len(runs), 1))
+        buffers = [run.read(block_rows) for run in runs]
+        try:
+            while True:
+                for i, run in enumerate(runs):
+                    if len(buffers[i]) == 0 and run.remaining:
+                        buffers[i] = run.read(block_rows)
+                active = [i for i in range(len(runs)) if len(buffers[i])]
+                if not active:
+                    return
+                # Граница: серии, у которых на диске еще есть записи, не должны обогнать выдачу
+                limits = [(-buffers[i]['sort_key'][-1], buffers[i]['row'][-1])
+                          for i in active if runs[i].remaining]
+                parts = []
+                if limits:
+                    key, row = min(limits)
+                for i in active:
+                    buf = buffers[i]
+                    if limits:
+                        neg = -buf['sort_key']
+                        take = int(((neg < key) | ((neg == key) & (buf['row'] <= row))).sum())
+                    else:
+                        take = len(buf)
+                    parts.append(buf[:take])
+                    buffers[i] = buf[take:]
+                block = np.concatenate(parts)
+                yield block[np.lexsort((block['row'], -block['sort_key']))]
+        finally:
+            for run in runs:
+                run.close()
+
+    def records(self) -> Iterator[List[Any]]:
+        """Строки отчета (report_columns) по убыванию |изменения цены|; None — значения нет."""
+        for block in self.record_blocks():
+            for start in range(0, len(block), _WRITE_ROWS):
+                yield from _report_rows(block[start:start + _WRITE_ROWS])
+
+    def stats(self) -> Dict[str, Any]:
+        """Итоговая статистика по книге (JSON-совместимая)."""
+        n = max(self.priced, 1)
+        labels = _bucket_labels()
+        return {
+            'rows': self.rows,
+            'invalid': self.invalid,
+            'errors': dict(sorted(self.errors.items(), key=lambda item: -item[1])),
+            'priced': self.priced,
+            'no_roll_layout': dict(self.no_layout),
+            'formula_error': dict(self.formula_errors),
+            'final_price_changed': self.changed,
+            'final_price_increased': self.increased,
+            'final_price_decreased': self.decreased,
+            'revenue_current': round(self.revenue['current'], 2),
+            'revenue_candidate': round(self.revenue['candidate'], 2),
+            'final_price_change_percent': dict(zip(labels, self.buckets.tolist())),
+            'fields': {
+                name: {
+                    'mean_delta': round(self._sum[name] / n, 6),
+                    'mean_abs_delta': round(self._sum_abs[name] / n, 6),
+                    'max_increase': round(self._max_up[name][0], 6),
+                    'max_increase_row': self._max_up[name][1],
+                    'max_decrease': round(self._max_down[name][0], 6),
+                    'max_decrease_row': self._max_down[name][1],
+                }
+                for name in DIFF_FIELDS
+            },
+        }
+
+    def write_csv(self, out: IO[bytes], delimiter: str = ';', encoding: str = 'utf-8-sig') -> None:
+        """
+        Отчет в CSV (заголовок — report_columns), запись блоками слияния.
+        Значения полей пишутся с фиксированным числом знаков (как округлены),
+        пустая ячейка — значения нет.
+        """
+        encoder = codecs.getincrementalencoder(encoding)(errors='replace')
+        line = _csv_format(delimiter)
+        out.write(encoder.encode(delimiter.join(report_columns()) + '\r\n'))
+        for block in self.record_blocks():
+            for start in range(0, len(block), _WRITE_ROWS):
+                text = ''.join(
+                    line % tuple(row) if None not in row
+                    else delimiter.join('' if v is None else str(v) for v in row) + '\r\n'
+                    for row in _report_rows(block[start:start + _WRITE_ROWS])
+                )
+                out.write(encoder.encode(text))
+        out.write(encoder.encode('', final=True))
+
+    def write_xlsx(self, out: IO[bytes], max_rows: int = XLSX_MAX_ROWS) -> None:
+        """Отчет в xlsx: лист "Итоги" и листы строк (новый лист каждые max_rows строк)."""
+        writer = StreamingXlsxWriter(number_formats=['0.0000'])
+        summary = writer.add_sheet('Итоги', ['Показатель', 'Значение'])
+        for name, value in _flatten(self.stats()):
+            summary.append([name, value])
+
+        columns = report_columns()
+        formats = {c: '0.0000' for c in columns if c.endswith(('_current', '_candidate', '_delta'))}
+        sheet = writer.add_sheet('Изменения 1', columns, formats)
+        sheets = 1
+        for row in self.records():
+            if sheet.rows > max_rows:
+                sheets += 1
+                sheet = writer.add_sheet(f'Изменения {sheets}', columns, formats)
+            sheet.append(row)
+        writer.close(out)
+
+
+class _RunReader:
+    """Последовательное чтение серии (.npy) блоками через файл, без mmap всей серии."""
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        fmt = np.lib.format
+        version = fmt.read_magic(self._file)
+        read_header = fmt.read_array_header_1_0 if version == (1, 0) else fmt.read_array_header_2_0
+        shape, _, dtype = read_header(self._file)
+        self.dtype = dtype
+        self.remaining = shape[0]
+
+    def read(self, rows: int) -> np.ndarray:
+        count = min(rows, self.remaining)
+        self.remaining -= count
+        data = self._file.read(count * self.dtype.itemsize)
+        return np.frombuffer(data, dtype=self.dtype)
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def _report_rows(block: np.ndarray) -> List[List[Any]]:
+    columns = [block[name].tolist() for name in ('row', *ORDER_REPORT_FIELDS)]
+    for name in DIFF_FIELDS:
+        old = block[f'{name}_current']
+        new = block[f'{name}_candidate']
+        delta = np.round(new - old, RESULT_FIELDS[name][2])
+        columns += [_nullable(old), _nullable(new), _nullable(delta)]
+    return [list(row) for row in zip(*columns)]
+
+
+def _csv_format(delimiter: str) -> str:
+    # Формат строки CSV: %-форматирование быстрее csv.writer для чисел
+    parts = ['%d', '%s'] + ['%r'] * (len(ORDER_REPORT_FIELDS) - 2) + ['%d']
+    for name in DIFF_FIELDS:
+        parts += [f'%.{RESULT_FIELDS[name][2]}f'] * 3
+    return delimiter.join(parts) + '\r\n'
+
+
+def _nullable(values: np.ndarray) -> List[Any]:
+    out = values.tolist()
+    if np.isnan(values).any():
+        out = [None if v != v else v for v in out]
+    return out
+
+
+def _bucket_labels() -> List[str]:
+    bounds = CHANGE_BUCKETS
+    zero = bounds.index(0.0)
+    labels = [f'< {bounds[0]:g}']
+    for idx, (low, high) in enumerate(zip(bounds, bounds[1:])):
+        labels.append(f'{low:g}..{high:g}')
+        if idx + 1 == zero:
+            labels.append('0')
+    labels.append(f'> {bounds[-1]:g}')
+    return labels
+
+
+def _flatten(stats: Mapping[str, Any], prefix: str = '') -> Iterator[Tuple[str, Any]]:
+    for name, value in stats.items():
+        if isinstance(value, Mapping):
+            yield from _flatten(value, f'{prefix}{name}.')
+        else:
+            yield f'{prefix}{name}', value
+
+
+def iter_order_file(path: str, chunk_rows: int = 50_000) -> Iterator[Dict[str, List[Any]]]:
+    """
+    Книга заказов блоками плоских колонок: CSV (заголовок — имена колонок пакета,
+    разделитель ';' или ',', пустая ячейка — значения нет) или JSON lines (.jsonl).
+    """
+    if path.lower().endswith(('.jsonl', '.ndjson')):
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from _chunks((json.loads(line) for line in f if line.strip()), chunk_rows)
+        return
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        header = f.readline()
+        delimiter = ';' if header.count(';') >= header.count(',') else ','
+        names = next(csv.reader([header], delimiter=delimiter))
+        reader = csv.reader(f, delimiter=delimiter)
+        rows = ({name: value for name, value in zip(names, values) if value != ''} for values in reader)
+        yield from _chunks(rows, chunk_rows)
+
+
+def _chunks(rows: Iterable[Mapping[str, Any]], chunk_rows: int) -> Iterator[Dict[str, List[Any]]]:
+    batch: List[Mapping[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_rows:
+            yield rows_to_columns(batch)
+            batch = []
+    if batch:
+        yield rows_to_columns(batch)
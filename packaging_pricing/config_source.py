@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Mapping, Optional, Tuple, Union
+from .batch import PipelineBatch
+from .cache import config_fingerprint
+from .errors import CalculationError
+from .models import CalculationResult, OrderInput, PipelineDefinition, PricingConfig
+from .pipeline import PricingPipeline
+from .prepared import PreparedConfig
+from .registry import PipelineFactory, resolve_pipeline
+
+logger = logging.getLogger(__name__)
+
+_YAML_SUFFIXES = ('.yaml', '.yml')
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """
+    Неизменяемый снимок активного конфига: сам конфиг, его версия (хэш),
+    пайплайн по определению фабрики (расчет заказа) и предрасчитанные
+    таблицы для пакетного расчета. Запрос берет снимок один раз и работает
+    с ним до конца, даже если в это время конфиг заменили.
+    """
+    config: PricingConfig
+    version: str
+    pipeline: PricingPipeline
+    prepared: PreparedConfig
+    source: str = 'default'
+    loaded_at: float = field(default_factory=time.time)
+    factory: Optional[PipelineFactory] = field(default=None, repr=False, compare=False)
+    resources: Optional[Mapping[str, Mapping[str, Any]]] = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def build(cls, config: PricingConfig, source: str = 'default', factory: Optional[PipelineFactory] = None,
+              resources: Optional[Mapping[str, Mapping[str, Any]]] = None) -> 'ConfigSnapshot':
+        """
+        factory — определение пайплайна (по умолчанию стандартные шаги и табличный брак),
+        resources — общие ресурсы шагов (см. PipelineFactory.build). Таблицы строятся
+        с провайдером брака фабрики.
+        """
+        factory = factory or resolve_pipeline()
+        return cls(
+            config=config, version=config_fingerprint(config),
+            pipeline=factory.build(config, resources),
+            prepared=PreparedConfig(config, factory.scrap_provider),
+            source=source, factory=factory, resources=resources
+        )
+
+    def derive(self, config: PricingConfig, source: str) -> 'ConfigSnapshot':
+        """Снимок другого конфига с тем же определением пайплайна и ресурсами."""
+        return ConfigSnapshot.build(config, source, self.factory, self.resources)
+
+    @property
+    def standard_steps(self) -> bool:
+        """Пайплайн — стандартные шаги без опций, т.е. PreparedConfig считает то же самое."""
+        return self.factory is None or self.factory.standard_steps
+
+    @property
+    def batch(self) -> Union[PreparedConfig, PipelineBatch]:
+        """
+        Расчет пакетов: векторные таблицы, если пайплайн стандартный, иначе
+        построчно сам пайплайн (его шаги таблицы не повторяют).
+        """
+        return self.prepared if self.standard_steps else PipelineBatch(self.pipeline)
+
+    def try_quote(self, order: OrderInput) -> Union[Tuple[CalculationResult, Dict[str, Any]], CalculationError]:
+        """Результат и неокругленные промежуточные значения пайплайна или ошибка данных заказа."""
+        outcome = self.pipeline.try_run(order)
+        if isinstance(outcome, CalculationError):
+            return outcome
+        return outcome.final_result, outcome.intermediates
+
+
+class ConfigStore:
+    """
+    Хранилище активного конфига с атомарной заменой снимка.
+    Чтение (current) — одно чтение ссылки, без блокировки: присваивание
+    атрибута атомарно, а снимок неизменяем. Блокировка только упорядочивает
+    писателей (POST /api/config и наблюдатель за файлом).
+    Все снимки строятся по одному определению пайплайна factory (с ресурсами resources).
+    """
+    def __init__(self, config: PricingConfig, source: str = 'default', factory: Optional[PipelineFactory] = None,
+                 resources: Optional[Mapping[str, Mapping[str, Any]]] = None):
+        self._lock = threading.Lock()
+        self.current = ConfigSnapshot.build(config, source, factory, resources)
+
+    def publish(self, config: PricingConfig, source: str = 'api') -> ConfigSnapshot:
+        """Сделать конфиг активным. Таблицы строятся до замены; тот же конфиг не заменяется."""
+        snapshot = self.current.derive(config, source)
+        with self._lock:
+            if snapshot.version != self.current.version:
+                self.current = snapshot
+                logger.info("Активный конфиг %s (%s)", snapshot.version, source)
+            return self.current
+
+
+def _parse(text: str, path: str) -> Dict[str, Any]:
+    if path.lower().endswith(_YAML_SUFFIXES):
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError("Для конфига в YAML нужен пакет PyYAML (pip install pyyaml)") from e
+        return yaml.safe_load(text)
+    return json.loads(text)
+
+
+def load_config_file(path: str) -> PricingConfig:
+    """Прочитать и проверить конфиг из JSON/YAML файла (формат по расширению)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return PricingConfig.model_validate(_parse(f.read(), path))
+
+
+def load_pipeline_file(path: str) -> PipelineDefinition:
+    """Прочитать определение пайплайна (шаги и провайдер брака) из JSON/YAML файла."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return PipelineDefinition.model_validate(_parse(f.read(), path))
+
+
+def write_config_file(path: str, config: PricingConfig) -> None:
+    """
+    Записать конфиг атомарно: во временный файл рядом и os.replace,
+    чтобы наблюдатель и другие воркеры не прочитали файл наполовину.
+    """
+    data = config.model_dump(mode='json')
+    if path.lower().endswith(_YAML_SUFFIXES):
+        import yaml
+        text = yaml.safe_dump(data, allow_unicode=True, sort_keys=False)
+    else:
+        text = json.dumps(data, ensure_ascii=False, indent=2) + '\n'
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.config-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class ConfigFileWatcher:
+    """
+    Следит за файлом конфига опросом stat (без внешних сервисов и зависимостей)
+    и публикует новую версию в ConfigStore. Невалидный файл не применяется:
+    остается прежний конфиг, ошибка доступна в last_error.
+    """
+    def __init__(self, path: str, store: ConfigStore, interval: float = 1.0):
+        self.path = path
+        self.store = store
+        self.interval = interval
+        self.last_error: Optional[str] = None
+        self._signature = None
+        self._digest: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def check(self) -> bool:
+        """Один опрос файла. True, если активный конфиг сменился."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            self.last_error = f"Файл конфига не найден: {self.path}"
+            return False
+        signature = (st.st_mtime_ns, st.st_size, st.st_ino)
+        if signature == self._signature:
+            return False
+        # Невалидный файл тоже запоминаем: следующая попытка — после следующей записи
+        self._signature = signature
+
+        try:
+            with open(self.path, 'rb') as f:
+                raw = f.read()
+            digest = hashlib.sha256(raw).hexdigest()
+            if digest == self._digest:
+                return False
+            config = PricingConfig.model_validate(_parse(raw.decode('utf-8'), self.path))
+        except Exception as e:
+            self.last_error = str(e)
+            logger.warning("Конфиг %s не применен: %s", self.path, e)
+            return False
+
+        self._digest = digest
+        self.last_error = None
+        before = self.store.current.version
+        return self.store.publish(config, source=f"file:{self.path}").version != before
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self) -> None:
+        if self._thread is None:
+            self.check()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='config-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,26 @@
+from .models import PricingConfig
+
+# Встроенный конфиг: им работает сервер без CONFIG_FILE, он же — конфиг
+# по умолчанию скриптов отчетов (config_diff_report.py, parity_report.py).
+DEFAULT_CONFIG = PricingConfig(
+    material_price_bopp=200.0,
+    material_price_cpp=220.0,
+    k1_salary_coeff=3.6,
+    box_cost=50.0,
+    scrap_return_price=10.0,
+    k2_margin_divisor=2.3,
+    k3_margin_multiplier=1.7,
+    rop_overhead=6.0,
+    feature_rates={
+        "glue": 0.5,
+        "dead_glue": 0.3,
+        "euroslot_pvd": 1.5,
+        "euroslot_bopp": 1.2,
+        "clips": 2.0
+    },
+    electricity_rate=0.0095,
+    salary_std_small=0.04,
+    salary_std_large=0.053,
+    salary_wicket_small=0.075,
+    salary_wicket_large=0.078
+)
@@ -0,0 +1,62 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+from .models import Features
+
+# Известные типы еврослота (ставки feature_rates['euroslot_<тип>'])
+EUROSLOT_TYPES = ('pvd', 'bopp')
+
+
+@dataclass(frozen=True)
+class CalculationError:
+    """
+    Ожидаемая проблема данных заказа, возвращаемая вместо исключения
+    (шагом пайплайна или пакетной проверкой).
+    Поля в формате ошибок pydantic/FastAPI: type, loc, msg.
+    """
+    type: str
+    msg: str
+    loc: Tuple[Any, ...] = ()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'type': self.type, 'loc': list(self.loc), 'msg': self.msg}
+
+
+class CalculationFailed(ValueError):
+    """Исключение для вызывающих, которым нужен результат или исключение (calculate/run)."""
+    def __init__(self, error: CalculationError):
+        super().__init__(error.msg)
+        self.error = error
+
+
+def missing_intermediate(step_name: str, key: str) -> CalculationError:
+    return CalculationError(
+        type='missing_intermediate',
+        msg=f"Шагу {step_name} не хватает промежуточного результата: {key}",
+        loc=('intermediates', key)
+    )
+
+
+def formula_error(target: str) -> CalculationError:
+    """Своя формула конфига (PricingConfig.formulas) не дала конечного значения."""
+    return CalculationError(
+        type='formula_error',
+        msg=f"Formula for {target} gives no finite value for this order",
+        loc=('formulas', target)
+    )
+
+
+UNKNOWN_EUROSLOT_MSG = "Unknown euroslot type, expected 'pvd' or 'bopp'"
+INVALID_FEATURES_MSG = "glue_tape and dead_tape are mutually exclusive"
+FORMULA_ERROR_MSG = "Config formulas give no finite price for this order"
+
+
+def check_features(features: Features) -> Optional[CalculationError]:
+    """
+    Проверка опций, от которых зависит тарификация. Не бросает исключений:
+    неизвестный еврослот раньше молча не тарифицировался, теперь это ошибка заказа.
+    """
+    if features.glue_tape and features.dead_tape:
+        return CalculationError(type='invalid_features', msg=INVALID_FEATURES_MSG, loc=('features',))
+    if features.euroslot and features.euroslot.lower() not in EUROSLOT_TYPES:
+        return CalculationError(type='unknown_euroslot', msg=UNKNOWN_EUROSLOT_MSG, loc=('features', 'euroslot'))
+    return None
@@ -1,6 +1,14 @@
 import pandas as pd
+import numpy as np
+import codecs
+import csv
 import io
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
 from .models import OrderInput, CalculationResult, BagType
+from .prepared import round_columns
+from .xlsx import StreamingXlsxWriter
+from .tracing import tracer
 
 COLUMNS = [
     'Номенклатурная группа',
@@ -29,10 +37,20 @@ COLUMNS = [
     'Общая себестоимость'
 ]
 
-def generate_row_data(order: OrderInput, result: CalculationResult, k2: float = 2.3, k3: float = 1.7) -> dict:
+# (order, result) or (order, result, unrounded intermediates)
+Quote = Union[Tuple[OrderInput, CalculationResult], Tuple[OrderInput, CalculationResult, Dict[str, Any]]]
+
+
+def generate_row_data(order: OrderInput, result: CalculationResult, k2: float = 2.3, k3: float = 1.7,
+                      intermediates: Optional[Dict[str, Any]] = None) -> dict:
     """
     Generates the dictionary representing the single row of Excel data.
     k2, k3 - margin coefficients from config
+    intermediates - unrounded pipeline intermediates (PipelineContext.intermediates).
+    When given, the cost breakdown is
+    derived from them, so that VC + fixed + ROP + risks equals the final price
+    before its rounding; without them it is derived from the rounded result
+    fields with the same formula. Every export of a priced order passes them.
     """
     # 1. Format Product Name
     feat_str = []
@@ -54,20 +72,26 @@ def generate_row_data(order: OrderInput, result: CalculationResult, k2: float =
     # Unit Costs (already per unit from result)
     elec_unit = result.details.get('electricity', 0.0)
     box_unit = result.details.get('box_component', 0.0)
-    mat_unit = result.material_cost + result.scrap_cost
-    labor_unit = result.labor_cost
-    overhead_unit = result.overhead_cost # ROP part
-    
-    # Variable cost per unit
-    vc_unit = result.variable_cost
+    if intermediates is None:
+        mat_unit = result.material_cost + result.scrap_cost
+        labor_unit = result.labor_cost
+        overhead_unit = result.overhead_cost # ROP part
+
+        # Variable cost per unit
+        vc_unit = result.variable_cost
+    else:
+        mat_unit = intermediates['material_base_cost'] + intermediates['scrap_cost']
+        labor_unit = intermediates['labor_cost']
+        overhead_unit = intermediates['overhead_cost']
+        vc_unit = intermediates['variable_cost']
+
     # Margin component per unit: VC / K2
     # "Постоянные расходы" по логике Price = (VC/K2 + VC)...
     fixed_costs_unit = vc_unit / k2
     
-    # Margin multiplier component: (VC/K2 + VC) * (K3 - 1)
-    # "Риски" (Profit/Margin)
-    base_for_k3 = fixed_costs_unit + vc_unit
-    risks_unit = base_for_k3 * (k3 - 1.0)
+    # Margin multiplier component: (VC/K2 + VC + ROP) * (K3 - 1)
+    # "Риски" (Profit/Margin), as in Price = (VC/K2 + VC + ROP) * K3
+    risks_unit = (fixed_costs_unit + vc_unit + overhead_unit) * (k3 - 1.0)
 
     # Total Cost per unit (Final Price)
     total_cost_unit = result.final_price
@@ -101,38 +125,293 @@ def generate_row_data(order: OrderInput, result: CalculationResult, k2: float =
         'Общая себестоимость': round(total_cost_unit, 4)
     }
 
-def generate_excel_bytes(order: OrderInput, result: CalculationResult, k2: float = 2.3, k3: float = 1.7) -> io.BytesIO:
+def generate_excel_bytes(order: OrderInput, result: CalculationResult, k2: float = 2.3, k3: float = 1.7,
+                         intermediates: Optional[Dict[str, Any]] = None) -> io.BytesIO:
     """
     Generates an Excel file replicating the structure of the source cost data.
+    intermediates - as in generate_row_data.
     """
-    row_data = generate_row_data(order, result, k2, k3)
-    df = pd.DataFrame([row_data], columns=COLUMNS)
+    with tracer.start_as_current_span('export.row_data'):
+        row_data = generate_row_data(order, result, k2, k3, intermediates)
+    with tracer.start_as_current_span('export.dataframe'):
+        df = pd.DataFrame([row_data], columns=COLUMNS)
     
     output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Расчет')
-        
-        # Auto-size columns
-        worksheet = writer.sheets['Расчет']
-        for idx, col in enumerate(worksheet.columns):
-            max_length = 0
-            # Get header length
-            column = col[0].column_letter # Get the column name
-            header_val = col[0].value
-            if header_val:
-                max_length = len(str(header_val))
+    with tracer.start_as_current_span('export.write_workbook'):
+        with pd.ExcelWriter(output, engine='openpyxl') as writer:
+            with tracer.start_as_current_span('export.write_sheet'):
+                df.to_excel(writer, index=False, sheet_name='Расчет')
             
-            # Check data length
-            for cell in col:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            
-            # Set width (approximate factor)
-            adjusted_width = (max_length + 2) * 1.2
-            worksheet.column_dimensions[col[0].column_letter].width = adjusted_width
+            # Auto-size columns
+            with tracer.start_as_current_span('export.autosize'):
+                worksheet = writer.sheets['Расчет']
+                for idx, col in enumerate(worksheet.columns):
+                    max_length = 0
+                    # Get header length
+                    column = col[0].column_letter # Get the column name
+                    header_val = col[0].value
+                    if header_val:
+                        max_length = len(str(header_val))
+                    
+                    # Check data length
+                    for cell in col:
+                        try:
+                            if len(str(cell.value)) > max_length:
+                                max_length = len(str(cell.value))
+                        except:
+                            pass
+                    
+                    # Set width (approximate factor)
+                    adjusted_width = (max_length + 2) * 1.2
+                    worksheet.column_dimensions[col[0].column_letter].width = adjusted_width
         
     output.seek(0)
     return output
+
+
+def row_columns(orders: Mapping[str, Any], results: Mapping[str, np.ndarray], valid: np.ndarray,
+                k2: float = 2.3, k3: float = 1.7,
+                intermediates: Optional[Mapping[str, np.ndarray]] = None) -> Dict[str, Any]:
+    """
+    Column-wise counterpart of generate_row_data for priced batches.
+    orders - normalized order columns (batch.validate_columns),
+    results - CalculationResult field columns (batch.price_validated),
+    intermediates - unrounded intermediate columns (the intermediates argument
+    of batch.price_validated), as in generate_row_data.
+    Numeric columns are NumPy arrays (values in invalid rows are undefined,
+    mask them with valid), text columns are lists (None in invalid rows).
+    Same formulas and rounding as generate_row_data, value for value.
+    """
+    n = len(valid)
+    quantity = np.asarray(orders['quantity'], dtype=np.int64)
+    if not intermediates:
+        material = results['material_cost'] + results['scrap_cost']
+        labor = results['labor_cost']
+        overhead = results['overhead_cost']
+        vc = results['variable_cost']
+    else:
+        material = intermediates['material_base_cost'] + intermediates['scrap_cost']
+        labor = intermediates['labor_cost']
+        overhead = intermediates['overhead_cost']
+        vc = intermediates['variable_cost']
+    fixed = vc / k2
+    zeros = np.zeros(n, dtype=np.int64)
+
+    def values(name: str) -> list:
+        column = orders[name]
+        return column.tolist() if isinstance(column, np.ndarray) else list(column)
+
+    is_valid = valid.tolist()
+    names: List[Optional[str]] = [None] * n
+    texts = zip(values('product_type'), values('width'), values('length'), values('flap'), values('fold'),
+                values('thickness'), values('is_wicket'), values('glue_tape'))
+    for idx, (bag, width, length, flap, fold, thickness, wicket, glue) in enumerate(texts):
+        if not is_valid[idx]:
+            continue
+        feat_str = []
+        if wicket: feat_str.append("викет")
+        if glue: feat_str.append("кл.клапан")
+        dims = f"{float(width)}x{float(length)}"
+        if flap > 0:
+            dims += f"+{float(flap)}"
+        if fold > 0:
+            dims += f"(ф{float(fold)})"
+        names[idx] = f"Пакет {bag} {' '.join(feat_str)} {dims} {float(thickness)}мкм"
+
+    def text(value: str) -> List[Optional[str]]:
+        return [value if ok else None for ok in is_valid]
+
+    return {
+        'Номенклатурная группа': text('Пакеты (Расчет)'),
+        'Родственность': text('ГУ пакеты'),
+        'Продукция': names,
+        'Единица хранения остатков': text('шт'),
+        'Код': text(''),
+        'Схема печати': [s if ok else None for s, ok in zip(values('print_scheme'), is_valid)],
+        'Тираж': quantity,
+        'Вес': round_columns(results['weight_grams'] * quantity / 1000.0, 3),
+        'Краска': zeros,
+        'Скотч': zeros,
+        'Расходы на электроэнергию': zeros,
+        'Упаковка': zeros,
+        'Втулка': zeros,
+        'ЗП ИТОГО': round_columns(labor, 4),
+        'ЗП выгонка': zeros,
+        'ЗП ламинация': zeros,
+        'ЗП печать': zeros,
+        'ЗП рубка': zeros,
+        'ЗП резка': zeros,
+        'Сырье': round_columns(material, 4),
+        'Постоянные расходы ГУ': round_columns(overhead, 4),
+        'Постоянные расходы': round_columns(fixed, 4),
+        'Риски': round_columns((fixed + vc + overhead) * (k3 - 1.0), 4),
+        'Общая себестоимость': round_columns(results['final_price'], 4),
+    }
+
+
+# Encodings accepted by downstream consumers of delimited exports:
+# cp1251 for 1C import scripts, utf-8-sig (BOM) so that Excel detects UTF-8
+DELIMITED_ENCODINGS = ('utf-8-sig', 'utf-8', 'cp1251')
+
+
+def iter_row_data(quotes: Iterable[Quote], k2: float = 2.3, k3: float = 1.7) -> Iterator[dict]:
+    """Lazily maps (order, result[, intermediates]) quotes to export rows."""
+    for order, result, *intermediates in quotes:
+        yield generate_row_data(order, result, k2, k3, *intermediates)
+
+
+def iter_delimited(rows: Iterable[Dict[str, Any]], delimiter: str = ';', encoding: str = 'utf-8-sig',
+                   decimal: str = '.', chunk_rows: int = 500) -> Iterator[bytes]:
+    """
+    Streams rows as CSV/TSV in COLUMNS order, header first.
+    Rows are written as they are produced (no DataFrame), encoded and flushed
+    every chunk_rows rows. Characters missing from the target encoding are
+    replaced instead of failing mid-stream. decimal=',' writes floats with a
+    decimal comma (Russian-locale Excel with ';' as the delimiter).
+    """
+    if encoding not in DELIMITED_ENCODINGS:
+        raise ValueError(f"Unsupported encoding: {encoding}")
+    encoder = codecs.getincrementalencoder(encoding)(errors='replace')
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator='\r\n')
+
+    def flush() -> bytes:
+        chunk = encoder.encode(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+    writer.writerow(COLUMNS)
+    pending = 0
+    for row in rows:
+        values = [row.get(column, '') for column in COLUMNS]
+        if decimal != '.':
+            values = [str(v).replace('.', decimal) if isinstance(v, float) else v for v in values]
+        writer.writerow(values)
+        pending += 1
+        if pending >= chunk_rows:
+            yield flush()
+            pending = 0
+    yield flush() + encoder.encode('', final=True)
+
+
+# Proposal workbooks: grouping keys for sheets
+PROPOSAL_GROUPS = {
+    'product_type': lambda order: order.product_type.value,
+    'print_scheme': lambda order: order.print_scheme,
+}
+
+SUMMARY_COLUMNS = [
+    'Группа',
+    'Заказов',
+    'Тираж итого',
+    'Вес итого, кг',
+    'Выручка',
+    'Переменные затраты',
+    'Маржа',
+    'Средневзвешенная маржа, %'
+]
+
+# Number formats for proposal sheets (cells without a format get the column one)
+_COLUMN_FORMATS = {
+    'Тираж': '#,##0',
+    'Вес': '0.000',
+    'ЗП ИТОГО': '0.0000',
+    'Сырье': '0.0000',
+    'Постоянные расходы ГУ': '0.0000',
+    'Постоянные расходы': '0.0000',
+    'Риски': '0.0000',
+    'Общая себестоимость': '0.00',
+}
+
+_SUMMARY_FORMATS = {
+    'Тираж итого': '#,##0',
+    'Вес итого, кг': '#,##0.000',
+    'Выручка': '#,##0.00',
+    'Переменные затраты': '#,##0.00',
+    'Маржа': '#,##0.00',
+    'Средневзвешенная маржа, %': '0.00',
+}
+
+_SHEET_NAME_INVALID = re.compile(r'[\\/*?:\[\]]')
+
+
+def _sheet_title(name: str, used: set) -> str:
+    """Excel sheet names: max 31 chars, no []:*?/\\, unique within the workbook."""
+    base = _SHEET_NAME_INVALID.sub('_', str(name)).strip() or 'Без группы'
+    base = base[:31]
+    title, n = base, 2
+    while title.lower() in used:
+        suffix = f' ({n})'
+        title = base[:31 - len(suffix)] + suffix
+        n += 1
+    used.add(title.lower())
+    return title
+
+
+def generate_proposal_excel_bytes(quotes: Iterable[Quote],
+                                  k2: float = 2.3, k3: float = 1.7,
+                                  group_by: str = 'product_type') -> io.BytesIO:
+    """
+    Generates a price proposal workbook for many orders.
+    quotes - iterable of (order, result) pairs or (order, result, intermediates)
+    triples (see generate_row_data); consumed once, in a single pass.
+    Orders are grouped into sheets by `group_by` ('product_type' or 'print_scheme'),
+    rows use the same COLUMNS as the single-order export. The first sheet is a
+    summary with totals and quantity-weighted margins per group.
+
+    Rows are streamed straight into the sheets (see xlsx.StreamingXlsxWriter):
+    no DataFrame, number formats and column styles are set up once per sheet.
+    """
+    if group_by not in PROPOSAL_GROUPS:
+        raise ValueError(f"Неизвестная группировка: {group_by}. Допустимо: {', '.join(PROPOSAL_GROUPS)}")
+    group_key = PROPOSAL_GROUPS[group_by]
+
+    writer = StreamingXlsxWriter()
+    used_titles = set()
+    summary = writer.add_sheet(_sheet_title('Сводка', used_titles), SUMMARY_COLUMNS, _SUMMARY_FORMATS)
+
+    sheets = {}
+    totals = {}
+    for order, result, *intermediates in quotes:
+        key = group_key(order)
+        sheet = sheets.get(key)
+        if sheet is None:
+            sheet = writer.add_sheet(_sheet_title(key, used_titles), COLUMNS, _COLUMN_FORMATS)
+            sheets[key] = sheet
+            totals[key] = [0, 0, 0.0, 0.0, 0.0, 0.0]
+
+        row_data = generate_row_data(order, result, k2, k3, *intermediates)
+        sheet.append([row_data[col] for col in COLUMNS])
+
+        # Per-group accumulators: orders, qty, weight kg, revenue, VC, margin
+        qty = order.quantity
+        t = totals[key]
+        t[0] += 1
+        t[1] += qty
+        t[2] += row_data['Вес']
+        t[3] += result.final_price * qty
+        t[4] += result.variable_cost * qty
+        t[5] += (result.final_price - result.variable_cost - result.overhead_cost) * qty
+
+    grand = [0, 0, 0.0, 0.0, 0.0, 0.0]
+    for key, t in totals.items():
+        summary.append(_summary_row(str(key), t))
+        grand = [a + b for a, b in zip(grand, t)]
+    summary.append(_summary_row('ИТОГО', grand))
+
+    return writer.close()
+
+def _summary_row(label: str, t) -> list:
+    orders, qty, weight, revenue, vc, margin = t
+    margin_pct = (margin / revenue * 100.0) if revenue else 0.0
+    return [
+        label,
+        orders,
+        qty,
+        round(weight, 3),
+        round(revenue, 2),
+        round(vc, 2),
+        round(margin, 2),
+        round(margin_pct, 2)
+    ]
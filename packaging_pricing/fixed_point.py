@@ -0,0 +1,424 @@
+import time
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Mapping, Optional, Sequence, Union
+import numpy as np
+from .interfaces import ScrapRateProvider
+from .errors import CalculationFailed
+from .layout import LAYOUT_SCALE, cached_layout, layout_details, no_roll_layout, solve_layout, solve_layouts
+from .models import BagType, CalculationResult, OrderInput, PricingConfig
+from .prepared import (
+    PreparedConfig, RESULT_FIELDS, ORDER_COLUMNS, OPTION_COUNT, OPTION_GLUE, OPTION_DEAD_GLUE,
+    OPTION_EUROSLOT_PVD, OPTION_EUROSLOT_BOPP, WIDTH_SMALL_MAX, _BAG_TYPES, column_keys, order_columns, result_columns, table_key
+)
+from .cache import LRUCache
+from .scraps import TableBasedScrapProvider
+
+# Расчет в целых числах с фиксированной точкой (int64), без двоичной погрешности float.
+#
+# Масштабы:
+#   деньги на пакет — нанорубли (1e-9 руб), вес — нанограммы;
+#   цены за кг (сырье, возврат брака, ROP) — 1e-4 руб/кг;
+#   доли (брак) и коэффициенты конфига (K1, K2, K3) — миллионные;
+#   размеры — сотые см, толщина — сотые мкм, плотность — 1e-4 г/см3.
+# Константы конфига переводятся в масштаб один раз, точно по десятичной записи.
+# Каждое деление округляется половиной вверх (от нуля), как в бухгалтерии;
+# round() во float-пути округляет двоичное значение к четному. Запас в 5 знаков
+# между внутренним масштабом и 4 знаками результата делает влияние
+# промежуточных округлений на поля CalculationResult пренебрежимо редким.
+
+NANO = 10 ** 9
+PRICE_SCALE = 10 ** 4
+RATE_SCALE = 10 ** 6
+LENGTH_SCALE = 100
+DENSITY_SCALE = 10 ** 4
+
+# Граница, после которой произведение int64 может переполниться (с запасом)
+_INT64_SAFE = float(2 ** 62)
+
+
+def to_fixed(value: float, scale: int) -> int:
+    """Константа конфига в масштабе scale (по десятичной записи числа, половина вверх)."""
+    return int((Decimal(repr(float(value))) * scale).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+def div_round(numerator: np.ndarray, denominator: Union[int, np.ndarray]) -> np.ndarray:
+    """Целочисленное деление с округлением половины от нуля."""
+    numerator = np.asarray(numerator, dtype=np.int64)
+    quotient = (np.abs(numerator) + denominator // 2) // denominator
+    return np.where(numerator < 0, -quotient, quotient)
+
+
+def _mul(a: np.ndarray, b: Union[int, np.ndarray], overflow: np.ndarray) -> np.ndarray:
+    """
+    Построчное произведение int64 с проверкой границ до умножения: строки, где
+    оно может переполниться, отмечаются в overflow (на месте) и дают 0.
+    """
+    a = np.asarray(a, dtype=np.int64)
+    b = np.asarray(b, dtype=np.int64)
+    unsafe = np.abs(a).astype(np.float64) * np.abs(b).astype(np.float64) >= _INT64_SAFE
+    if unsafe.any():
+        overflow |= unsafe
+        a = np.where(unsafe, 0, a)
+    return a * b
+
+
+class FixedPointEngine:
+    """
+    Альтернативный движок пакетного расчета: та же цепочка формул, что в
+    PricingPipeline/PreparedConfig, но в масштабированных int64. Результат
+    точен в масштабе (1e-9 руб) и не зависит от порядка операций float;
+    поля CalculationResult округляются из целых половиной вверх.
+
+    Входные размеры квантуются до 0.01 см (толщина — до 0.01 мкм).
+    Свои формулы конфига (config.formulas) не поддерживаются — ValueError.
+    """
+    def __init__(self, config: PricingConfig, scrap_provider: Optional[ScrapRateProvider] = None):
+        if config.formulas:
+            raise ValueError("Fixed-point engine does not support config formulas")
+        self.config = config
+        self.scrap_provider = scrap_provider or TableBasedScrapProvider()
+
+        c = config
+        rates = c.feature_rates
+        option_rates = {
+            OPTION_GLUE: to_fixed(rates["glue"], NANO),
+            OPTION_DEAD_GLUE: to_fixed(rates["dead_glue"], NANO),
+            OPTION_EUROSLOT_PVD: to_fixed(rates["euroslot_pvd"], NANO),
+            OPTION_EUROSLOT_BOPP: to_fixed(rates["euroslot_bopp"], NANO),
+        }
+        k1 = to_fixed(c.k1_salary_coeff, RATE_SCALE)
+        salary = {
+            (0, 0): to_fixed(c.salary_std_small, NANO),
+            (0, 1): to_fixed(c.salary_std_large, NANO),
+            (1, 0): to_fixed(c.salary_wicket_small, NANO),
+            (1, 1): to_fixed(c.salary_wicket_large, NANO),
+        }
+        electricity = to_fixed(c.electricity_rate, NANO)
+        self.box_unit_cost = int(div_round(to_fixed(c.box_cost, NANO), 2000))
+        self.clips_cost = int(div_round(to_fixed(rates["clips"], NANO) * 2, 200))
+
+        size = len(_BAG_TYPES) * 2 * 2 * OPTION_COUNT
+        self.price_per_kg = np.zeros(size, dtype=np.int64)
+        self.salary_rate = np.zeros(size, dtype=np.int64)
+        self.labor_cost = np.zeros(size, dtype=np.int64)
+        self.clips_unit = np.zeros(size, dtype=np.int64)
+        self.fixed_unit = np.zeros(size, dtype=np.int64)
+        self.option_rate_per_cm = np.zeros(size, dtype=np.int64)
+
+        for bag_index, bag_type in enumerate(_BAG_TYPES):
+            price = to_fixed(c.material_price_bopp if bag_type == BagType.BOPP else c.material_price_cpp, PRICE_SCALE)
+            for is_wicket in (0, 1):
+                for is_wide in (0, 1):
+                    labor = int(div_round(salary[(is_wicket, is_wide)] * k1, RATE_SCALE))
+                    clips = self.clips_cost if is_wicket else 0
+                    for mask in range(OPTION_COUNT):
+                        key = table_key(bag_index, is_wicket, is_wide, mask)
+                        self.price_per_kg[key] = price
+                        self.salary_rate[key] = salary[(is_wicket, is_wide)]
+                        self.labor_cost[key] = labor
+                        self.clips_unit[key] = clips
+                        self.fixed_unit[key] = electricity + labor + self.box_unit_cost + clips
+                        self.option_rate_per_cm[key] = sum(
+                            rate for bit, rate in option_rates.items() if mask & bit
+                        )
+
+        self.electricity = electricity
+        self.density = to_fixed(c.density, DENSITY_SCALE)
+        self.scrap_return = to_fixed(c.scrap_return_price, PRICE_SCALE)
+        self.rop = to_fixed(c.rop_overhead, PRICE_SCALE)
+        self.k2 = to_fixed(c.k2_margin_divisor, RATE_SCALE)
+        self.k3 = to_fixed(c.k3_margin_multiplier, RATE_SCALE)
+        self.layouts = LRUCache(maxsize=4096)
+        self._prepared: Optional[PreparedConfig] = None
+
+    def price_columns(self, columns: Mapping[str, Sequence[Any]]) -> Dict[str, np.ndarray]:
+        """
+        Как PreparedConfig.price_columns, но значения — int64 в масштабе:
+        weight в нанограммах, scrap_rate в миллионных, денежные — в нанорублях.
+        Строки, чьи произведения не помещаются в int64 (допустимые схемой, но огромные
+        размеры), отмечены в overflow; их значения не определены.
+        """
+        n = len(columns['width'])
+        keys, bag_types = column_keys(columns)
+        width = _scaled_column(columns, 'width', n, LENGTH_SCALE)
+        fold = _scaled_column(columns, 'fold', n, LENGTH_SCALE)
+        length = _scaled_column(columns, 'length', n, LENGTH_SCALE)
+        flap = _scaled_column(columns, 'flap', n, LENGTH_SCALE)
+        thickness = _scaled_column(columns, 'thickness', n, LENGTH_SCALE)
+        quantity = np.asarray(columns['quantity'], dtype=np.int64)
+
+        # weight = (w + fold) * (l + flap/2) * t * 2 * density / 10000 [г]
+        # (l + flap/2) берется в двухсотых см, чтобы половина клапана была целой
+        overflow = np.zeros(n, dtype=bool)
+        area = _mul(width + fold, 2 * length + flap, overflow)
+        weight = div_round(_mul(_mul(area, thickness, overflow), self.density, overflow), 10 ** 5)
+
+        scrap_rate = np.rint(self.scrap_provider.get_scrap_rates(quantity, bag_types) * RATE_SCALE).astype(np.int64)
+
+        price = self.price_per_kg[keys]
+        per_cm = self.option_rate_per_cm[keys]
+        # г * руб/кг / 1000: нанограммы * (1e-4 руб/кг) / 1e7 -> нанорубли
+        material_base_cost = div_round(_mul(weight, price, overflow), 10 ** 7)
+        scrap_base = div_round(_mul(weight, price - self.scrap_return, overflow), 10 ** 7)
+        scrap_cost = div_round(_mul(scrap_base, scrap_rate, overflow), RATE_SCALE)
+        width_options = div_round(_mul(per_cm, width, overflow), LENGTH_SCALE)
+        vc = material_base_cost + scrap_cost + self.fixed_unit[keys] + width_options
+
+        # Обрезь раскладки (RollLayoutStep): вес * обрезь / (ручьи * ручей), ширины в сотых см
+        trim = np.zeros(n, dtype=np.int64)
+        trim_cost = np.zeros(n, dtype=np.int64)
+        no_layout = np.zeros(n, dtype=bool)
+        if self.config.roll_widths:
+            _, lanes, trim_width = solve_layouts(
+                (width + fold) / LENGTH_SCALE, self.config.roll_widths, self.config.roll_edge_trim, memo=self.layouts
+            )
+            no_layout = lanes == 0
+            lane_total = np.where(no_layout, 1, lanes * (width + fold))
+            trim_hundredths = np.rint(trim_width * LAYOUT_SCALE).astype(np.int64)
+            trim = div_round(_mul(weight, trim_hundredths, overflow), lane_total)
+            trim_cost = div_round(_mul(trim, price - self.scrap_return, overflow), 10 ** 7)
+            vc = vc + trim_cost
+
+        overhead_cost = div_round(_mul(weight, self.rop, overflow), 10 ** 7)
+        # ((VC / k2) + VC + rop * weight / 1000) * k3
+        base_price = div_round(_mul(vc, RATE_SCALE + self.k2, overflow), self.k2)
+        final_price = div_round(_mul(base_price + overhead_cost, self.k3, overflow), RATE_SCALE)
+
+        return {
+            'weight': weight,
+            'scrap_rate': scrap_rate,
+            'electricity': np.full(n, self.electricity, dtype=np.int64),
+            'salary_rate': self.salary_rate[keys],
+            'variable_cost': vc,
+            'material_base_cost': material_base_cost,
+            'scrap_cost': scrap_cost,
+            'labor_cost': self.labor_cost[keys],
+            'options_cost': width_options + self.clips_unit[keys],
+            'overhead_cost': overhead_cost,
+            'final_price': final_price,
+            'trim_weight': trim,
+            'trim_cost': trim_cost,
+            'no_layout': no_layout,
+            'overflow': overflow,
+        }
+
+    def price_results(self, columns: Mapping[str, Sequence[Any]]) -> Dict[str, np.ndarray]:
+        """
+        Колонки полей CalculationResult (float), округленные из целых половиной вверх.
+        Строки вне диапазона int64 считаются float-путем (PreparedConfig), а не роняют пакет.
+        """
+        intermediates = self.price_columns(columns)
+        out = fixed_result_columns(intermediates)
+        overflow = intermediates['overflow']
+        if overflow.any():
+            subset = {name: np.asarray(values)[overflow] for name, values in columns.items()}
+            for name, values in self._float_engine().price_results(subset).items():
+                out[name][overflow] = values
+        return out
+
+    def _float_engine(self) -> PreparedConfig:
+        if self._prepared is None:
+            self._prepared = PreparedConfig(self.config, self.scrap_provider)
+        return self._prepared
+
+    def calculate(self, order: OrderInput) -> CalculationResult:
+        """Расчет одного заказа (через пакет из одной строки); опции должны пройти errors.check_features."""
+        columns = order_columns([order])
+        intermediates = self.price_columns(columns)
+        layout = None
+        if self.config.roll_widths:
+            lane_width = order.width + order.fold
+            layout = cached_layout(self.layouts, lane_width, self.config.roll_widths, self.config.roll_edge_trim)
+            if layout is None:
+                raise CalculationFailed(no_roll_layout(lane_width))
+
+        if intermediates['overflow'][0]:
+            floats = self._float_engine().price_columns(columns)
+            values = {name: float(column[0]) for name, column in result_columns(floats).items()}
+            trim_cost = float(floats['trim_cost'][0])
+        else:
+            values = {name: column[0] for name, column in fixed_result_columns(intermediates).items()}
+            trim_cost = int(intermediates['trim_cost'][0]) / NANO
+        return CalculationResult(
+            **values,
+            details={
+                "electricity": self.electricity / NANO,
+                "salary_rate": int(intermediates['salary_rate'][0]) / NANO,
+                "box_component": self.box_unit_cost / NANO,
+                **layout_details(layout, trim_cost)
+            }
+        )
+
+
+def fixed_result_columns(intermediates: Mapping[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Аналог prepared.result_columns для целых значений движка (округление половины вверх).
+    Строки без раскладки на рулон — NaN, как во float-пути; переполненные (overflow) — тоже NaN.
+    """
+    out = {}
+    undefined = None
+    for mask in ('no_layout', 'overflow'):
+        if mask in intermediates:
+            undefined = intermediates[mask] if undefined is None else undefined | intermediates[mask]
+    for name, (key, scale, digits) in RESULT_FIELDS.items():
+        # доли — в миллионных, остальное — в 1e-9; -> единица последнего знака поля
+        unit = RATE_SCALE if key == 'scrap_rate' else NANO
+        step = unit // (scale * 10 ** digits)
+        out[name] = div_round(intermediates[key], step) / 10 ** digits
+        if undefined is not None and undefined.any():
+            out[name][undefined] = np.nan
+    return out
+
+
+def _scaled_column(columns: Mapping[str, Sequence[Any]], name: str, n: int, scale: int) -> np.ndarray:
+    if name not in columns:
+        return np.zeros(n, dtype=np.int64)
+    return np.rint(np.asarray(columns[name], dtype=np.float64) * scale).astype(np.int64)
+
+
+def random_order_columns(n: int, seed: int = 0) -> Dict[str, np.ndarray]:
+    """Случайный корпус валидных заказов (колонки ORDER_COLUMNS) в реалистичных диапазонах."""
+    rng = np.random.default_rng(seed)
+    options = rng.integers(0, 3, n)
+    columns = {
+        'product_type': rng.choice(np.array([t.value for t in _BAG_TYPES], dtype=object), n),
+        'width': rng.integers(10, 121, n) / 2,
+        'fold': rng.integers(0, 21, n) / 2 * (rng.random(n) < .4),
+        'length': rng.integers(20, 161, n) / 2,
+        'flap': rng.integers(0, 13, n) / 2 * (rng.random(n) < .5),
+        'thickness': rng.integers(20, 61, n).astype(np.float64),
+        'quantity': rng.integers(1000, 500001, n),
+        'is_wicket': rng.random(n) < .3,
+        'glue_tape': options == 1,
+        'dead_tape': options == 2,
+        'euroslot': rng.choice(np.array([None, 'pvd', 'bopp'], dtype=object), n, p=[.6, .2, .2]),
+    }
+    assert set(columns) == set(ORDER_COLUMNS)
+    return columns
+
+
+def _decimal_results(config: PricingConfig, scrap_provider: ScrapRateProvider,
+                     columns: Mapping[str, Sequence[Any]], rows: Sequence[int]) -> Dict[str, np.ndarray]:
+    """
+    Эталон: та же цепочка формул в Decimal без промежуточных округлений,
+    поля CalculationResult — округлением половины вверх. Медленно, для выборки.
+    """
+    def d(value: Any) -> Decimal:
+        return Decimal(repr(float(value)))
+
+    c = config
+    rates = c.feature_rates
+    salary = {
+        (False, False): c.salary_std_small, (False, True): c.salary_std_large,
+        (True, False): c.salary_wicket_small, (True, True): c.salary_wicket_large,
+    }
+    out = {name: np.zeros(len(rows)) for name in RESULT_FIELDS}
+    for j, i in enumerate(rows):
+        bag_type = BagType(columns['product_type'][i])
+        width = d(columns['width'][i])
+        is_wicket = bool(columns['is_wicket'][i])
+        slot = (columns['euroslot'][i] or '').lower()
+        price = d(c.material_price_bopp if bag_type == BagType.BOPP else c.material_price_cpp)
+
+        weight = (width + d(columns['fold'][i])) * (d(columns['length'][i]) + d(columns['flap'][i]) / 2) \
+            * d(columns['thickness'][i]) * 2 * d(c.density) / 10000
+        scrap_rate = d(scrap_provider.get_scrap_rate(int(columns['quantity'][i]), bag_type))
+        material = weight * price / 1000
+        scrap = weight / 1000 * scrap_rate * (price - d(c.scrap_return_price))
+        labor = d(salary[(is_wicket, bool(width > WIDTH_SMALL_MAX))]) * d(c.k1_salary_coeff)
+        per_cm = sum((
+            d(rates['glue']) if columns['glue_tape'][i] else Decimal(0),
+            d(rates['dead_glue']) if columns['dead_tape'][i] else Decimal(0),
+            d(rates['euroslot_pvd']) if slot == 'pvd' else Decimal(0),
+            d(rates['euroslot_bopp']) if slot == 'bopp' else Decimal(0),
+        ))
+        options = per_cm * width + (d(rates['clips']) * 2 / 200 if is_wicket else Decimal(0))
+        vc = material + scrap + d(c.electricity_rate) + labor + d(c.box_cost) / 2000 + options
+        if c.roll_widths:
+            lane_width = width + d(columns['fold'][i])
+            layout = solve_layout(float(lane_width), c.roll_widths, c.roll_edge_trim)
+            if layout is None:
+                for name in RESULT_FIELDS:
+                    out[name][j] = np.nan
+                continue
+            trim = weight * d(layout.trim_width) / (layout.lanes * lane_width)
+            vc += trim / 1000 * (price - d(c.scrap_return_price))
+        overhead = d(c.rop_overhead) * weight / 1000
+        final = (vc / d(c.k2_margin_divisor) + vc + overhead) * d(c.k3_margin_multiplier)
+
+        exact = {
+            'weight': weight, 'scrap_rate': scrap_rate, 'material_base_cost': material, 'scrap_cost': scrap,
+            'labor_cost': labor, 'overhead_cost': overhead, 'options_cost': options,
+            'variable_cost': vc, 'final_price': final,
+        }
+        for name, (key, scale, digits) in RESULT_FIELDS.items():
+            value = (exact[key] * scale).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP)
+            out[name][j] = float(value)
+    return out
+
+
+def _differs(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Поэлементное неравенство, где NaN (строка не посчитана) равен NaN."""
+    return (a != b) & ~(np.isnan(a) & np.isnan(b))
+
+
+def _mismatches(a: np.ndarray, b: np.ndarray) -> int:
+    return int(_differs(a, b).sum())
+
+
+def parity_report(config: PricingConfig, n: int = 100_000, seed: int = 0, exact_sample: int = 10_000,
+                  scrap_provider: Optional[ScrapRateProvider] = None) -> Dict[str, Any]:
+    """
+    Сравнение движка с фиксированной точкой с float-расчетом (PreparedConfig,
+    совпадающим с PricingPipeline) на случайном корпусе из n заказов.
+    По каждому полю CalculationResult: число расхождений, максимальная разница
+    в единицах последнего знака, максимальная разница неокругленных значений;
+    на выборке из exact_sample заказов — число расхождений каждого движка
+    с эталоном в Decimal. Плюс время расчета всех трех вариантов.
+    """
+    columns = random_order_columns(n, seed)
+    prepared = PreparedConfig(config, scrap_provider)
+    engine = FixedPointEngine(config, prepared.scrap_provider)
+
+    started = time.perf_counter()
+    float_intermediates = prepared.price_columns(columns)
+    float_results = result_columns(float_intermediates)
+    float_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    fixed_intermediates = engine.price_columns(columns)
+    fixed_results = fixed_result_columns(fixed_intermediates)
+    fixed_seconds = time.perf_counter() - started
+
+    sample = np.random.default_rng(seed).choice(n, size=min(exact_sample, n), replace=False)
+    started = time.perf_counter()
+    exact = _decimal_results(config, prepared.scrap_provider, columns, sample.tolist())
+    decimal_seconds = time.perf_counter() - started
+
+    fields = {}
+    for name, (key, scale, digits) in RESULT_FIELDS.items():
+        # строки без раскладки (NaN в обоих движках) не считаются расхождением
+        diff = np.nan_to_num(np.abs(fixed_results[name] - float_results[name]))
+        units = np.rint(diff * 10 ** digits).astype(np.int64)
+        unit = RATE_SCALE if key == 'scrap_rate' else NANO
+        raw = np.nan_to_num(np.abs(fixed_intermediates[key] / unit - float_intermediates[key]))
+        fields[name] = {
+            'mismatches': int((units > 0).sum()),
+            'max_last_digit_units': int(units.max()) if n else 0,
+            'max_unrounded_diff': float(raw.max()) if n else 0.0,
+            'float_vs_exact': _mismatches(float_results[name][sample], exact[name]),
+            'fixed_vs_exact': _mismatches(fixed_results[name][sample], exact[name]),
+        }
+
+    return {
+        'orders': n,
+        'seed': seed,
+        'exact_sample': len(sample),
+        'fields': fields,
+        'orders_with_mismatch': int(np.any(
+            [_differs(fixed_results[name], float_results[name]) for name in RESULT_FIELDS], axis=0
+        ).sum()) if n else 0,
+        'float_seconds': round(float_seconds, 4),
+        'fixed_seconds': round(fixed_seconds, 4),
+        'decimal_seconds_per_order': decimal_seconds / len(sample) if len(sample) else None,
+    }
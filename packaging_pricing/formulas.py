@@ -0,0 +1,318 @@
+import ast
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, FrozenSet, Mapping, Tuple
+import numpy as np
+
+# Формулы расчета, которые экономист может заменить в конфиге (PricingConfig.formulas)
+# без правки steps.py. Язык — арифметическое выражение в синтаксисе Python:
+#   числа, True/False, + - * / ** , унарный минус, сравнения (< <= > >= == !=,
+#   в том числе цепочкой), and / or / not, условие "a if условие else b",
+#   функции min, max (от двух аргументов и больше) и abs.
+# Имена — поля заказа, коэффициенты конфига, ставки опций (rate_<опция>) и
+# промежуточные результаты шагов, посчитанные до формулы (formula_names).
+# Формула разбирается и проверяется по типам (число/логическое) один раз,
+# затем компилируется в две функции: скалярную (шаги пайплайна)
+# и векторную на NumPy (PreparedConfig.price_columns) — обе без интерпретатора AST.
+
+NUMBER = 'number'
+BOOL = 'bool'
+
+# Заменяемые величины в порядке расчета; формула видит только величины до себя
+FORMULA_TARGETS = ('variable_cost', 'overhead_cost', 'final_price')
+
+# Стандартные формулы (как в MaterialCostStep и PricingStep) — образец для своих
+DEFAULT_FORMULAS = {
+    'variable_cost': 'material_base_cost + scrap_cost + electricity + labor_cost + box_cost / 2000'
+                     ' + options_cost + trim_cost',
+    'overhead_cost': 'rop_overhead * weight / 1000',
+    'final_price': '(variable_cost / k2_margin_divisor + variable_cost + overhead_cost) * k3_margin_multiplier',
+}
+
+ORDER_NAMES = {
+    'width': NUMBER, 'fold': NUMBER, 'length': NUMBER, 'flap': NUMBER,
+    'thickness': NUMBER, 'quantity': NUMBER,
+    'is_bopp': BOOL, 'is_wicket': BOOL, 'glue_tape': BOOL, 'dead_tape': BOOL,
+}
+CONFIG_NAMES = (
+    'density', 'material_price_bopp', 'material_price_cpp', 'k1_salary_coeff', 'box_cost',
+    'scrap_return_price', 'k2_margin_divisor', 'k3_margin_multiplier', 'rop_overhead',
+    'electricity_rate', 'salary_std_small', 'salary_std_large', 'salary_wicket_small',
+    'salary_wicket_large', 'roll_edge_trim',
+)
+FEATURE_RATE_NAMES = ('glue', 'dead_glue', 'euroslot_pvd', 'euroslot_bopp', 'clips')
+INTERMEDIATE_NAMES = (
+    'weight', 'scrap_rate', 'price_per_kg', 'electricity', 'salary_rate', 'material_base_cost',
+    'scrap_cost', 'labor_cost', 'options_cost', 'trim_weight', 'trim_cost',
+)
+
+# Поле OrderInput, от которого зависит имя формулы (для инкрементального пересчета)
+_ORDER_FIELDS = {
+    'is_bopp': 'product_type', 'price_per_kg': 'product_type',
+    'is_wicket': 'features', 'glue_tape': 'features', 'dead_tape': 'features',
+}
+
+_FUNCTIONS = {'min': (2, None), 'max': (2, None), 'abs': (1, 1)}
+_ARITHMETIC = {ast.Add: '+', ast.Sub: '-', ast.Mult: '*', ast.Div: '/', ast.Pow: '**'}
+_COMPARE = {ast.Lt: '<', ast.LtE: '<=', ast.Gt: '>', ast.GtE: '>=', ast.Eq: '==', ast.NotEq: '!='}
+
+# Функции для скомпилированного кода; встроенные функции Python недоступны
+_SCALAR_GLOBALS = {'__builtins__': {}, 'min': min, 'max': max, 'abs': abs}
+_VECTOR_GLOBALS = {
+    '__builtins__': {}, '_where': np.where, '_and': np.logical_and, '_or': np.logical_or,
+    '_not': np.logical_not, '_minimum': np.minimum, '_maximum': np.maximum, '_abs': np.abs, '_f64': np.float64,
+}
+
+
+class FormulaError(ValueError):
+    """Формула не разбирается или не проходит проверку типов (позиция — с 1)."""
+    def __init__(self, target: str, msg: str, col: int = 0):
+        super().__init__(f"{target}: {msg} (позиция {col + 1})")
+        self.target = target
+        self.col = col
+
+
+def formula_names(target: str) -> Dict[str, str]:
+    """Имена и типы, доступные формуле величины target."""
+    if target not in FORMULA_TARGETS:
+        raise FormulaError(target, f"неизвестная величина, ожидается одна из {', '.join(FORMULA_TARGETS)}")
+    names = dict(ORDER_NAMES)
+    names.update((name, NUMBER) for name in CONFIG_NAMES)
+    names.update((f'rate_{name}', NUMBER) for name in FEATURE_RATE_NAMES)
+    names.update((name, NUMBER) for name in INTERMEDIATE_NAMES)
+    names.update((name, NUMBER) for name in FORMULA_TARGETS[:FORMULA_TARGETS.index(target)])
+    return names
+
+
+@dataclass(frozen=True)
+class Formula:
+    """
+    Скомпилированная формула. names — имена, которые она читает (в порядке аргументов):
+        formula.scalar(values)   -> float   (values: имя -> число/bool)
+        formula.vector(values, n) -> массив длины n (values: имя -> массив или скаляр)
+    Деление на ноль, переполнение и корень из отрицательного дают NaN/inf
+    в обоих вариантах (вызывающий проверяет конечность результата).
+    """
+    target: str
+    text: str
+    names: Tuple[str, ...]
+    _scalar: Callable[..., Any]
+    _vector: Callable[..., Any]
+
+    def scalar(self, values: Mapping[str, Any]) -> float:
+        try:
+            result = self._scalar(*[values[name] for name in self.names])
+        except ZeroDivisionError:
+            return float('nan')
+        except OverflowError:
+            return float('inf')
+        return float('nan') if isinstance(result, complex) else float(result)
+
+    def evaluate(self, order: Any, config: Any, intermediates: Mapping[str, Any]) -> float:
+        """Значение для одного заказа (OrderInput) по промежуточным результатам шагов."""
+        return self.scalar({name: _scalar_value(name, order, config, intermediates) for name in self.names})
+
+    @property
+    def order_fields(self) -> FrozenSet[str]:
+        """Поля OrderInput, которые читает формула."""
+        return frozenset(
+            _ORDER_FIELDS.get(name, name) for name in self.names if name in ORDER_NAMES or name in _ORDER_FIELDS
+        )
+
+    def vector(self, values: Mapping[str, Any], n: int) -> np.ndarray:
+        """
+        Значения для n строк. Скаляры (параметры конфига) и константы формулы —
+        np.float64, чтобы деление на ноль и переполнение давали inf/nan поэлементно,
+        как в массивах: ветвь условия, которую скалярный вариант не вычисляет
+        ("x if is_bopp else 1 / 0"), не портит остальные строки.
+        """
+        args = [_vector_arg(values[name]) for name in self.names]
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            result = np.asarray(self._vector(*args), dtype=np.float64)
+        return result if result.shape == (n,) else np.full(n, result)
+
+
+def _vector_arg(value: Any) -> Any:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return np.float64(value)
+    return value
+
+
+_compiled: Dict[Tuple[str, str], Formula] = {}
+_compiled_lock = threading.Lock()
+
+
+def compile_formula(target: str, text: str) -> Formula:
+    """Разобрать, проверить и скомпилировать формулу (результат кэшируется по тексту)."""
+    key = (target, text)
+    with _compiled_lock:
+        formula = _compiled.get(key)
+    if formula is not None:
+        return formula
+
+    names = formula_names(target)
+    try:
+        tree = ast.parse(text.strip(), mode='eval')
+    except SyntaxError as e:
+        raise FormulaError(target, f"синтаксическая ошибка: {e.msg}", max((e.offset or 1) - 1, 0)) from None
+    compiler = _Compiler(target, names)
+    kind, scalar_code, vector_code = compiler.visit(tree.body)
+    if kind != NUMBER:
+        raise FormulaError(target, "результат формулы должен быть числом")
+
+    used = tuple(sorted(compiler.used))
+    args = ', '.join(used)
+    scalar_fn = _function(f"lambda {args}: {scalar_code}", _SCALAR_GLOBALS)
+    vector_fn = _function(f"lambda {args}: {vector_code}", _VECTOR_GLOBALS)
+    formula = Formula(target=target, text=text, names=used, _scalar=scalar_fn, _vector=vector_fn)
+    with _compiled_lock:
+        return _compiled.setdefault(key, formula)
+
+
+def compile_formulas(formulas: Mapping[str, str]) -> Dict[str, Formula]:
+    """Формулы конфига в порядке FORMULA_TARGETS."""
+    return {target: compile_formula(target, formulas[target]) for target in FORMULA_TARGETS if target in formulas}
+
+
+def config_values(config: Any) -> Dict[str, float]:
+    """Коэффициенты конфига и ставки опций под именами формул."""
+    values = {name: getattr(config, name) for name in CONFIG_NAMES}
+    values.update((f'rate_{name}', config.feature_rates.get(name, 0.0)) for name in FEATURE_RATE_NAMES)
+    return values
+
+
+def _scalar_value(name: str, order: Any, config: Any, intermediates: Mapping[str, Any]) -> Any:
+    if name in intermediates:
+        return intermediates[name]
+    is_bopp = order.product_type == 'BOPP'
+    if name == 'is_bopp':
+        return is_bopp
+    if name in ORDER_NAMES:
+        return bool(getattr(order.features, name)) if ORDER_NAMES[name] == BOOL else getattr(order, name)
+    if name == 'price_per_kg':
+        return config.material_price_bopp if is_bopp else config.material_price_cpp
+    if name in ('trim_weight', 'trim_cost'):
+        # Пайплайн без RollLayoutStep
+        return 0.0
+    if name.startswith('rate_'):
+        return config.feature_rates.get(name[len('rate_'):], 0.0)
+    return getattr(config, name)
+
+
+def _function(source: str, namespace: Dict[str, Any]) -> Callable[..., Any]:
+    # Код собран только из проверенных узлов AST (имена — из formula_names), поэтому eval безопасен
+    return eval(compile(source, '<formula>', 'eval'), dict(namespace))
+
+
+class _Compiler:
+    """Проверка типов и генерация скалярного и векторного кода за один обход AST."""
+    def __init__(self, target: str, names: Mapping[str, str]):
+        self.target = target
+        self.names = names
+        self.used = set()
+
+    def error(self, node: ast.AST, msg: str) -> FormulaError:
+        return FormulaError(self.target, msg, getattr(node, 'col_offset', 0))
+
+    def visit(self, node: ast.AST) -> Tuple[str, str, str]:
+        method = getattr(self, f'visit_{type(node).__name__}', None)
+        if method is None:
+            raise self.error(node, f"недопустимая конструкция: {type(node).__name__}")
+        return method(node)
+
+    def number(self, node: ast.AST) -> Tuple[str, str]:
+        kind, scalar, vector = self.visit(node)
+        if kind != NUMBER:
+            raise self.error(node, "ожидается число")
+        return scalar, vector
+
+    def boolean(self, node: ast.AST) -> Tuple[str, str]:
+        kind, scalar, vector = self.visit(node)
+        if kind != BOOL:
+            raise self.error(node, "ожидается условие (логическое значение)")
+        return scalar, vector
+
+    def visit_Constant(self, node: ast.Constant) -> Tuple[str, str, str]:
+        if isinstance(node.value, bool):
+            return BOOL, repr(node.value), repr(node.value)
+        if isinstance(node.value, (int, float)):
+            # Целые как float: ** не уходит в длинную арифметику
+            code = repr(float(node.value))
+            return NUMBER, code, f"_f64({code})"
+        raise self.error(node, "допустимы только числа и True/False")
+
+    def visit_Name(self, node: ast.Name) -> Tuple[str, str, str]:
+        kind = self.names.get(node.id)
+        if kind is None:
+            raise self.error(node, f"неизвестное имя '{node.id}'")
+        self.used.add(node.id)
+        return kind, node.id, node.id
+
+    def visit_BinOp(self, node: ast.BinOp) -> Tuple[str, str, str]:
+        op = _ARITHMETIC.get(type(node.op))
+        if op is None:
+            raise self.error(node, "допустимы операции + - * / **")
+        ls, lv = self.number(node.left)
+        rs, rv = self.number(node.right)
+        return NUMBER, f"({ls} {op} {rs})", f"({lv} {op} {rv})"
+
+    def visit_UnaryOp(self, node: ast.UnaryOp) -> Tuple[str, str, str]:
+        if isinstance(node.op, ast.Not):
+            s, v = self.boolean(node.operand)
+            return BOOL, f"(not {s})", f"_not({v})"
+        if isinstance(node.op, (ast.USub, ast.UAdd)):
+            s, v = self.number(node.operand)
+            sign = '-' if isinstance(node.op, ast.USub) else '+'
+            return NUMBER, f"({sign}{s})", f"({sign}{v})"
+        raise self.error(node, "недопустимая унарная операция")
+
+    def visit_Compare(self, node: ast.Compare) -> Tuple[str, str, str]:
+        operands = [node.left, *node.comparators]
+        codes = []
+        for operand in operands:
+            kind, s, v = self.visit(operand)
+            codes.append((kind, s, v))
+        scalar, vector = [], []
+        for op, (lk, ls, lv), (rk, rs, rv), right in zip(node.ops, codes, codes[1:], node.comparators):
+            symbol = _COMPARE.get(type(op))
+            if symbol is None:
+                raise self.error(node, "допустимы сравнения < <= > >= == !=")
+            if lk != rk or (lk == BOOL and symbol not in ('==', '!=')):
+                raise self.error(right, "сравниваются значения разных типов")
+            scalar.append(f"({ls} {symbol} {rs})")
+            vector.append(f"({lv} {symbol} {rv})")
+        return BOOL, f"({' and '.join(scalar)})", _fold('_and', vector)
+
+    def visit_BoolOp(self, node: ast.BoolOp) -> Tuple[str, str, str]:
+        parts = [self.boolean(value) for value in node.values]
+        if isinstance(node.op, ast.And):
+            return BOOL, f"({' and '.join(s for s, _ in parts)})", _fold('_and', [v for _, v in parts])
+        return BOOL, f"({' or '.join(s for s, _ in parts)})", _fold('_or', [v for _, v in parts])
+
+    def visit_IfExp(self, node: ast.IfExp) -> Tuple[str, str, str]:
+        cs, cv = self.boolean(node.test)
+        bk, bs, bv = self.visit(node.body)
+        ok, os_, ov = self.visit(node.orelse)
+        if bk != ok:
+            raise self.error(node.orelse, "ветви условия разных типов")
+        return bk, f"({bs} if {cs} else {os_})", f"_where({cv}, {bv}, {ov})"
+
+    def visit_Call(self, node: ast.Call) -> Tuple[str, str, str]:
+        name = node.func.id if isinstance(node.func, ast.Name) else None
+        if name not in _FUNCTIONS or node.keywords:
+            raise self.error(node, "допустимы функции min, max, abs")
+        low, high = _FUNCTIONS[name]
+        if len(node.args) < low or (high is not None and len(node.args) > high):
+            raise self.error(node, f"неверное число аргументов {name}")
+        args = [self.number(arg) for arg in node.args]
+        scalar = f"{name}({', '.join(s for s, _ in args)})"
+        if name == 'abs':
+            return NUMBER, scalar, f"_abs({args[0][1]})"
+        return NUMBER, scalar, _fold(f'_{name}imum', [v for _, v in args])
+
+
+def _fold(function: str, codes: list) -> str:
+    code = codes[0]
+    for other in codes[1:]:
+        code = f"{function}({code}, {other})"
+    return code
@@ -1,6 +1,8 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, FrozenSet, Hashable, List, Optional, Sequence, Tuple
+import numpy as np
 from .context import PipelineContext
+from .errors import CalculationError
 from .models import BagType
 
 class ScrapRateProvider(ABC):
@@ -15,15 +17,59 @@ class ScrapRateProvider(ABC):
         """
         pass
 
+    def rate_key(self, quantity: int, bag_type: BagType) -> Hashable:
+        """
+        Ключ, от которого зависит норма отхода (для мемоизации в ScrapCalculationStep).
+        По умолчанию — сами аргументы; табличные провайдеры возвращают ступень тиража.
+        """
+        return (quantity, bag_type)
+
+    def tier_segments(self, bag_type: BagType) -> Optional[List[Tuple[int, Optional[int], float]]]:
+        """
+        Кусочно-постоянная норма по тиражу: (тираж от, до включительно или None, норма)
+        подряд с 1 штуки. None — норма не задана ступенями (например, ML-провайдер).
+        """
+        return None
+
+    def get_scrap_rates(self, quantities: np.ndarray, bag_types: Sequence[BagType]) -> np.ndarray:
+        """
+        Векторная версия для пакетного расчета.
+        По умолчанию вызывает get_scrap_rate построчно; табличные провайдеры переопределяют.
+        """
+        return np.array(
+            [self.get_scrap_rate(int(q), t) for q, t in zip(quantities, bag_types)],
+            dtype=np.float64
+        )
+
 class CalculationStep(ABC):
     """
     Интерфейс для одного шага в конвейере расчета цены (Pipeline).
     """
 
+    # Декларация зависимостей для инкрементального пересчета (QuoteSession).
+    # input_fields — поля OrderInput, которые читает шаг (None — весь заказ).
+    # requires — промежуточные результаты, которые шаг читает из контекста.
+    # provides — промежуточные результаты, которые шаг записывает.
+    # optional — промежуточные результаты, которые шаг читает, если они есть
+    # (их дает необязательный шаг, например RollLayoutStep).
+    input_fields: Optional[FrozenSet[str]] = None
+    requires: FrozenSet[str] = frozenset()
+    provides: FrozenSet[str] = frozenset()
+    optional: FrozenSet[str] = frozenset()
+
+    def input_fields_for(self, config: Any) -> Optional[FrozenSet[str]]:
+        """
+        Поля заказа, которые шаг читает при данном конфиге (по умолчанию input_fields).
+        Шаги со своими формулами конфига добавляют поля, которые читают формулы.
+        """
+        return self.input_fields
+
     @abstractmethod
-    def execute(self, context: PipelineContext) -> None:
+    def execute(self, context: PipelineContext) -> Optional[CalculationError]:
         """
         Выполнить расчет и обновить контекст.
-        Бросает ValueError, если отсутствуют необходимые данные.
+        Ожидаемые проблемы данных заказа возвращаются как CalculationError
+        (без исключения); None — шаг выполнен. Наличие промежуточных
+        результатов из requires проверяет пайплайн до вызова шага.
         """
         pass
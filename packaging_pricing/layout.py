@@ -0,0 +1,116 @@
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from .cache import LRUCache
+from .errors import CalculationError
+
+# Раскладка пакетов поперек рукава/рулона (multi-up).
+# Ручей — ширина заготовки пакета поперек полотна: width + fold (см).
+# На рулон шириной W с неиспользуемой кромкой edge помещается
+# floor((W - edge) / ручей) ручьев; остаток W - ручьи * ручей — обрезь.
+# Размеры считаются в сотых долях см (целые), чтобы выбор не зависел от погрешности float.
+
+LAYOUT_SCALE = 100
+
+NO_ROLL_LAYOUT_MSG = "Bag does not fit any configured roll width"
+
+# Отличает "не решали" от решенного None (не помещается) в кэше
+_UNSOLVED = object()
+
+
+@dataclass(frozen=True)
+class Layout:
+    """Лучшая раскладка: ширина рулона, число ручьев и ширина обрези (см)."""
+    roll_width: float
+    lanes: int
+    trim_width: float
+
+    @property
+    def utilization(self) -> float:
+        """Доля ширины рулона, занятая пакетами."""
+        return 1.0 - self.trim_width / self.roll_width
+
+
+def _hundredths(value: float) -> int:
+    return int(round(value * LAYOUT_SCALE))
+
+
+def solve_layout(lane_width: float, roll_widths: Sequence[float], edge_trim: float = 0.0) -> Optional[Layout]:
+    """
+    Раскладка с наименьшей долей обрези среди доступных ширин (при равенстве —
+    более узкий рулон). None, если ручей не помещается ни в один рулон.
+    """
+    lane = _hundredths(lane_width)
+    edge = _hundredths(edge_trim)
+    best: Optional[Tuple[int, int, int]] = None  # (рулон, ручьи, обрезь) в сотых
+    for roll in sorted(_hundredths(w) for w in roll_widths):
+        lanes = (roll - edge) // lane if lane > 0 else 0
+        if lanes < 1:
+            continue
+        trim = roll - lanes * lane
+        # trim / roll < best_trim / best_roll без деления
+        if best is None or trim * best[0] < best[2] * roll:
+            best = (roll, lanes, trim)
+    if best is None:
+        return None
+    roll, lanes, trim = best
+    return Layout(roll_width=roll / LAYOUT_SCALE, lanes=lanes, trim_width=trim / LAYOUT_SCALE)
+
+
+def no_roll_layout(lane_width: float) -> CalculationError:
+    return CalculationError(
+        type='no_roll_layout',
+        msg=f"{NO_ROLL_LAYOUT_MSG} (lane {lane_width:g} cm)",
+        loc=('width',)
+    )
+
+
+def trim_weight(weight: float, layout: Layout, lane_width: float) -> float:
+    """Вес обрези на один пакет: обрезь делится поровну между ручьями."""
+    return weight * layout.trim_width / (layout.lanes * lane_width)
+
+
+def cached_layout(memo: LRUCache, lane_width: float, roll_widths: Sequence[float],
+                  edge_trim: float = 0.0) -> Optional[Layout]:
+    """solve_layout с кэшем по ширине ручья в сотых см (кэш — на одну версию конфига)."""
+    key = _hundredths(lane_width)
+    layout = memo.get(key, _UNSOLVED)
+    if layout is _UNSOLVED:
+        layout = solve_layout(lane_width, roll_widths, edge_trim)
+        memo.put(key, layout)
+    return layout
+
+
+def layout_details(layout: Optional[Layout], trim_cost: float) -> Dict[str, float]:
+    """Поля раскладки для CalculationResult.details (пусто, если раскладка не считалась)."""
+    if layout is None:
+        return {}
+    return {
+        "roll_width": layout.roll_width,
+        "layout_lanes": layout.lanes,
+        "trim_width": layout.trim_width,
+        "trim_cost": round(trim_cost, 4),
+    }
+
+
+def solve_layouts(lane_widths: np.ndarray, roll_widths: Sequence[float], edge_trim: float = 0.0,
+                  memo: Optional[LRUCache] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Векторная раскладка для пакета заказов: задача решается один раз на
+    уникальную ширину ручья; memo — кэш решений по ширине ручья в сотых см
+    (живет вместе с конфигом, т.е. между пакетами).
+    Возвращает ширину рулона, число ручьев (0 — не помещается) и ширину обрези.
+    """
+    keys = np.rint(np.asarray(lane_widths, dtype=np.float64) * LAYOUT_SCALE).astype(np.int64)
+    unique, inverse = np.unique(keys, return_inverse=True)
+    roll = np.zeros(len(unique))
+    lanes = np.zeros(len(unique), dtype=np.int64)
+    trim = np.zeros(len(unique))
+    for idx, key in enumerate(unique.tolist()):
+        if memo is not None:
+            layout = cached_layout(memo, key / LAYOUT_SCALE, roll_widths, edge_trim)
+        else:
+            layout = solve_layout(key / LAYOUT_SCALE, roll_widths, edge_trim)
+        if layout is not None:
+            roll[idx], lanes[idx], trim[idx] = layout.roll_width, layout.lanes, layout.trim_width
+    return roll[inverse], lanes[inverse], trim[inverse]
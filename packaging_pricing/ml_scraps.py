@@ -0,0 +1,21 @@
+from .interfaces import ScrapRateProvider
+from .models import BagType
+
+# Отдельный модуль: зависимости модели (joblib/torch) импортируются только когда
+# пайплайн выбирает провайдер 'ml' (см. packaging_pricing.registry).
+
+class MLScrapRateProvider(ScrapRateProvider):
+    """
+    Будущая реализация: загрузка обученной ML модели для прогнозирования отхода
+    на основе исторических данных, сложности макета и состояния оборудования.
+    """
+    def __init__(self, model_path: str = "models/scrap_predictor_v1.pkl"):
+        self.model_path = model_path
+        # TODO: Загрузка модели через joblib или torch
+        # self.model = load_model(model_path)
+
+    def get_scrap_rate(self, quantity: int, bag_type: BagType) -> float:
+        # TODO: Подготовка вектора признаков (features vector)
+        # prediction = self.model.predict([[quantity, bag_type.value]])
+        # return float(prediction[0])
+        raise NotImplementedError("ML модель еще не обучена.")
@@ -1,6 +1,8 @@
+from datetime import date
 from enum import Enum
-from typing import Optional, Dict
-from pydantic import BaseModel, Field, ConfigDict, model_validator
+from typing import Any, Optional, Dict, List
+from pydantic import BaseModel, Field, ConfigDict, PositiveFloat, field_validator, model_validator
+from .formulas import compile_formula
 
 class BagType(str, Enum):
     BOPP = "BOPP"
@@ -27,6 +29,10 @@ class Features(BaseModel):
             self.clips = False
         return self
 
+# Тираж хранится в int64 (пакетный расчет, целочисленный движок)
+MAX_QUANTITY = 2 ** 63 - 1
+
+
 class OrderInput(BaseModel):
     """
     Входные данные заказа от менеджера.
@@ -41,7 +47,7 @@ class OrderInput(BaseModel):
     length: float = Field(..., gt=0, description="Длина (см)")
     flap: float = Field(default=0.0, ge=0, description="Клапан (см)")
     thickness: float = Field(..., gt=0, description="Толщина (микрон)")
-    quantity: int = Field(..., gt=0, description="Тираж (штук)")
+    quantity: int = Field(..., gt=0, le=MAX_QUANTITY, description="Тираж (штук)")
     print_scheme: str = Field(default="б/печати", description="Схема печати")
     features: Features = Field(default_factory=Features)
 
@@ -80,6 +86,73 @@ class PricingConfig(BaseModel):
     salary_wicket_small: float = 0.075
     salary_wicket_large: float = 0.078
 
+    # Раскладка поперек рукава/рулона (RollLayoutStep): доступные ширины (см)
+    # и неиспользуемая кромка рулона (см). Пустой список — обрезь не учитывается.
+    roll_widths: List[PositiveFloat] = Field(default_factory=list)
+    roll_edge_trim: float = Field(default=0.0, ge=0)
+
+    # Свои формулы вместо стандартных (packaging_pricing.formulas): величина
+    # (variable_cost, overhead_cost, final_price) -> выражение над полями заказа,
+    # коэффициентами и промежуточными результатами. Проверяются при загрузке конфига.
+    formulas: Dict[str, str] = Field(default_factory=dict)
+
+    @field_validator('formulas')
+    @classmethod
+    def validate_formulas(cls, formulas: Dict[str, str]) -> Dict[str, str]:
+        for target, text in formulas.items():
+            compile_formula(target, text)
+        return formulas
+
+class EffectiveConfig(BaseModel):
+    """
+    Версия конфигурации, действующая с valid_from по valid_to включительно
+    (valid_to=None — бессрочно). Например, новая цена сырья с 1 числа месяца.
+    """
+    valid_from: date
+    valid_to: Optional[date] = None
+    config: PricingConfig
+
+    @model_validator(mode="after")
+    def validate_interval(self) -> "EffectiveConfig":
+        if self.valid_to is not None and self.valid_to < self.valid_from:
+            raise ValueError("valid_to must not be earlier than valid_from")
+        return self
+
+class ConfigProfile(BaseModel):
+    """
+    Именованный прайс-лист (дилеры, ключевые клиенты, экспорт): поправки к базовому
+    конфигу. Заданные коэффициенты заменяют базовые, feature_rates дополняют базовые
+    ставки. Базовый конфиг — активный или действующий на дату расчета, поэтому
+    смена цены сырья сразу действует во всех прайс-листах.
+    """
+    model_config = ConfigDict(extra='forbid')
+
+    k2_margin_divisor: Optional[float] = Field(default=None, gt=0)
+    k3_margin_multiplier: Optional[float] = Field(default=None, gt=0)
+    rop_overhead: Optional[float] = None
+    feature_rates: Dict[str, float] = Field(default_factory=dict)
+
+    def apply(self, base: "PricingConfig") -> "PricingConfig":
+        update = self.model_dump(exclude_none=True, exclude={'feature_rates'})
+        update['feature_rates'] = {**base.feature_rates, **self.feature_rates}
+        return base.model_copy(update=update)
+
+# Стандартный пайплайн (имена шагов в packaging_pricing.registry)
+DEFAULT_STEPS = ('geometry', 'roll_layout', 'scrap', 'labor', 'material', 'pricing')
+
+class PipelineDefinition(BaseModel):
+    """
+    Состав пайплайна по именам шагов и провайдера брака из реестра.
+    step_options — параметры конструктора шага по имени шага,
+    scrap_provider_options — параметры конструктора провайдера.
+    """
+    model_config = ConfigDict(extra='forbid')
+
+    steps: List[str] = Field(default_factory=lambda: list(DEFAULT_STEPS), min_length=1)
+    step_options: Dict[str, Dict[str, Any]] = Field(default_factory=dict)
+    scrap_provider: str = 'table'
+    scrap_provider_options: Dict[str, Any] = Field(default_factory=dict)
+
 class CalculationResult(BaseModel):
     """
     Детализированный результат расчета себестоимости.
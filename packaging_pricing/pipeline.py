@@ -1,7 +1,28 @@
-from typing import List
+from typing import List, Optional, Union
 from .interfaces import CalculationStep
 from .models import OrderInput, PricingConfig, CalculationResult
 from .context import PipelineContext
+from .errors import CalculationError, CalculationFailed, missing_intermediate
+from .tracing import tracer
+
+
+def execute_step(step: CalculationStep, context: PipelineContext) -> Optional[CalculationError]:
+    """
+    Выполнить шаг (в отдельном спане, если трассировка включена).
+    Отсутствующие зависимости из step.requires — ошибка, шаг не вызывается.
+    """
+    if step.requires:
+        missing = step.requires - context.intermediates.keys()
+        if missing:
+            return missing_intermediate(type(step).__name__, min(missing))
+    if not tracer.enabled:
+        return step.execute(context)
+    with tracer.start_as_current_span(type(step).__name__) as span:
+        error = step.execute(context)
+        if error is not None:
+            span.set_attribute('calculation.error', error.type)
+        return error
+
 
 class PricingPipeline:
     """
@@ -11,16 +32,34 @@ class PricingPipeline:
         self.steps = steps
         self.config = config
 
-    def calculate(self, order: OrderInput) -> CalculationResult:
-        context = PipelineContext(
-            input_data=order,
-            config=self.config
-        )
+    def try_run(self, order: OrderInput) -> Union[PipelineContext, CalculationError]:
+        """
+        Выполнить все шаги и вернуть контекст целиком (финальный результат и
+        неокругленные промежуточные значения) или CalculationError первого
+        шага, вернувшего ошибку. Ожидаемые ошибки данных не бросаются.
+        """
+        with tracer.start_as_current_span('PricingPipeline.calculate', {'pipeline.steps': len(self.steps)}):
+            context = PipelineContext(
+                input_data=order,
+                config=self.config
+            )
+
+            for step in self.steps:
+                error = execute_step(step, context)
+                if error is not None:
+                    return error
 
-        for step in self.steps:
-            step.execute(context)
+            if context.final_result is None:
+                raise RuntimeError("Пайплайн завершен, но финальный результат не сформирован (final_result is None).")
 
-        if context.final_result is None:
-            raise RuntimeError("Пайплайн завершен, но финальный результат не сформирован (final_result is None).")
+            return context
 
-        return context.final_result
+    def run(self, order: OrderInput) -> PipelineContext:
+        """Как try_run, но ошибка данных заказа бросается как CalculationFailed."""
+        outcome = self.try_run(order)
+        if isinstance(outcome, CalculationError):
+            raise CalculationFailed(outcome)
+        return outcome
+
+    def calculate(self, order: OrderInput) -> CalculationResult:
+        return self.run(order).final_result
@@ -0,0 +1,331 @@
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple
+import numpy as np
+from .cache import LRUCache
+from .formulas import FORMULA_TARGETS, compile_formulas, config_values
+from .interfaces import ScrapRateProvider
+from .layout import Layout, cached_layout, solve_layouts
+from .models import OrderInput, PricingConfig, BagType
+from .scraps import TableBasedScrapProvider
+
+# Биты маски опций (опции с оплатой за см ширины)
+OPTION_GLUE = 1
+OPTION_DEAD_GLUE = 2
+OPTION_EUROSLOT_PVD = 4
+OPTION_EUROSLOT_BOPP = 8
+OPTION_COUNT = 16
+
+# Граница ставки ЗП по ширине (см), как в LaborCostStep
+WIDTH_SMALL_MAX = 25
+
+_BAG_TYPES = (BagType.BOPP, BagType.CPP)
+
+# Колонки заказа для пакетного расчета (price_columns)
+ORDER_COLUMNS = (
+    'product_type', 'width', 'fold', 'length', 'flap', 'thickness', 'quantity',
+    'is_wicket', 'glue_tape', 'dead_tape', 'euroslot'
+)
+
+
+def _width_rates(rates: Mapping[str, float], mask: int) -> Tuple[float, float, float]:
+    """Ставки за см (клей, мертвый клей, еврослот) для маски опций; невыбранные — 0."""
+    euroslot = 0.0
+    if mask & OPTION_EUROSLOT_PVD:
+        euroslot = rates["euroslot_pvd"]
+    elif mask & OPTION_EUROSLOT_BOPP:
+        euroslot = rates["euroslot_bopp"]
+    return (
+        rates["glue"] if mask & OPTION_GLUE else 0.0,
+        rates["dead_glue"] if mask & OPTION_DEAD_GLUE else 0.0,
+        euroslot,
+    )
+
+
+def table_key(bag_index: int, is_wicket: int, is_wide: int, mask: int) -> int:
+    """Индекс строки таблицы: (тип пленки, викет, класс ширины, маска опций)."""
+    return ((bag_index * 2 + is_wicket) * 2 + is_wide) * OPTION_COUNT + mask
+
+
+class PreparedConfig:
+    """
+    Предрасчитанный конфиг для пакетного (векторного) расчета.
+    Заказ по одному считает PricingPipeline — источник формул; здесь те же
+    формулы стандартных шагов над колонками пакета.
+    Все, что для фиксированного PricingConfig постоянно внутри класса заказа
+    (тип пленки, викет, класс ширины, маска опций), сворачивается в таблицу:
+    цена сырья, ЗП * K1, клипсы, ставки опций за см (клей, мертвый клей, еврослот;
+    0 для невыбранных). Остальное — несколько умножений-сложений на заказ
+    в том же порядке операций, что в шагах пайплайна:
+
+        вес   = (ширина + складка) * (длина + клапан / 2) * толщина * 2 * плотность / 10000
+        опции = клей * ширина + мертвый_клей * ширина + еврослот * ширина + клипсы
+        VC    = вес * цена / 1000 + вес / 1000 * брак * (цена - возврат) + электроэнергия + ЗП * K1
+                + коробка + опции [+ обрезь / 1000 * (цена - возврат), если заданы roll_widths]
+        Цена  = (VC / K2 + VC + ROP * вес / 1000) * K3
+
+    Нулевые слагаемые невыбранных опций и обрези точны (x + 0.0 == x), поэтому
+    неокругленные значения побитно совпадают с PricingPipeline.
+
+    Свои формулы конфига (config.formulas) компилируются один раз и заменяют
+    соответствующие величины в price_columns.
+
+    Строится один раз на версию конфига.
+    """
+    def __init__(self, config: PricingConfig, scrap_provider: Optional[ScrapRateProvider] = None):
+        self.config = config
+        self.scrap_provider = scrap_provider or TableBasedScrapProvider()
+
+        c = config
+        rates = c.feature_rates
+        salary = {
+            (0, 0): c.salary_std_small,
+            (0, 1): c.salary_std_large,
+            (1, 0): c.salary_wicket_small,
+            (1, 1): c.salary_wicket_large,
+        }
+        self.box_unit_cost = c.box_cost / 2000.0
+        self.clips_cost = (rates["clips"] * 2) / 200.0
+
+        size = len(_BAG_TYPES) * 2 * 2 * OPTION_COUNT
+        self.price_per_kg = np.zeros(size)
+        self.salary_rate = np.zeros(size)
+        self.labor_cost = np.zeros(size)
+        self.clips_unit = np.zeros(size)
+        # Ставки за см по порядку слагаемых MaterialCostStep: клей, мертвый клей, еврослот
+        self.width_rates = np.zeros((size, 3))
+
+        for bag_index, bag_type in enumerate(_BAG_TYPES):
+            price = c.material_price_bopp if bag_type == BagType.BOPP else c.material_price_cpp
+            for is_wicket in (0, 1):
+                for is_wide in (0, 1):
+                    labor = salary[(is_wicket, is_wide)] * c.k1_salary_coeff
+                    clips = self.clips_cost if is_wicket else 0.0
+                    for mask in range(OPTION_COUNT):
+                        key = table_key(bag_index, is_wicket, is_wide, mask)
+                        self.price_per_kg[key] = price
+                        self.salary_rate[key] = salary[(is_wicket, is_wide)]
+                        self.labor_cost[key] = labor
+                        self.clips_unit[key] = clips
+                        self.width_rates[key] = _width_rates(rates, mask)
+
+        # Цена как аффинная функция VC и веса (для симуляции риска)
+        self.vc_to_price = (1 / c.k2_margin_divisor + 1) * c.k3_margin_multiplier
+        self.overhead_to_price = c.rop_overhead * c.k3_margin_multiplier / 1000.0
+
+        self.formulas = compile_formulas(c.formulas)
+        self._formula_config = config_values(c)
+
+        # Решения раскладки по ширине ручья (в сотых см) для этой версии конфига
+        self.layouts = LRUCache(maxsize=4096)
+
+    def layout_for(self, lane_width: float) -> Optional[Layout]:
+        """Раскладка ручья по roll_widths конфига (с кэшем решений)."""
+        return cached_layout(self.layouts, lane_width, self.config.roll_widths, self.config.roll_edge_trim)
+
+    def order_factors(self, columns: Mapping[str, Sequence[Any]]) -> Dict[str, np.ndarray]:
+        """
+        Величины пакета, не зависящие от коэффициентов конфига: индексы таблиц,
+        ширина и складка, объем пленки (вес = объем * 2 * плотность / 10000)
+        и норма брака провайдера. Их можно посчитать один раз и передать
+        в price_columns нескольких версий конфига с тем же провайдером брака.
+        """
+        n = len(columns['width'])
+        width = np.asarray(columns['width'], dtype=np.float64)
+        length = np.asarray(columns['length'], dtype=np.float64)
+        thickness = np.asarray(columns['thickness'], dtype=np.float64)
+        quantity = np.asarray(columns['quantity'], dtype=np.int64)
+        fold = _float_column(columns, 'fold', n)
+        flap = _float_column(columns, 'flap', n)
+        keys, bag_types = column_keys(columns)
+        return {
+            'keys': keys,
+            'width': width,
+            'fold': fold,
+            'volume': (width + fold) * (length + flap / 2) * thickness,
+            'scrap_rate': self.scrap_provider.get_scrap_rates(quantity, bag_types),
+        }
+
+    def price_columns(self, columns: Mapping[str, Sequence[Any]],
+                      factors: Optional[Mapping[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        """
+        Пакетный расчет по колонкам (ключи ORDER_COLUMNS; fold, flap и опции необязательны).
+        Возвращает неокругленные массивы с ключами промежуточных значений пайплайна.
+        Строки должны быть проверены (batch.validate_columns): неизвестный еврослот здесь не тарифицируется.
+        С roll_widths раскладка решается один раз на уникальную ширину ручья; строки,
+        для которых рулона нет, получают NaN (в пайплайне это ошибка no_roll_layout).
+        factors — уже посчитанный order_factors тех же колонок.
+        """
+        if factors is None:
+            factors = self.order_factors(columns)
+        keys = factors['keys']
+        width = factors['width']
+        fold = factors['fold']
+        scrap_rate = factors['scrap_rate']
+        n = len(width)
+
+        c = self.config
+        price = self.price_per_kg[keys]
+        glue, dead_glue, euroslot = self.width_rates[keys].T
+        weight = (factors['volume'] * 2 * c.density) / 10000
+        labor = self.labor_cost[keys]
+        options_cost = glue * width + dead_glue * width + euroslot * width + self.clips_unit[keys]
+
+        material_base_cost = (weight * price) / 1000.0
+        scrap_cost = (weight / 1000.0) * scrap_rate * (price - c.scrap_return_price)
+
+        trim = np.zeros(n)
+        trim_cost = np.zeros(n)
+        if c.roll_widths:
+            lane_width = width + fold
+            _, lanes, trim_width = solve_layouts(lane_width, c.roll_widths, c.roll_edge_trim, memo=self.layouts)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                trim = np.where(lanes > 0, weight * trim_width / (lanes * lane_width), np.nan)
+            trim_cost = (trim / 1000.0) * (price - c.scrap_return_price)
+        vc = material_base_cost + scrap_cost + c.electricity_rate + labor + self.box_unit_cost + options_cost + trim_cost
+        overhead_cost = (c.rop_overhead * weight) / 1000.0
+
+        out = {
+            'weight': weight,
+            'scrap_rate': scrap_rate,
+            'electricity': np.full(n, c.electricity_rate),
+            'salary_rate': self.salary_rate[keys],
+            'variable_cost': vc,
+            'material_base_cost': material_base_cost,
+            'scrap_cost': scrap_cost,
+            'labor_cost': labor,
+            'options_cost': options_cost,
+            'overhead_cost': overhead_cost,
+            'final_price': ((vc / c.k2_margin_divisor) + vc + overhead_cost) * c.k3_margin_multiplier,
+            'trim_weight': trim,
+            'trim_cost': trim_cost,
+        }
+        if self.formulas:
+            self._apply_formula_columns(columns, factors, price, out)
+        return out
+
+    def _apply_formula_columns(self, columns: Mapping[str, Sequence[Any]], factors: Mapping[str, np.ndarray],
+                               price: np.ndarray, out: Dict[str, np.ndarray]) -> None:
+        """
+        Свои формулы поверх колонок price_columns по порядку FORMULA_TARGETS
+        (как в MaterialCostStep/PricingStep); цена без своей формулы
+        пересчитывается по стандартной от новых VC и накладных.
+        Нет конечного значения формулы или раскладки на рулон — NaN.
+        """
+        c = self.config
+        keys = factors['keys']
+        n = len(keys)
+        values: Dict[str, Any] = dict(self._formula_config)
+        values.update(out)
+        values.update(width=factors['width'], fold=factors['fold'], price_per_kg=price)
+        needed = set().union(*(formula.names for formula in self.formulas.values()))
+        for name in needed - values.keys():
+            if name == 'is_bopp':
+                values[name] = keys // (2 * 2 * OPTION_COUNT) == _BAG_TYPES.index(BagType.BOPP)
+            elif name == 'is_wicket':
+                values[name] = (keys // (2 * OPTION_COUNT)) % 2 == 1
+            elif name == 'glue_tape':
+                values[name] = (keys & OPTION_GLUE) > 0
+            elif name == 'dead_tape':
+                values[name] = (keys & OPTION_DEAD_GLUE) > 0
+            else:
+                values[name] = _float_column(columns, name, n)
+
+        layout_failed = np.isnan(out['trim_weight'])
+        for target in FORMULA_TARGETS:
+            formula = self.formulas.get(target)
+            if formula is not None:
+                value = formula.vector(values, n)
+                value = np.where(np.isfinite(value), value, np.nan)
+            elif target == 'final_price':
+                vc = values['variable_cost']
+                value = (vc / c.k2_margin_divisor + vc + values['overhead_cost']) * c.k3_margin_multiplier
+            else:
+                continue
+            values[target] = out[target] = np.where(layout_failed, np.nan, value)
+
+    def price_results(self, columns: Mapping[str, Sequence[Any]]) -> Dict[str, np.ndarray]:
+        """Колонки полей CalculationResult для пакета (price_columns + result_columns)."""
+        return result_columns(self.price_columns(columns))
+
+
+def order_columns(orders: Sequence[OrderInput]) -> Dict[str, list]:
+    """Заказы в виде колонок ORDER_COLUMNS (для price_columns)."""
+    return {
+        'product_type': [o.product_type for o in orders],
+        'width': [o.width for o in orders],
+        'fold': [o.fold for o in orders],
+        'length': [o.length for o in orders],
+        'flap': [o.flap for o in orders],
+        'thickness': [o.thickness for o in orders],
+        'quantity': [o.quantity for o in orders],
+        'is_wicket': [o.features.is_wicket for o in orders],
+        'glue_tape': [o.features.glue_tape for o in orders],
+        'dead_tape': [o.features.dead_tape for o in orders],
+        'euroslot': [o.features.euroslot for o in orders],
+    }
+
+
+def column_keys(columns: Mapping[str, Sequence[Any]]) -> Tuple[np.ndarray, List[BagType]]:
+    """Индексы строк таблиц (table_key) и типы пленки для пакета по колонкам."""
+    n = len(columns['width'])
+    width = np.asarray(columns['width'], dtype=np.float64)
+    is_wicket = _bool_column(columns, 'is_wicket', n)
+
+    bag_types = [BagType(t) for t in columns['product_type']]
+    bag_index = np.fromiter((_BAG_TYPES.index(t) for t in bag_types), dtype=np.int64, count=n)
+
+    mask = _bool_column(columns, 'glue_tape', n) * OPTION_GLUE + _bool_column(columns, 'dead_tape', n) * OPTION_DEAD_GLUE
+    if 'euroslot' in columns:
+        slots = np.array([(s or '').lower() for s in columns['euroslot']], dtype=object)
+        mask = mask + (slots == 'pvd') * OPTION_EUROSLOT_PVD + (slots == 'bopp') * OPTION_EUROSLOT_BOPP
+
+    keys = ((bag_index * 2 + is_wicket) * 2 + (width > WIDTH_SMALL_MAX)) * OPTION_COUNT + mask
+    return keys, bag_types
+
+
+# Поля CalculationResult -> (промежуточное значение, множитель, знаков после запятой)
+RESULT_FIELDS = {
+    'weight_grams': ('weight', 1, 4),
+    'scrap_rate_percent': ('scrap_rate', 100, 2),
+    'material_cost': ('material_base_cost', 1, 4),
+    'scrap_cost': ('scrap_cost', 1, 4),
+    'labor_cost': ('labor_cost', 1, 4),
+    'overhead_cost': ('overhead_cost', 1, 4),
+    'options_cost': ('options_cost', 1, 4),
+    'variable_cost': ('variable_cost', 1, 4),
+    'final_price': ('final_price', 1, 2),
+}
+
+
+def result_columns(intermediates: Mapping[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Колонки с полями CalculationResult (с тем же округлением, что в PricingStep)."""
+    return {
+        name: round_columns(intermediates[key] * scale, digits)
+        for name, (key, scale, digits) in RESULT_FIELDS.items()
+    }
+
+
+def round_columns(values: np.ndarray, digits: int) -> np.ndarray:
+    """
+    np.round с результатом встроенного round: np.round округляет values * 10**digits,
+    и у значений рядом с половиной последнего знака произведение может уйти через
+    середину. Такие элементы (их единицы) пересчитываются через round.
+    """
+    out = np.round(values, digits)
+    scaled = values * 10.0 ** digits
+    with np.errstate(invalid='ignore'):
+        near_half = np.abs(scaled - np.floor(scaled) - 0.5) <= 1e-9 + 1e-12 * np.abs(scaled)
+    for i in np.flatnonzero(near_half):
+        out[i] = round(float(values[i]), digits)
+    return out
+
+
+def _float_column(columns: Mapping[str, Sequence[Any]], name: str, n: int) -> np.ndarray:
+    if name in columns:
+        return np.asarray(columns[name], dtype=np.float64)
+    return np.zeros(n)
+
+
+def _bool_column(columns: Mapping[str, Sequence[Any]], name: str, n: int) -> np.ndarray:
+    if name in columns:
+        return np.asarray(columns[name], dtype=bool).astype(np.int64)
+    return np.zeros(n, dtype=np.int64)
@@ -0,0 +1,156 @@
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+import numpy as np
+from .cache import LRUCache
+from .config_source import ConfigSnapshot
+from .models import ConfigProfile
+from .prepared import PreparedConfig
+
+logger = logging.getLogger(__name__)
+
+# Прайс-листы (профили) выбираются на запрос. Определение профиля — несколько
+# поправок, их может быть сколько угодно; в памяти держатся только "горячие"
+# профили: снимок с таблицами PreparedConfig и собственный кэш результатов.
+# Общий бюджет памяти делится между всеми профилями; холодные вытесняются (LRU)
+# и строятся заново при следующем запросе. Профили с одинаковым итоговым
+# конфигом (например, без поправок) делят один снимок.
+
+# Оценка памяти записи кэша результатов: CalculationResult + промежуточные величины
+RESULT_ENTRY_BYTES = 4096
+# Оценка памяти решения раскладки в кэше PreparedConfig.layouts
+LAYOUT_ENTRY_BYTES = 256
+
+
+def prepared_nbytes(prepared: PreparedConfig) -> int:
+    """Оценка памяти таблиц PreparedConfig (массивы и заполненный кэш раскладок)."""
+    arrays = sum(value.nbytes for value in vars(prepared).values() if isinstance(value, np.ndarray))
+    return arrays + prepared.layouts.maxsize * LAYOUT_ENTRY_BYTES
+
+
+@dataclass
+class ProfileState:
+    """Материализованный профиль для одной версии базового конфига."""
+    name: str
+    base_version: str
+    snapshot: ConfigSnapshot
+    results: LRUCache
+    snapshot_bytes: int
+
+    def result_bytes(self) -> int:
+        """Резерв под заполненный кэш результатов (кэш ограничен maxsize)."""
+        return self.results.maxsize * RESULT_ENTRY_BYTES
+
+
+class ProfileRegistry:
+    """
+    Определения профилей и LRU материализованных профилей с общим бюджетом памяти.
+    Материализованный профиль — ключ (имя, версия базового конфига), поэтому
+    расчет на разные даты не перестраивает профиль на каждом запросе.
+    Бюджет проверяется при материализации: каждый профиль резервирует память
+    под свой кэш результатов целиком (он ограничен results_per_profile), поэтому
+    сумма резервов и уникальных снимков — верхняя оценка и не превышает
+    memory_budget, кроме случая, когда в памяти один профиль — тот, что нужен запросу.
+    """
+    def __init__(self, memory_budget: int = 64 * 2 ** 20, results_per_profile: int = 1024):
+        if memory_budget <= 0:
+            raise ValueError("memory_budget должен быть положительным")
+        self.memory_budget = memory_budget
+        self.results_per_profile = results_per_profile
+        self._profiles: Dict[str, ConfigProfile] = {}
+        self._states: "OrderedDict[Tuple[str, str], ProfileState]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.builds = 0
+        self.evictions = 0
+
+    @property
+    def profiles(self) -> Dict[str, ConfigProfile]:
+        return dict(self._profiles)
+
+    def set(self, name: str, profile: ConfigProfile) -> None:
+        """Создать или заменить профиль; прежние материализации отбрасываются."""
+        with self._lock:
+            self._profiles[name] = profile
+            self._drop(name)
+
+    def remove(self, name: str) -> bool:
+        with self._lock:
+            if self._profiles.pop(name, None) is None:
+                return False
+            self._drop(name)
+            return True
+
+    def resolve(self, name: str, base: ConfigSnapshot) -> ProfileState:
+        """
+        Профиль поверх базового снимка (активного или на дату).
+        Неизвестный профиль — KeyError.
+        """
+        key = (name, base.version)
+        with self._lock:
+            profile = self._profiles[name]
+            state = self._states.get(key)
+            if state is not None:
+                self._states.move_to_end(key)
+                return state
+
+        # Таблицы строятся вне блокировки; при гонке побеждает первый
+        config = profile.apply(base.config)
+        snapshot = base.derive(config, f"profile:{name}")
+        with self._lock:
+            if self._profiles.get(name) is not profile:
+                # Профиль заменили или удалили, пока строились таблицы
+                raise KeyError(name)
+            state = self._states.get(key)
+            if state is None:
+                shared = self._shared_snapshot(snapshot.version)
+                state = ProfileState(
+                    name=name,
+                    base_version=base.version,
+                    snapshot=shared or snapshot,
+                    results=LRUCache(maxsize=self.results_per_profile),
+                    snapshot_bytes=prepared_nbytes((shared or snapshot).prepared)
+                )
+                self._states[key] = state
+                self.builds += 1
+            self._states.move_to_end(key)
+            self._enforce_budget()
+            return state
+
+    def memory_usage(self) -> int:
+        """Оценка памяти материализованных профилей (общий снимок считается один раз)."""
+        with self._lock:
+            return self._usage()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "profiles": len(self._profiles),
+                "materialized": len(self._states),
+                "snapshots": len({state.snapshot.version for state in self._states.values()}),
+                "memory_bytes": self._usage(),
+                "memory_budget": self.memory_budget,
+                "builds": self.builds,
+                "evictions": self.evictions,
+            }
+
+    def _shared_snapshot(self, version: str) -> Optional[ConfigSnapshot]:
+        for state in self._states.values():
+            if state.snapshot.version == version:
+                return state.snapshot
+        return None
+
+    def _usage(self) -> int:
+        snapshots = {state.snapshot.version: state.snapshot_bytes for state in self._states.values()}
+        return sum(snapshots.values()) + sum(state.result_bytes() for state in self._states.values())
+
+    def _enforce_budget(self) -> None:
+        while len(self._states) > 1 and self._usage() > self.memory_budget:
+            (name, version), _ = self._states.popitem(last=False)
+            self.evictions += 1
+            logger.info("Профиль %s (базовый конфиг %s) вытеснен из памяти", name, version)
+
+    def _drop(self, name: str) -> None:
+        for key in [key for key in self._states if key[0] == name]:
+            del self._states[key]
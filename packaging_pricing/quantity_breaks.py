@@ -0,0 +1,73 @@
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Union
+from .errors import CalculationError
+from .models import OrderInput
+from .pipeline import PricingPipeline
+from .prepared import PreparedConfig, RESULT_FIELDS, order_columns
+
+# Кривая "цена за штуку от тиража" для заказа.
+# От тиража в формулах зависит только норма брака (ступени провайдера);
+# коробка (box_cost / 2000) и клипсы (clips * 2 / 200) раскладываются на штуку
+# с постоянным делителем и сдвигают кривую целиком, не создавая изломов.
+# Поэтому цена кусочно-постоянна, а точки падения цены — границы ступеней брака.
+
+
+@dataclass(frozen=True)
+class QuantitySegment:
+    """Диапазон тиража с одной ценой (max_quantity=None — без верхней границы)."""
+    min_quantity: int
+    max_quantity: Optional[int]
+    scrap_rate_percent: float
+    variable_cost: float
+    unit_price: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def quantity_segments(prepared: PreparedConfig, order: OrderInput,
+                      pipeline: PricingPipeline) -> Union[List[QuantitySegment], CalculationError]:
+    """
+    Сегменты кривой цены для заказа (все, кроме тиража, — из заказа).
+    Соседние ступени с одинаковой нормой сливаются; все сегменты считаются
+    одним векторным проходом price_columns, поля округляются как в PricingStep.
+    CalculationError — если заказ нельзя посчитать ни при каком тираже
+    (проверяется расчетом самого заказа пайплайном того же конфига).
+    Если своя формула конфига читает тираж, кривая не кусочно-постоянна — ValueError.
+    """
+    if any('quantity' in formula.names for formula in prepared.formulas.values()):
+        raise ValueError("Config formulas depend on quantity, the price curve has no fixed segments")
+    outcome = pipeline.try_run(order)
+    if isinstance(outcome, CalculationError):
+        return outcome
+
+    tiers = prepared.scrap_provider.tier_segments(order.product_type)
+    if tiers is None:
+        raise NotImplementedError("Провайдер брака не задает ступени по тиражу")
+
+    merged: List[List[Any]] = []
+    for lower, upper, rate in tiers:
+        if merged and merged[-1][2] == rate:
+            merged[-1][1] = upper
+        else:
+            merged.append([lower, upper, rate])
+
+    columns = order_columns([order] * len(merged))
+    columns['quantity'] = [lower for lower, _, _ in merged]
+    intermediates = prepared.price_columns(columns)
+
+    def field(name: str) -> List[float]:
+        key, scale, digits = RESULT_FIELDS[name]
+        return [round(v * scale, digits) for v in intermediates[key].tolist()]
+
+    return [
+        QuantitySegment(lower, upper, rate_percent, vc, price)
+        for (lower, upper, _), rate_percent, vc, price in zip(
+            merged, field('scrap_rate_percent'), field('variable_cost'), field('final_price')
+        )
+    ]
+
+
+def breakpoints(segments: List[QuantitySegment]) -> List[int]:
+    """Тиражи, с которых цена за штуку меняется (начала сегментов, кроме первого)."""
+    return [s.min_quantity for prev, s in zip(segments, segments[1:]) if s.unit_price != prev.unit_price]
@@ -0,0 +1,183 @@
+import importlib
+import inspect
+import logging
+import threading
+from importlib.metadata import EntryPoint, entry_points
+from typing import Any, Callable, Dict, List, Mapping, Optional, Union
+from .interfaces import CalculationStep, ScrapRateProvider
+from .models import DEFAULT_STEPS, PipelineDefinition, PricingConfig
+from .pipeline import PricingPipeline
+
+logger = logging.getLogger(__name__)
+
+# Реестр шагов и провайдеров брака по именам. Цель регистрации — сама фабрика
+# (обычно класс) или строка 'модуль:атрибут': модуль импортируется только когда
+# пайплайн действительно использует это имя, поэтому тяжелые необязательные
+# шаги (например, ML-провайдер) не замедляют запуск. Сторонние пакеты
+# добавляют свои шаги через entry points групп STEP_ENTRY_POINTS и
+# SCRAP_PROVIDER_ENTRY_POINTS; явная регистрация важнее entry point с тем же именем.
+
+STEP_ENTRY_POINTS = 'packaging_pricing.steps'
+SCRAP_PROVIDER_ENTRY_POINTS = 'packaging_pricing.scrap_providers'
+
+Target = Union[str, EntryPoint, Callable[..., Any]]
+
+
+class Registry:
+    """Имя -> фабрика с импортом при первом использовании; потокобезопасно."""
+    def __init__(self, kind: str, group: str):
+        self.kind = kind
+        self.group = group
+        self._targets: Dict[str, Target] = {}
+        self._loaded: Dict[str, Callable[..., Any]] = {}
+        self._entry_points: Optional[Dict[str, EntryPoint]] = None
+        self._lock = threading.Lock()
+
+    def register(self, name: str, target: Target, replace: bool = False) -> None:
+        with self._lock:
+            if name in self._targets and not replace:
+                raise ValueError(f"{self.kind} '{name}' уже зарегистрирован")
+            self._targets[name] = target
+            self._loaded.pop(name, None)
+
+    def names(self) -> List[str]:
+        """Все известные имена (зарегистрированные и из entry points), без импорта."""
+        with self._lock:
+            return sorted({*self._targets, *self._discover()})
+
+    def loaded(self) -> List[str]:
+        """Имена, чьи фабрики уже импортированы."""
+        with self._lock:
+            return sorted(self._loaded)
+
+    def get(self, name: str) -> Callable[..., Any]:
+        """Фабрика по имени (импорт при первом обращении). Неизвестное имя — KeyError."""
+        with self._lock:
+            factory = self._loaded.get(name)
+            if factory is not None:
+                return factory
+            target = self._targets.get(name) or self._discover().get(name)
+            if target is None:
+                raise KeyError(f"Неизвестный {self.kind}: '{name}'")
+
+        # Импорт вне блокировки: модуль шага может сам регистрировать имена
+        if isinstance(target, EntryPoint):
+            factory = target.load()
+        elif isinstance(target, str):
+            module, _, attr = target.partition(':')
+            factory = getattr(importlib.import_module(module), attr)
+        else:
+            factory = target
+        with self._lock:
+            factory = self._loaded.setdefault(name, factory)
+        logger.debug("%s '%s' загружен", self.kind, name)
+        return factory
+
+    def _discover(self) -> Dict[str, EntryPoint]:
+        if self._entry_points is None:
+            self._entry_points = {ep.name: ep for ep in entry_points(group=self.group)}
+        return self._entry_points
+
+
+steps = Registry('шаг', STEP_ENTRY_POINTS)
+scrap_providers = Registry('провайдер брака', SCRAP_PROVIDER_ENTRY_POINTS)
+
+steps.register('geometry', 'packaging_pricing.steps:GeometryCalculationStep')
+steps.register('roll_layout', 'packaging_pricing.steps:RollLayoutStep')
+steps.register('scrap', 'packaging_pricing.steps:ScrapCalculationStep')
+steps.register('labor', 'packaging_pricing.steps:LaborCostStep')
+steps.register('material', 'packaging_pricing.steps:MaterialCostStep')
+steps.register('pricing', 'packaging_pricing.steps:PricingStep')
+scrap_providers.register('table', 'packaging_pricing.scraps:TableBasedScrapProvider')
+scrap_providers.register('ml', 'packaging_pricing.ml_scraps:MLScrapRateProvider')
+
+
+def register_step(name: str, target: Target, replace: bool = False) -> None:
+    """Зарегистрировать шаг: класс CalculationStep (или фабрику) либо 'модуль:атрибут'."""
+    steps.register(name, target, replace)
+
+
+def register_scrap_provider(name: str, target: Target, replace: bool = False) -> None:
+    """Зарегистрировать провайдер брака: класс ScrapRateProvider (или фабрику) либо 'модуль:атрибут'."""
+    scrap_providers.register(name, target, replace)
+
+
+class PipelineFactory:
+    """
+    Разрешенное определение пайплайна: фабрики шагов и один экземпляр провайдера
+    брака (общий для всех пайплайнов из этого определения, как и ключи его кэша).
+    Шагу, чей конструктор принимает provider, передается этот провайдер.
+    """
+    def __init__(self, definition: PipelineDefinition):
+        unknown = set(definition.step_options) - set(definition.steps)
+        if unknown:
+            raise ValueError(f"step_options для шагов не из пайплайна: {', '.join(sorted(unknown))}")
+        self.definition = definition
+        self.scrap_provider: ScrapRateProvider = scrap_providers.get(definition.scrap_provider)(
+            **definition.scrap_provider_options
+        )
+        self._steps = []
+        for name in definition.steps:
+            factory = steps.get(name)
+            options = dict(definition.step_options.get(name, {}))
+            if 'provider' in _parameters(factory):
+                options.setdefault('provider', self.scrap_provider)
+            self._steps.append((name, factory, options))
+
+    @property
+    def step_names(self) -> List[str]:
+        return [name for name, _, _ in self._steps]
+
+    @property
+    def standard_steps(self) -> bool:
+        """
+        Стандартные шаги без параметров — то, что повторяет PreparedConfig
+        (с провайдером брака этой фабрики). Иные шаги есть только в пайплайне.
+        """
+        return self.definition.steps == list(DEFAULT_STEPS) and not self.definition.step_options
+
+    def build(self, config: PricingConfig,
+              resources: Optional[Mapping[str, Mapping[str, Any]]] = None) -> PricingPipeline:
+        """
+        Пайплайн для конфига. resources — дополнительные аргументы конструктора по имени
+        шага (например, общие кэши процесса: {'geometry': {'cache': geometry_cache}});
+        ресурсы шагов, которых нет в пайплайне, игнорируются.
+        """
+        resources = resources or {}
+        built: List[CalculationStep] = [
+            factory(**options, **resources.get(name, {})) for name, factory, options in self._steps
+        ]
+        return PricingPipeline(steps=built, config=config)
+
+
+_factories: Dict[str, PipelineFactory] = {}
+_factories_lock = threading.Lock()
+
+
+def resolve_pipeline(definition: Optional[PipelineDefinition] = None) -> PipelineFactory:
+    """
+    Разрешить определение один раз: одинаковые определения (по содержимому)
+    получают одну и ту же фабрику и один провайдер брака. Неизвестное имя — KeyError.
+    """
+    definition = definition or PipelineDefinition()
+    key = definition.model_dump_json()
+    with _factories_lock:
+        factory = _factories.get(key)
+    if factory is not None:
+        return factory
+    factory = PipelineFactory(definition)
+    with _factories_lock:
+        return _factories.setdefault(key, factory)
+
+
+def build_pipeline(config: PricingConfig, definition: Optional[PipelineDefinition] = None,
+                   resources: Optional[Mapping[str, Mapping[str, Any]]] = None) -> PricingPipeline:
+    """Пайплайн по определению (по умолчанию — стандартные шаги и табличный брак)."""
+    return resolve_pipeline(definition).build(config, resources)
+
+
+def _parameters(factory: Callable[..., Any]) -> Mapping[str, inspect.Parameter]:
+    try:
+        return inspect.signature(factory).parameters
+    except (TypeError, ValueError):
+        return {}
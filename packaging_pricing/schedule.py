@@ -0,0 +1,118 @@
+import threading
+from bisect import bisect_right
+from datetime import date
+from typing import Any, List, Mapping, NamedTuple, Optional, Tuple
+import numpy as np
+from .config_source import ConfigSnapshot
+from .registry import PipelineFactory
+from .models import EffectiveConfig
+
+# Дата "бессрочно" для векторного поиска
+_OPEN_END = np.datetime64('9999-12-31', 'D')
+
+
+class _Index(NamedTuple):
+    versions: Tuple[EffectiveConfig, ...]
+    snapshots: Tuple[ConfigSnapshot, ...]
+    starts: Tuple[date, ...]
+    starts64: np.ndarray
+    ends64: np.ndarray
+
+
+def _build_index(versions: List[EffectiveConfig], snapshots: List[ConfigSnapshot]) -> _Index:
+    return _Index(
+        versions=tuple(versions),
+        snapshots=tuple(snapshots),
+        starts=tuple(v.valid_from for v in versions),
+        starts64=np.array([v.valid_from for v in versions], dtype='datetime64[D]'),
+        ends64=np.array([v.valid_to or _OPEN_END for v in versions], dtype='datetime64[D]'),
+    )
+
+
+class ConfigSchedule:
+    """
+    Версии конфигурации по датам действия (EffectiveConfig).
+    Интервалы не пересекаются и хранятся отсортированными по valid_from,
+    поиск версии на дату — бинарный (bisect / searchsorted). Для каждой версии
+    снимок с предрасчитанными таблицами строится один раз при добавлении.
+    Индекс неизменяем и заменяется целиком: чтение без блокировки.
+    Снимки всех версий строятся по одному определению пайплайна factory (с ресурсами resources).
+    """
+    def __init__(self, factory: Optional[PipelineFactory] = None,
+                 resources: Optional[Mapping[str, Mapping[str, Any]]] = None):
+        self._lock = threading.Lock()
+        self.factory = factory
+        self.resources = resources
+        self._index = _build_index([], [])
+
+    @property
+    def versions(self) -> List[EffectiveConfig]:
+        return list(self._index.versions)
+
+    @property
+    def snapshots(self) -> Tuple[ConfigSnapshot, ...]:
+        return self._index.snapshots
+
+    def add(self, version: EffectiveConfig) -> ConfigSnapshot:
+        """Добавить версию. Пересечение с существующим интервалом — ValueError."""
+        snapshot = ConfigSnapshot.build(
+            version.config, f"schedule:{version.valid_from.isoformat()}", self.factory, self.resources
+        )
+        with self._lock:
+            index = self._index
+            for existing in index.versions:
+                if _overlaps(existing, version):
+                    raise ValueError(
+                        f"Интервал пересекается с версией от {existing.valid_from.isoformat()}"
+                    )
+            pos = bisect_right(index.starts, version.valid_from)
+            versions = list(index.versions)
+            snapshots = list(index.snapshots)
+            versions.insert(pos, version)
+            snapshots.insert(pos, snapshot)
+            self._index = _build_index(versions, snapshots)
+        return snapshot
+
+    def remove(self, valid_from: date) -> bool:
+        with self._lock:
+            index = self._index
+            if valid_from not in index.starts:
+                return False
+            pos = index.starts.index(valid_from)
+            versions = list(index.versions)
+            snapshots = list(index.snapshots)
+            del versions[pos], snapshots[pos]
+            self._index = _build_index(versions, snapshots)
+            return True
+
+    def resolve(self, as_of: date) -> Optional[ConfigSnapshot]:
+        """Снимок версии, действующей на дату, или None, если дата не покрыта."""
+        index = self._index
+        pos = bisect_right(index.starts, as_of) - 1
+        if pos < 0:
+            return None
+        valid_to = index.versions[pos].valid_to
+        if valid_to is not None and as_of > valid_to:
+            return None
+        return index.snapshots[pos]
+
+    def resolve_many(self, dates: np.ndarray) -> np.ndarray:
+        """
+        Векторный resolve: номер версии (индекс в snapshots) для каждой даты,
+        -1 — дата не покрыта расписанием или NaT.
+        """
+        index = self._index
+        dates = np.asarray(dates, dtype='datetime64[D]')
+        if len(index.versions) == 0:
+            return np.full(len(dates), -1, dtype=np.int64)
+        pos = np.searchsorted(index.starts64, dates, side='right') - 1
+        covered = (pos >= 0) & ~np.isnat(dates)
+        clipped = np.clip(pos, 0, None)
+        covered &= dates <= index.ends64[clipped]
+        return np.where(covered, pos, -1)
+
+
+def _overlaps(a: EffectiveConfig, b: EffectiveConfig) -> bool:
+    a_end = a.valid_to or date.max
+    b_end = b.valid_to or date.max
+    return a.valid_from <= b_end and b.valid_from <= a_end
@@ -1,3 +1,5 @@
+from typing import Hashable, List, Optional, Sequence, Tuple
+import numpy as np
 from .interfaces import ScrapRateProvider
 from .models import BagType
 
@@ -6,39 +8,58 @@ class TableBasedScrapProvider(ScrapRateProvider):
     Стандартная логика расчета отхода на основе табличных данных по тиражу.
     Ссылка: Раздел B технического задания.
     """
-    def get_scrap_rate(self, quantity: int, bag_type: BagType) -> float:
-        # Строгие правила из ТЗ:
-        # 30,001 - 50,000: 15%
-        # 50,001 - 100,000: 13%
-        # > 100,000: 7%
-        # > 300,000: 6% (реализовано дополнительно)
-        
-        if quantity <= 30000:
-            # Не определено в ТЗ для < 30к, берем максимальный процент для безопасности.
-            # Учитывая, что таблица начинается с "30,001", используем 15% как базу для малых тиражей.
-            return 0.15
-        elif quantity <= 50000:
-            return 0.15
-        elif quantity <= 100000:
-            return 0.13
-        elif quantity <= 300000:
-            return 0.07
-        else:
-            # > 300,000
-            return 0.06
-
-class MLScrapRateProvider(ScrapRateProvider):
-    """
-    Будущая реализация: загрузка обученной ML модели для прогнозирования отхода
-    на основе исторических данных, сложности макета и состояния оборудования.
-    """
-    def __init__(self, model_path: str = "models/scrap_predictor_v1.pkl"):
-        self.model_path = model_path
-        # TODO: Загрузка модели через joblib или torch
-        # self.model = load_model(model_path)
+    # Строгие правила из ТЗ (верхняя граница тиража включительно, норма отхода):
+    # 30,001 - 50,000: 15%
+    # 50,001 - 100,000: 13%
+    # > 100,000: 7%
+    # > 300,000: 6% (реализовано дополнительно)
+    # Не определено в ТЗ для < 30к, берем максимальный процент для безопасности.
+    # Учитывая, что таблица начинается с "30,001", используем 15% как базу для малых тиражей.
+    TIERS = (
+        (30000, 0.15),
+        (50000, 0.15),
+        (100000, 0.13),
+        (300000, 0.07),
+        (None, 0.06),
+    )
+
+    def __init__(self):
+        self._bounds = np.array([b for b, _ in self.TIERS if b is not None], dtype=np.int64)
+        self._rates = np.array([r for _, r in self.TIERS], dtype=np.float64)
+
+    def tier_index(self, quantity: int) -> int:
+        """Номер ступени таблицы для тиража."""
+        for idx, (upper, _) in enumerate(self.TIERS):
+            if upper is None or quantity <= upper:
+                return idx
+        return len(self.TIERS) - 1
 
     def get_scrap_rate(self, quantity: int, bag_type: BagType) -> float:
-        # TODO: Подготовка вектора признаков (features vector)
-        # prediction = self.model.predict([[quantity, bag_type.value]])
-        # return float(prediction[0])
-        raise NotImplementedError("ML модель еще не обучена.")
+        return self.TIERS[self.tier_index(quantity)][1]
+
+    def rate_key(self, quantity: int, bag_type: BagType) -> Hashable:
+        # Норма зависит только от ступени тиража
+        return self.tier_index(quantity)
+
+    def tier_segments(self, bag_type: BagType) -> List[Tuple[int, Optional[int], float]]:
+        segments = []
+        lower = 1
+        for upper, rate in self.TIERS:
+            segments.append((lower, upper, rate))
+            if upper is not None:
+                lower = upper + 1
+        return segments
+
+    def get_scrap_rates(self, quantities: np.ndarray, bag_types: Sequence[BagType]) -> np.ndarray:
+        # side='left': граница входит в свою ступень (quantity <= upper)
+        idx = np.searchsorted(self._bounds, np.asarray(quantities, dtype=np.int64), side='left')
+        return self._rates[idx]
+
+
+def __getattr__(name: str):
+    # MLScrapRateProvider переехал в ml_scraps (тяжелые зависимости); старый импорт
+    # из scraps продолжает работать, но модуль загружается только при обращении
+    if name == 'MLScrapRateProvider':
+        from .ml_scraps import MLScrapRateProvider
+        return MLScrapRateProvider
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
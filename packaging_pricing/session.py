@@ -0,0 +1,89 @@
+from typing import Any, Dict, List, Optional, Set
+from .context import PipelineContext
+from .interfaces import CalculationStep
+from .models import OrderInput, CalculationResult
+from .errors import CalculationFailed
+from .pipeline import PricingPipeline, execute_step
+
+
+class QuoteSession:
+    """
+    Сессия редактирования заказа (черновик формы менеджера).
+    Хранит контекст последнего расчета и при изменении полей перезапускает
+    только затронутые шаги: например, смена тиража пересчитывает
+    брак -> материал -> цену, а геометрия и ставка ЗП берутся из контекста.
+    """
+    def __init__(self, pipeline: PricingPipeline):
+        self.pipeline = pipeline
+        self.draft: Dict[str, Any] = {}
+        self.order: Optional[OrderInput] = None
+        self.context: Optional[PipelineContext] = None
+        # Имена шагов, выполненных при последнем пересчете (для отладки и тестов)
+        self.last_executed: List[str] = []
+
+    def reset(self, pipeline: Optional[PricingPipeline] = None) -> None:
+        """Сбросить контекст (например, после смены конфигурации)."""
+        if pipeline is not None:
+            self.pipeline = pipeline
+        self.order = None
+        self.context = None
+
+    def apply(self, delta: Dict[str, Any]) -> CalculationResult:
+        """
+        Применить изменения полей к черновику и пересчитать результат.
+        Поле features сливается по ключам. Ошибки валидации
+        (pydantic.ValidationError) и ошибки данных заказа (CalculationFailed)
+        пробрасываются, черновик при этом сохраняется.
+        """
+        for key, value in delta.items():
+            if key == 'features' and isinstance(value, dict):
+                self.draft['features'] = {**self.draft.get('features', {}), **value}
+            else:
+                self.draft[key] = value
+
+        order = OrderInput(**self.draft)
+        changed = self._changed_fields(order)
+        self._recalculate(order, changed)
+        return self.context.final_result
+
+    def _changed_fields(self, order: OrderInput) -> Optional[Set[str]]:
+        if self.order is None or self.context is None:
+            return None
+        return {
+            name for name in OrderInput.model_fields
+            if getattr(order, name) != getattr(self.order, name)
+        }
+
+    def _recalculate(self, order: OrderInput, changed: Optional[Set[str]]) -> None:
+        if changed is None:
+            self.context = PipelineContext(input_data=order, config=self.pipeline.config)
+            dirty = list(self.pipeline.steps)
+        else:
+            self.context.input_data = order
+            dirty = self._dirty_steps(changed)
+
+        for step in dirty:
+            error = execute_step(step, self.context)
+            if error is not None:
+                # Контекст частично обновлен: следующий расчет начнется с нуля
+                self.context = None
+                self.order = None
+                raise CalculationFailed(error)
+
+        if self.context.final_result is None:
+            raise RuntimeError("Пайплайн завершен, но финальный результат не сформирован (final_result is None).")
+
+        self.order = order
+        self.last_executed = [type(step).__name__ for step in dirty]
+
+    def _dirty_steps(self, changed: Set[str]) -> List[CalculationStep]:
+        """Шаги, зависящие от измененных полей напрямую или через промежуточные результаты."""
+        stale: Set[str] = set()
+        dirty = []
+        for step in self.pipeline.steps:
+            fields = step.input_fields_for(self.pipeline.config)
+            reads_input = fields is None or bool(fields & changed)
+            if reads_input or (step.requires | step.optional) & stale:
+                dirty.append(step)
+                stale |= step.provides
+        return dirty
@@ -0,0 +1,227 @@
+from typing import Any, Dict, List, Literal, Mapping, Optional, Sequence
+import numpy as np
+from pydantic import BaseModel, Field, model_validator
+from .errors import CalculationError
+from .models import BagType
+from .prepared import PreparedConfig
+
+# Монте-Карло риска маржи: цена КП фиксируется по текущему конфигу, а цена сырья,
+# цена возврата брака и норма брака разыгрываются из распределений.
+# Для каждого розыгрыша считаются цена, которую дала бы модель, и фактическая
+# себестоимость (VC + ROP), маржа = цена КП - себестоимость. Розыгрыш — общий
+# рыночный сценарий для всех заказов портфеля, поэтому итог по портфелю
+# учитывает, что заказы дорожают одновременно.
+#
+# VC линейна по разыгрываемым величинам, поэтому остальная часть VC
+# (энергия, ЗП, коробка, опции) берется из одного прохода price_columns,
+# а розыгрыши x заказы считаются блоками не больше chunk_cells ячеек.
+
+
+class Distribution(BaseModel):
+    """
+    Распределение входной величины. mean=None — текущее значение из конфига
+    (для scrap_rate_factor — 1, т.е. норма по таблице).
+      fixed      — всегда mean;
+      normal     — mean, std (отсечение снизу нулем);
+      lognormal  — mean, std самой величины (не логарифма);
+      uniform    — low, high;
+      triangular — low, mode, high.
+    """
+    kind: Literal["fixed", "normal", "lognormal", "uniform", "triangular"] = "fixed"
+    mean: Optional[float] = None
+    std: float = Field(default=0.0, ge=0)
+    low: Optional[float] = None
+    high: Optional[float] = None
+    mode: Optional[float] = None
+
+    @model_validator(mode="after")
+    def validate_params(self) -> "Distribution":
+        if self.kind in ("uniform", "triangular"):
+            if self.low is None or self.high is None or self.low > self.high:
+                raise ValueError(f"{self.kind} distribution needs low <= high")
+            if self.kind == "triangular" and (self.mode is None or not self.low <= self.mode <= self.high):
+                raise ValueError("triangular distribution needs low <= mode <= high")
+        if self.kind == "lognormal" and self.mean is not None and self.mean <= 0:
+            raise ValueError("lognormal distribution needs a positive mean")
+        return self
+
+    def base_error(self, base: float) -> Optional[str]:
+        """Почему распределение нельзя разыграть от значения конфига base (mean=None), иначе None."""
+        if self.kind == "lognormal" and self.mean is None and not base > 0:
+            return f"lognormal distribution needs a positive mean, the config value is {base}"
+        return None
+
+    def sample(self, base: float, size: int, rng: np.random.Generator) -> np.ndarray:
+        error = self.base_error(base)
+        if error is not None:
+            raise ValueError(error)
+        mean = base if self.mean is None else self.mean
+        if self.kind == "fixed":
+            return np.full(size, float(mean))
+        if self.kind == "normal":
+            return np.maximum(rng.normal(mean, self.std, size), 0.0)
+        if self.kind == "lognormal":
+            sigma2 = np.log1p((self.std / mean) ** 2)
+            return rng.lognormal(np.log(mean) - sigma2 / 2, np.sqrt(sigma2), size)
+        if self.kind == "uniform":
+            return rng.uniform(self.low, self.high, size)
+        return rng.triangular(self.low, self.mode, self.high, size)
+
+
+class RiskScenario(BaseModel):
+    """Распределения входных величин и параметры розыгрыша."""
+    material_price_bopp: Distribution = Field(default_factory=Distribution)
+    material_price_cpp: Distribution = Field(default_factory=Distribution)
+    scrap_return_price: Distribution = Field(default_factory=Distribution)
+    scrap_rate_factor: Distribution = Field(default_factory=Distribution, description="Множитель нормы брака из таблицы")
+    draws: int = Field(default=10000, ge=100, le=200000)
+    seed: Optional[int] = None
+    percentiles: List[float] = Field(default_factory=lambda: [5.0, 25.0, 50.0, 75.0, 95.0])
+
+    @model_validator(mode="after")
+    def validate_percentiles(self) -> "RiskScenario":
+        if not self.percentiles or any(not 0 <= q <= 100 for q in self.percentiles):
+            raise ValueError("percentiles must be within [0, 100]")
+        return self
+
+
+def input_bases(config: Any) -> Dict[str, float]:
+    """Текущие значения разыгрываемых величин (mean=None распределения)."""
+    return {
+        'material_price_bopp': config.material_price_bopp,
+        'material_price_cpp': config.material_price_cpp,
+        'scrap_return_price': config.scrap_return_price,
+        'scrap_rate_factor': 1.0,
+    }
+
+
+def scenario_errors(scenario: RiskScenario, config: Any) -> List[CalculationError]:
+    """
+    Ошибки параметров, которые зависят от конфига (например, lognormal без mean
+    при нулевой цене в конфиге), в формате ошибок проверки: loc — поле сценария.
+    """
+    errors = []
+    for name, base in input_bases(config).items():
+        msg = getattr(scenario, name).base_error(base)
+        if msg is not None:
+            errors.append(CalculationError('value_error', msg, (name, 'mean')))
+    return errors
+
+
+def draw_inputs(scenario: RiskScenario, prepared: PreparedConfig) -> Dict[str, np.ndarray]:
+    """Розыгрыши входных величин (по массиву длины draws на величину)."""
+    rng = np.random.default_rng(scenario.seed)
+    return {
+        name: getattr(scenario, name).sample(base, scenario.draws, rng)
+        for name, base in input_bases(prepared.config).items()
+    }
+
+
+def simulate_risk(prepared: PreparedConfig, columns: Mapping[str, Sequence[Any]], quantities: Sequence[int],
+                  scenario: RiskScenario, chunk_cells: int = 1_000_000) -> Dict[str, Any]:
+    """
+    Риск маржи по заказам (колонки ORDER_COLUMNS, проверенные заказы) и по портфелю
+    (сумма по тиражам). Для каждого заказа — перцентили цены модели и маржи на штуку,
+    средняя маржа и вероятность убытка; для портфеля — то же для маржи в рублях.
+    Память ограничена chunk_cells ячеек (розыгрыши x заказы) на блок.
+    Розыгрыши опираются на линейность стандартных формул по цене сырья и браку,
+    поэтому конфиг со своими формулами (config.formulas) — ValueError.
+    """
+    if prepared.config.formulas:
+        raise ValueError("Risk simulation does not support config formulas")
+    base = prepared.price_columns(columns)
+    draws = draw_inputs(scenario, prepared)
+    q = np.asarray(scenario.percentiles, dtype=np.float64)
+    quantities = np.asarray(quantities, dtype=np.float64)
+
+    weight = base['weight']
+    scrap_rate = base['scrap_rate']
+    trim = base['trim_weight']
+    is_bopp = np.array([BagType(t) == BagType.BOPP for t in columns['product_type']])
+    # Часть VC, не зависящая от цены сырья и брака
+    other = base['variable_cost'] - base['material_base_cost'] - base['scrap_cost'] - base['trim_cost']
+    quoted = np.round(base['final_price'], 2)
+    overhead = base['overhead_cost']
+    base_margin = quoted - (base['variable_cost'] + overhead)
+
+    n = len(quantities)
+    d = scenario.draws
+    vc_pct = np.zeros((n, len(q)))
+    vc_pct_mirror = np.zeros((n, len(q)))
+    vc_mean = np.zeros(n)
+    loss_probability = np.zeros(n)
+    book_cost = np.zeros(d)
+
+    p_bopp = draws['material_price_bopp']
+    p_cpp = draws['material_price_cpp']
+    scrap_return = draws['scrap_return_price']
+    factor = draws['scrap_rate_factor']
+    # VC, при которой маржа по заказу становится нулевой
+    breakeven_vc = quoted - overhead
+
+    # Блок — заказы x розыгрыши (строка на заказ, чтобы сортировка шла по непрерывной памяти)
+    block = max(1, chunk_cells // d)
+    for start in range(0, n, block):
+        rows = slice(start, start + block)
+        w = weight[rows, None] / 1000.0
+        price = np.where(is_bopp[rows, None], p_bopp, p_cpp)
+        net = price - scrap_return
+        rate = np.clip(scrap_rate[rows, None] * factor, 0.0, 1.0)
+        vc = w * price + w * rate * net + other[rows, None] + (trim[rows, None] / 1000.0) * net
+
+        book_cost += quantities[rows] @ vc
+        vc_mean[rows] = vc.mean(axis=1)
+        loss_probability[rows] = (vc > breakeven_vc[rows, None]).mean(axis=1)
+        vc.sort(axis=1)
+        vc_pct[rows] = _sorted_percentiles(vc, q)
+        vc_pct_mirror[rows] = _sorted_percentiles(vc, 100.0 - q)
+
+    # Цена и маржа — аффинные функции VC заказа, поэтому их перцентили
+    # получаются из перцентилей VC (маржа убывает по VC: p5 маржи — p95 VC)
+    price_pct = vc_pct * prepared.vc_to_price + (weight * prepared.overhead_to_price)[:, None]
+    margin_pct = breakeven_vc[:, None] - vc_pct_mirror
+    margin_mean = breakeven_vc - vc_mean
+    book_cost += overhead @ quantities
+
+    revenue = float(quoted @ quantities)
+    book_margin = revenue - book_cost
+    labels = [_label(p) for p in scenario.percentiles]
+
+    def pct(values: np.ndarray) -> Dict[str, float]:
+        return {label: round(float(v), 4) for label, v in zip(labels, values)}
+
+    return {
+        'draws': d,
+        'seed': scenario.seed,
+        'orders': [
+            {
+                'quoted_price': float(quoted[i]),
+                'base_margin': round(float(base_margin[i]), 4),
+                'unit_price': pct(price_pct[i]),
+                'margin': pct(margin_pct[i]),
+                'margin_mean': round(float(margin_mean[i]), 4),
+                'loss_probability': float(loss_probability[i]),
+            }
+            for i in range(n)
+        ],
+        'book': {
+            'revenue': round(revenue, 2),
+            'base_margin': round(float(base_margin @ quantities), 2),
+            'margin': pct(np.percentile(book_margin, q)),
+            'margin_mean': round(float(book_margin.mean()), 2),
+            'loss_probability': float((book_margin < 0).mean()),
+        },
+    }
+
+
+def _sorted_percentiles(values: np.ndarray, q: np.ndarray) -> np.ndarray:
+    """Перцентили по строкам уже отсортированного массива (линейная интерполяция, как np.percentile)."""
+    position = q / 100.0 * (values.shape[1] - 1)
+    lower = np.floor(position).astype(np.int64)
+    upper = np.minimum(lower + 1, values.shape[1] - 1)
+    frac = position - lower
+    return values[:, lower] * (1.0 - frac) + values[:, upper] * frac
+
+
+def _label(percentile: float) -> str:
+    return f"p{percentile:g}"
@@ -0,0 +1,209 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+from typing import Dict, FrozenSet, Optional, Tuple, Union
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него собираются только .gz
+    brotli = None
+
+# Статика web-интерфейса для медленных каналов филиалов.
+# build_assets (при сборке образа) копирует ресурсы под именами с хэшем
+# содержимого (script.3f2a9c1b.js), переписывает ссылки в HTML и рядом с каждым
+# текстовым файлом кладет сжатые варианты .br/.gz. AssetStaticFiles отдает
+# готовый сжатый вариант по Accept-Encoding; файлы с хэшем в имени кэшируются
+# навсегда (immutable), страницы (index.html) — с проверкой по ETag.
+
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 8
+# Текстовые ресурсы, которые имеет смысл сжимать
+COMPRESSIBLE_SUFFIXES = ('.html', '.css', '.js', '.json', '.svg', '.txt')
+# Меньше одного сетевого пакета сжатие не окупается
+COMPRESS_MIN_BYTES = 1024
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# Варианты по убыванию предпочтения: (Content-Encoding, суффикс файла)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_LINK_RE = re.compile(r'''(?P<attr>(?:href|src)=["'])(?P<path>[^"'?#:]+)(?:\?[^"'#]*)?(?P<end>["'])''')
+
+
+def build_assets(source: str, target: str) -> Dict[str, str]:
+    """
+    Собрать статику из source в target (target пересоздается).
+    Возвращает манифест {исходное имя: имя с хэшем}; он же пишется в target/manifest.json.
+    HTML не переименовывается (это точки входа), ссылки в нем заменяются по манифесту.
+    """
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.makedirs(target)
+
+    manifest: Dict[str, str] = {}
+    pages = []
+    for root, _, files in os.walk(source):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, source).replace(os.sep, '/')
+            if name.endswith('.html'):
+                pages.append(rel)
+                continue
+            with open(path, 'rb') as f:
+                content = f.read()
+            stem, suffix = os.path.splitext(rel)
+            hashed = f"{stem}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{suffix}"
+            _write(target, hashed, content)
+            manifest[rel] = hashed
+
+    for rel in pages:
+        with open(os.path.join(source, rel), encoding='utf-8') as f:
+            html = f.read()
+        base = os.path.dirname(rel)
+
+        def replace(match: re.Match) -> str:
+            link = os.path.normpath(os.path.join(base, match.group('path'))).replace(os.sep, '/')
+            if link not in manifest:
+                return match.group(0)
+            hashed = os.path.relpath(manifest[link], base or '.').replace(os.sep, '/')
+            return f"{match.group('attr')}{hashed}{match.group('end')}"
+
+        _write(target, rel, _LINK_RE.sub(replace, html).encode('utf-8'))
+
+    with open(os.path.join(target, MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+
+def _write(target: str, rel: str, content: bytes) -> None:
+    """Файл и (для текстовых ресурсов от COMPRESS_MIN_BYTES) его сжатые варианты."""
+    path = os.path.join(target, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    if not rel.endswith(COMPRESSIBLE_SUFFIXES) or len(content) < COMPRESS_MIN_BYTES:
+        return
+    # mtime=0: одинаковый вход дает одинаковый .gz (воспроизводимая сборка образа)
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(content, quality=11))
+
+
+def accepted_encodings(header: str) -> FrozenSet[str]:
+    """Кодировки из Accept-Encoding (без явно запрещенных q=0)."""
+    accepted = set()
+    for part in header.split(','):
+        token, _, params = part.strip().partition(';')
+        q = params.strip()
+        if q.startswith('q=') and _q_value(q[2:]) == 0:
+            continue
+        if token:
+            accepted.add(token.strip().lower())
+    return frozenset(accepted)
+
+
+def _q_value(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        return 1.0
+
+
+class AssetStaticFiles(StaticFiles):
+    """
+    StaticFiles со сжатыми вариантами (.br/.gz рядом с файлом) и Cache-Control:
+    имена из манифеста build_assets — immutable, остальное — no-cache (ETag).
+    Без манифеста (исходный каталог static/) все файлы отдаются с no-cache.
+    """
+    def __init__(self, *, directory: str, html: bool = False, check_dir: bool = True):
+        super().__init__(directory=directory, html=html, check_dir=check_dir)
+        manifest_path = os.path.join(directory, MANIFEST)
+        self.immutable: FrozenSet[str] = frozenset()
+        if os.path.exists(manifest_path):
+            with open(manifest_path, encoding='utf-8') as f:
+                self.immutable = frozenset(json.load(f).values())
+
+    def file_response(self, full_path: Union[str, 'os.PathLike[str]'], stat_result: os.stat_result, scope: Scope,
+                      status_code: int = 200) -> Response:
+        full_path = os.fspath(full_path)
+        rel = os.path.relpath(full_path, os.path.realpath(self.directory)).replace(os.sep, '/')
+        cache_control = IMMUTABLE_CACHE_CONTROL if rel in self.immutable else REVALIDATE_CACHE_CONTROL
+        request_headers = Headers(scope=scope)
+
+        variant = self._variant(full_path, request_headers.get('accept-encoding', ''))
+        if variant is None:
+            response: Response = super().file_response(full_path, stat_result, scope, status_code)
+            response.headers['Cache-Control'] = cache_control
+            if full_path.endswith(COMPRESSIBLE_SUFFIXES):
+                response.headers.setdefault('Vary', 'Accept-Encoding')
+            return response
+
+        encoding, path, variant_stat = variant
+        response = FileResponse(
+            path, status_code=status_code, stat_result=variant_stat,
+            media_type=mimetypes.guess_type(full_path)[0] or 'text/plain',
+            headers={'Content-Encoding': encoding, 'Vary': 'Accept-Encoding', 'Cache-Control': cache_control}
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+    @staticmethod
+    def _variant(full_path: str, accept_encoding: str) -> Optional[Tuple[str, str, os.stat_result]]:
+        if not accept_encoding or not full_path.endswith(COMPRESSIBLE_SUFFIXES):
+            return None
+        accepted = accepted_encodings(accept_encoding)
+        for encoding, suffix in ENCODINGS:
+            if encoding in accepted:
+                try:
+                    return encoding, full_path + suffix, os.stat(full_path + suffix)
+                except FileNotFoundError:
+                    continue
+        return None
+
+
+# Типы ответов API, которые сжимаются на лету (большие JSON/NDJSON и выгрузки CSV/TSV);
+# xlsx/parquet уже сжаты, поток Arrow читается клиентом по мере поступления
+COMPRESSIBLE_CONTENT_TYPES = (
+    'application/json', 'application/x-ndjson', 'text/csv', 'text/tab-separated-values',
+)
+
+
+class _ContentTypeGZipResponder(GZipResponder):
+    async def send_with_compression(self, message: Message) -> None:
+        await super().send_with_compression(message)
+        if message['type'] == 'http.response.start':
+            content_type = Headers(raw=message['headers']).get('content-type', '')
+            if not content_type.startswith(COMPRESSIBLE_CONTENT_TYPES):
+                self.content_type_is_excluded = True
+
+
+class ResponseCompressionMiddleware:
+    """
+    gzip на лету для ответов COMPRESSIBLE_CONTENT_TYPES от minimum_size байт
+    (потоковые ответы — всегда), если клиент принимает gzip. Ответы с уже
+    заданным Content-Encoding (сжатая статика) не трогаются.
+    """
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESS_MIN_BYTES, compresslevel: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope['type'] != 'http' or 'gzip' not in accepted_encodings(Headers(scope=scope).get('accept-encoding', '')):
+            await self.app(scope, receive, send)
+            return
+        responder = _ContentTypeGZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+        await responder(scope, receive, send)
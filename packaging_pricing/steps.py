@@ -1,36 +1,131 @@
+import math
+from typing import Any, FrozenSet, Optional, Tuple
+from .cache import LRUCache
 from .interfaces import CalculationStep, ScrapRateProvider
 from .context import PipelineContext
+from .errors import CalculationError, check_features, formula_error
+from .formulas import compile_formula
+from .layout import layout_details, no_roll_layout, solve_layout, trim_weight
 from .models import BagType, CalculationResult
 
 class GeometryCalculationStep(CalculationStep):
     """
     Формула A: Вес пакета (в граммах)
     weight = ((width + fold) * (length + flap / 2) * thickness * 2 * density) / 10000
+
+    cache — необязательный LRU-кэш веса по геометрии (заказы каталога часто
+    отличаются только тиражом или печатью). Можно разделять между пайплайнами.
     """
+    input_fields = frozenset({'width', 'fold', 'length', 'flap', 'thickness'})
+    provides = frozenset({'weight'})
+
+    def __init__(self, cache: Optional[LRUCache] = None):
+        self.cache = cache
+
     def execute(self, context: PipelineContext) -> None:
         i = context.input_data
         c = context.config
-        
+
+        if self.cache is not None:
+            key = (i.width, i.fold, i.length, i.flap, i.thickness, c.density)
+            weight = self.cache.get(key)
+            if weight is None:
+                weight = self._weight(i, c)
+                self.cache.put(key, weight)
+        else:
+            weight = self._weight(i, c)
+        context.set_intermediate('weight', weight)
+
+    @staticmethod
+    def _weight(i, c) -> float:
         # Расчет веса.
         # density в г/см3 (строго 0.91 по ТЗ)
         # размеры в см, толщина в микронах.
         # Делитель 10000 используется согласно формуле ТЗ для приведения размерностей.
         # Множитель 2 учитывает двойной слой пленки (рукав/полурукав -> пакет).
         
-        weight = ((i.width + i.fold) * (i.length + i.flap / 2) * i.thickness * 2 * c.density) / 10000
-        context.set_intermediate('weight', weight)
+        return ((i.width + i.fold) * (i.length + i.flap / 2) * i.thickness * 2 * c.density) / 10000
+
+
+class RollLayoutStep(CalculationStep):
+    """
+    Раскладка пакетов поперек рукава/рулона и стоимость обрези.
+    Из доступных ширин (config.roll_widths) выбирается раскладка с наименьшей
+    долей обрези; обрезь делится между ручьями и добавляется к переменным
+    затратам как лишнее сырье за вычетом возврата:
+        trim_weight = weight * обрезь / (ручьи * (width + fold))
+        trim_cost   = trim_weight / 1000 * (цена_сырья - цена_возврата)
+    Без roll_widths шаг ничего не добавляет (trim_cost = 0).
+
+    cache — необязательный LRU-кэш решений по (ручей, ширины, кромка):
+    каталог с повторяющимися размерами не решает раскладку заново.
+    """
+    input_fields = frozenset({'width', 'fold', 'product_type'})
+    requires = frozenset({'weight'})
+    provides = frozenset({'layout', 'trim_weight', 'trim_cost'})
+
+    def __init__(self, cache: Optional[LRUCache] = None):
+        self.cache = cache
+
+    def execute(self, context: PipelineContext) -> Optional[CalculationError]:
+        i = context.input_data
+        c = context.config
+
+        if not c.roll_widths:
+            context.set_intermediate('layout', None)
+            context.set_intermediate('trim_weight', 0.0)
+            context.set_intermediate('trim_cost', 0.0)
+            return None
+
+        lane_width = i.width + i.fold
+        if self.cache is not None:
+            key = (lane_width, tuple(c.roll_widths), c.roll_edge_trim)
+            layout = self.cache.get(key)
+            if layout is None:
+                layout = solve_layout(lane_width, c.roll_widths, c.roll_edge_trim)
+                if layout is not None:
+                    self.cache.put(key, layout)
+        else:
+            layout = solve_layout(lane_width, c.roll_widths, c.roll_edge_trim)
+        if layout is None:
+            return no_roll_layout(lane_width)
+
+        trim = trim_weight(context.get_intermediate('weight'), layout, lane_width)
+        price_per_kg = c.material_price_bopp if i.product_type == BagType.BOPP else c.material_price_cpp
+        context.set_intermediate('layout', layout)
+        context.set_intermediate('trim_weight', trim)
+        context.set_intermediate('trim_cost', (trim / 1000.0) * (price_per_kg - c.scrap_return_price))
+        return None
 
 
 class ScrapCalculationStep(CalculationStep):
     """
     Формула B: Процент отхода (брак).
     Использует внедренный провайдер (таблица или ML).
+
+    cache — необязательный LRU-кэш нормы по ключу провайдера (rate_key:
+    для таблицы — ступень тиража). Разделять кэш можно только между шагами
+    с одинаковым провайдером.
     """
-    def __init__(self, provider: ScrapRateProvider):
+    input_fields = frozenset({'quantity', 'product_type'})
+    provides = frozenset({'scrap_rate'})
+
+    def __init__(self, provider: ScrapRateProvider, cache: Optional[LRUCache] = None):
         self.provider = provider
+        self.cache = cache
 
     def execute(self, context: PipelineContext) -> None:
-        rate = self.provider.get_scrap_rate(context.input_data.quantity, context.input_data.product_type)
+        quantity = context.input_data.quantity
+        bag_type = context.input_data.product_type
+
+        if self.cache is not None:
+            key = self.provider.rate_key(quantity, bag_type)
+            rate = self.cache.get(key)
+            if rate is None:
+                rate = self.provider.get_scrap_rate(quantity, bag_type)
+                self.cache.put(key, rate)
+        else:
+            rate = self.provider.get_scrap_rate(quantity, bag_type)
         context.set_intermediate('scrap_rate', rate)
 
 
@@ -39,6 +134,9 @@ class LaborCostStep(CalculationStep):
     Формула C: Затраты на труд и электроэнергию.
     Выбор тарифа в зависимости от типа пакета (стандарт/викет) и ширины.
     """
+    input_fields = frozenset({'width', 'features'})
+    provides = frozenset({'electricity', 'salary_rate'})
+
     def execute(self, context: PipelineContext) -> None:
         i = context.input_data
         c = context.config
@@ -73,7 +171,20 @@ class MaterialCostStep(CalculationStep):
     Формула D: Переменные затраты (Variable Cost - VC).
     VC включает: сырье, отходы, электроэнергию, ЗП, коробки и опции (клей, клипсы и т.д.).
     """
-    def execute(self, context: PipelineContext) -> None:
+    input_fields = frozenset({'product_type', 'width', 'features'})
+    requires = frozenset({'weight', 'scrap_rate', 'electricity', 'salary_rate'})
+    provides = frozenset({'variable_cost', 'material_base_cost', 'scrap_cost', 'labor_cost', 'options_cost'})
+    optional = frozenset({'trim_cost'})
+
+    def input_fields_for(self, config: Any) -> Optional[FrozenSet[str]]:
+        return _with_formula_fields(self.input_fields, config, ('variable_cost',))
+
+    def execute(self, context: PipelineContext) -> Optional[CalculationError]:
+        # Опции, которые нельзя тарифицировать (неизвестный еврослот и т.п.)
+        error = check_features(context.input_data.features)
+        if error is not None:
+            return error
+
         # Получаем промежуточные данные
         weight = context.get_intermediate('weight')
         scrap_rate = context.get_intermediate('scrap_rate')
@@ -121,8 +232,24 @@ class MaterialCostStep(CalculationStep):
             # ТЗ: Клипсы * 2 / 200 (автоматически для викет-пакетов)
             options_cost += (c.feature_rates["clips"] * 2) / 200.0
 
+        # 6. Обрезь при раскладке на рулон (если в пайплайне есть RollLayoutStep)
+        trim_cost = context.intermediates.get('trim_cost', 0.0)
+
         # Итого Variable Cost
-        vc = material_base_cost + scrap_cost + electricity + labor_cost + box_unit_cost + options_cost
+        vc = material_base_cost + scrap_cost + electricity + labor_cost + box_unit_cost + options_cost + trim_cost
+
+        # Своя формула VC из конфига вместо стандартной суммы
+        formula = c.formulas.get('variable_cost')
+        if formula is not None:
+            vc = compile_formula('variable_cost', formula).evaluate(i, c, {
+                **context.intermediates,
+                'material_base_cost': material_base_cost,
+                'scrap_cost': scrap_cost,
+                'labor_cost': labor_cost,
+                'options_cost': options_cost,
+            })
+            if not math.isfinite(vc):
+                return formula_error('variable_cost')
 
         context.set_intermediate('variable_cost', vc)
         context.set_intermediate('material_base_cost', material_base_cost)
@@ -136,7 +263,18 @@ class PricingStep(CalculationStep):
     Формула E: Финальная цена (Final Price).
     Price = ((VC / k2) + VC) * k3 + (rop * weight / 1000)
     """
-    def execute(self, context: PipelineContext) -> None:
+    input_fields = frozenset()
+    requires = frozenset({
+        'variable_cost', 'weight', 'scrap_rate', 'material_base_cost', 'scrap_cost',
+        'labor_cost', 'options_cost', 'electricity', 'salary_rate'
+    })
+    provides = frozenset({'overhead_cost', 'final_price'})
+    optional = frozenset({'layout', 'trim_cost'})
+
+    def input_fields_for(self, config: Any) -> Optional[FrozenSet[str]]:
+        return _with_formula_fields(self.input_fields, config, ('overhead_cost', 'final_price'))
+
+    def execute(self, context: PipelineContext) -> Optional[CalculationError]:
         vc = context.get_intermediate('variable_cost')
         weight = context.get_intermediate('weight')
         c = context.config
@@ -152,12 +290,33 @@ class PricingStep(CalculationStep):
         # 3. Добавление накладных расходов (ROP)
         # rop задан в руб/кг.
         overhead_cost = (c.rop_overhead * weight) / 1000.0
-        
+
+        # Своя формула накладных из конфига вместо стандартной
+        formula = c.formulas.get('overhead_cost')
+        if formula is not None:
+            overhead_cost = compile_formula('overhead_cost', formula).evaluate(
+                context.input_data, c, context.intermediates
+            )
+            if not math.isfinite(overhead_cost):
+                return formula_error('overhead_cost')
+
         # Исправленная формула:
         # Price = ((VC / k2) + VC + (rop * weight / 1000)) * k3
         price_before_k3 = base_price + overhead_cost
         final_price = price_before_k3 * c.k3_margin_multiplier
 
+        formula = c.formulas.get('final_price')
+        if formula is not None:
+            final_price = compile_formula('final_price', formula).evaluate(
+                context.input_data, c, {**context.intermediates, 'overhead_cost': overhead_cost}
+            )
+            if not math.isfinite(final_price):
+                return formula_error('final_price')
+
+        # Неокругленные значения для расшифровки цены (превью/экспорт)
+        context.set_intermediate('overhead_cost', overhead_cost)
+        context.set_intermediate('final_price', final_price)
+
         # Формирование финального результата
         context.final_result = CalculationResult(
             weight_grams=round(weight, 4),
@@ -173,6 +332,20 @@ class PricingStep(CalculationStep):
             details={
                 "electricity": context.get_intermediate('electricity'),
                 "salary_rate": context.get_intermediate('salary_rate'),
-                "box_component": c.box_cost / 2000.0
+                "box_component": c.box_cost / 2000.0,
+                **layout_details(context.intermediates.get('layout'), context.intermediates.get('trim_cost', 0.0))
             }
         )
+        return None
+
+
+def _with_formula_fields(fields: Optional[FrozenSet[str]], config: Any,
+                         targets: Tuple[str, ...]) -> Optional[FrozenSet[str]]:
+    """input_fields шага плюс поля заказа, которые читают его формулы из конфига."""
+    formulas = getattr(config, 'formulas', None)
+    if fields is None or not formulas:
+        return fields
+    for target in targets:
+        if target in formulas:
+            fields = fields | compile_formula(target, formulas[target]).order_fields
+    return fields
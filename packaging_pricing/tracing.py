@@ -0,0 +1,233 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Mapping, MutableMapping, Optional, Sequence
+
+# Трассировка без коллектора: подмножество API OpenTelemetry
+# (start_as_current_span, set_attribute, set_status, record_exception)
+# и W3C traceparent для сквозного trace id из HTTP-запроса.
+# Спаны отдаются экспортерам (в память / в JSONL-файл) по завершении.
+
+_TRACEPARENT = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+
+STATUS_UNSET = 'UNSET'
+STATUS_OK = 'OK'
+STATUS_ERROR = 'ERROR'
+
+
+class SpanContext:
+    """Идентификаторы спана (hex, как в traceparent)."""
+    __slots__ = ('trace_id', 'span_id')
+
+    def __init__(self, trace_id: str, span_id: str):
+        self.trace_id = trace_id
+        self.span_id = span_id
+
+
+class Span:
+    """Завершенный или выполняющийся спан."""
+    __slots__ = ('name', 'context', 'parent_id', 'start_ns', 'end_ns', 'attributes', 'status', 'status_description', 'events')
+
+    def __init__(self, name: str, context: SpanContext, parent_id: Optional[str],
+                 attributes: Optional[Mapping[str, Any]] = None):
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = STATUS_UNSET
+        self.status_description: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+
+    def get_span_context(self) -> SpanContext:
+        return self.context
+
+    def is_recording(self) -> bool:
+        return self.end_ns is None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_status(self, status: str, description: Optional[str] = None) -> None:
+        self.status = status
+        self.status_description = description
+
+    def record_exception(self, exc: BaseException) -> None:
+        self.events.append({
+            'name': 'exception',
+            'time_unix_nano': time.time_ns(),
+            'attributes': {'exception.type': type(exc).__name__, 'exception.message': str(exc)},
+        })
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Плоское представление спана (поля как в OTLP JSON)."""
+        return {
+            'name': self.name,
+            'trace_id': self.context.trace_id,
+            'span_id': self.context.span_id,
+            'parent_span_id': self.parent_id,
+            'start_time_unix_nano': self.start_ns,
+            'end_time_unix_nano': self.end_ns,
+            'duration_ms': self.duration_ms,
+            'attributes': self.attributes,
+            'status': {'code': self.status, 'description': self.status_description},
+            'events': self.events,
+        }
+
+
+class _NonRecordingSpan:
+    """Заглушка, когда трассировка выключена: вызовы API ничего не стоят."""
+    __slots__ = ()
+
+    def is_recording(self) -> bool:
+        return False
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_status(self, status: str, description: Optional[str] = None) -> None:
+        pass
+
+    def record_exception(self, exc: BaseException) -> None:
+        pass
+
+
+_NON_RECORDING = _NonRecordingSpan()
+
+# Текущий спан (и удаленный родитель из traceparent). contextvars переживают
+# переход в пул потоков Starlette, поэтому синхронные эндпоинты видят спан запроса.
+_current_span: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+_remote_parent: ContextVar[Optional[SpanContext]] = ContextVar('remote_parent', default=None)
+
+
+class InMemorySpanExporter:
+    """Последние maxlen спанов в памяти (для /api/traces и тестов)."""
+    def __init__(self, maxlen: int = 10000):
+        self._spans: "deque[Span]" = deque(maxlen=maxlen)
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[Span]) -> None:
+        with self._lock:
+            self._spans.extend(spans)
+
+    def get_finished_spans(self, trace_id: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            spans = list(self._spans)
+        if trace_id is not None:
+            spans = [s for s in spans if s.context.trace_id == trace_id]
+        return spans
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+
+class JsonLinesSpanExporter:
+    """Дописывает спаны в файл, по одному JSON на строку."""
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: Sequence[Span]) -> None:
+        lines = ''.join(json.dumps(s.to_dict(), ensure_ascii=False, default=str) + '\n' for s in spans)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+
+
+class Tracer:
+    """
+    Создает спаны и передает завершенные экспортерам.
+    Без экспортеров трассировка выключена и start_as_current_span
+    возвращает неактивный спан.
+    """
+    def __init__(self, exporters: Optional[Sequence[Any]] = None):
+        self.exporters: List[Any] = list(exporters or [])
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.exporters)
+
+    def add_exporter(self, exporter: Any) -> None:
+        self.exporters.append(exporter)
+
+    @contextmanager
+    def start_as_current_span(self, name: str, attributes: Optional[Mapping[str, Any]] = None) -> Iterator[Any]:
+        if not self.exporters:
+            yield _NON_RECORDING
+            return
+
+        parent = _current_span.get()
+        if parent is not None:
+            trace_id, parent_id = parent.context.trace_id, parent.context.span_id
+        else:
+            remote = _remote_parent.get()
+            trace_id = remote.trace_id if remote else _random_hex(16)
+            parent_id = remote.span_id if remote else None
+
+        span = Span(name, SpanContext(trace_id, _random_hex(8)), parent_id, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            span.set_status(STATUS_ERROR, str(e))
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            for exporter in self.exporters:
+                exporter.export([span])
+
+
+def _random_hex(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def get_current_span() -> Any:
+    span = _current_span.get()
+    return span if span is not None else _NON_RECORDING
+
+
+def extract(headers: Mapping[str, str]) -> Optional[SpanContext]:
+    """Родитель из заголовка W3C traceparent (None, если заголовка нет или он некорректен)."""
+    value = headers.get('traceparent')
+    if not value:
+        return None
+    match = _TRACEPARENT.match(value.strip().lower())
+    if not match or match.group(1) == '0' * 32 or match.group(2) == '0' * 16:
+        return None
+    return SpanContext(match.group(1), match.group(2))
+
+
+def inject(headers: MutableMapping[str, str]) -> None:
+    """Записать traceparent текущего спана в заголовки."""
+    span = _current_span.get()
+    if span is not None:
+        headers['traceparent'] = f"00-{span.context.trace_id}-{span.context.span_id}-01"
+
+
+@contextmanager
+def remote_parent(context: Optional[SpanContext]) -> Iterator[None]:
+    """Сделать входящий traceparent родителем корневых спанов внутри блока."""
+    token = _remote_parent.set(context)
+    try:
+        yield
+    finally:
+        _remote_parent.reset(token)
+
+
+# Глобальный трассировщик пакета; экспортеры подключает приложение
+tracer = Tracer()
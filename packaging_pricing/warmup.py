@@ -0,0 +1,55 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Прогрев процесса перед приемом трафика: первые вызовы импортируют тяжелые
+# модули (pandas/openpyxl при выгрузке Excel), строят таблицы конфига и кэши.
+# Фазы выполняются по порядку в фоновом потоке; готовность (readyz) наступает,
+# когда пройдены все фазы. Упавшая фаза не блокирует готовность — прогрев лишь
+# убирает задержку первого запроса, ошибка записывается в статус и в лог.
+
+
+class WarmUp:
+    """Фазы прогрева (имя, функция) и статус готовности; потокобезопасно."""
+    def __init__(self, phases: Sequence[Tuple[str, Callable[[], Any]]]):
+        self.phases = list(phases)
+        self.durations_ms: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self._done = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._done.is_set()
+
+    def run(self) -> None:
+        """Выполнить все фазы в текущем потоке."""
+        for name, phase in self.phases:
+            start = time.perf_counter()
+            try:
+                phase()
+            except Exception as e:
+                logger.exception("Фаза прогрева '%s' завершилась ошибкой", name)
+                self.errors[name] = f"{type(e).__name__}: {e}"
+            self.durations_ms[name] = round((time.perf_counter() - start) * 1000, 1)
+        logger.info("Прогрев завершен за %.1f мс", sum(self.durations_ms.values()))
+        self._done.set()
+
+    def start(self) -> None:
+        """Прогрев в фоновом потоке (повторный вызов ничего не делает)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name='warmup', daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'ready': self.ready,
+            'phases_ms': dict(self.durations_ms),
+            'errors': dict(self.errors),
+        }
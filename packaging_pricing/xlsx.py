@@ -0,0 +1,242 @@
+"""
+Minimal streaming XLSX writer for large exports.
+
+pandas/openpyxl build a cell object per value and serialize it through an
+XML tree, which costs seconds per 100k rows. Here every sheet body is plain
+SpreadsheetML text: cell prefixes (style ids) are precomputed once per column,
+a row is one string join, and the sheet is spooled to a temporary file so that
+several sheets can be filled in a single pass over the data.
+"""
+import io
+import math
+import re
+import tempfile
+import zipfile
+from typing import Any, Dict, IO, List, Optional, Sequence
+from xml.sax.saxutils import escape
+
+_SPOOL_LIMIT = 8 * 1024 * 1024
+
+# Built-in cellXfs: 0 - default, 1 - bold header. Number formats follow.
+_STYLE_HEADER = 1
+_FIRST_NUMFMT_STYLE = 2
+_FIRST_CUSTOM_NUMFMT_ID = 164
+
+_CONTENT_TYPES_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+)
+
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+)
+
+
+# Control characters XML 1.0 does not allow even escaped; dropped like openpyxl's ILLEGAL_CHARACTERS_RE
+_ILLEGAL_CHARACTERS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _xml_text(value: str, entities: Optional[Dict[str, str]] = None) -> str:
+    return escape(_ILLEGAL_CHARACTERS.sub('', value), entities or {})
+
+
+def _cell_text(value: str) -> str:
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{_xml_text(value)}</t></is></c>'
+
+
+class SheetStream:
+    """One worksheet being written. Created by StreamingXlsxWriter.add_sheet()."""
+
+    def __init__(self, title: str, columns: Sequence[str], number_styles: Dict[int, int]):
+        self.title = title
+        self.ncols = len(columns)
+        self._body: IO[str] = tempfile.SpooledTemporaryFile(
+            max_size=_SPOOL_LIMIT, mode='w+', encoding='utf-8'
+        )
+        # Precomputed per-column prefix for numeric cells (carries the number format)
+        self._num_prefix = [
+            f'<c s="{number_styles[idx]}"><v>' if idx in number_styles else '<c><v>'
+            for idx in range(self.ncols)
+        ]
+        self._widths = [len(str(col)) for col in columns]
+        self._body.write('<row>' + ''.join(
+            f'<c t="inlineStr" s="{_STYLE_HEADER}"><is><t>{_xml_text(str(col))}</t></is></c>'
+            for col in columns
+        ) + '</row>')
+        self.rows = 1
+
+    def append(self, values: Sequence[Any]) -> None:
+        """Writes one row. Strings become inline strings, None an empty cell."""
+        parts = []
+        widths = self._widths
+        for idx, value in enumerate(values):
+            if value is None:
+                parts.append('<c/>')
+                continue
+            if isinstance(value, str):
+                text = value
+                parts.append(_cell_text(value))
+            elif isinstance(value, bool):
+                text = 'TRUE' if value else 'FALSE'
+                parts.append(f'<c t="b"><v>{int(value)}</v></c>')
+            else:
+                text = str(value)
+                if isinstance(value, float) and not math.isfinite(value):
+                    parts.append(_cell_text(text))
+                else:
+                    parts.append(self._num_prefix[idx] + text + '</v></c>')
+            if len(text) > widths[idx]:
+                widths[idx] = len(text)
+        self._body.write('<row>' + ''.join(parts) + '</row>')
+        self.rows += 1
+
+    def _write_to(self, zf: zipfile.ZipFile, name: str) -> None:
+        cols = ''.join(
+            f'<col min="{idx}" max="{idx}" width="{(width + 2) * 1.2:.2f}" customWidth="1"/>'
+            for idx, width in enumerate(self._widths, start=1)
+        )
+        with zf.open(name, 'w', force_zip64=True) as raw:
+            out = io.TextIOWrapper(raw, encoding='utf-8')
+            out.write(_SHEET_HEAD)
+            out.write('<sheetViews><sheetView workbookViewId="0"><pane ySplit="1" topLeftCell="A2" '
+                      'activePane="bottomLeft" state="frozen"/></sheetView></sheetViews>')
+            out.write(f'<cols>{cols}</cols><sheetData>')
+            self._body.seek(0)
+            while True:
+                chunk = self._body.read(1024 * 1024)
+                if not chunk:
+                    break
+                out.write(chunk)
+            out.write('</sheetData></worksheet>')
+            out.flush()
+            out.detach()
+        self._body.close()
+
+
+class StreamingXlsxWriter:
+    """
+    Writes a workbook of several sheets in one pass.
+
+        writer = StreamingXlsxWriter(number_formats=['0.0000'])
+        sheet = writer.add_sheet('Расчет', COLUMNS, {'Сырье': '0.0000'})
+        sheet.append([...])
+        data = writer.close()   # io.BytesIO
+
+    Column widths follow the longest value seen, like the auto-size in generate_excel_bytes.
+    """
+
+    def __init__(self, number_formats: Optional[Sequence[str]] = None):
+        self._formats: List[str] = list(dict.fromkeys(number_formats or []))
+        self._sheets: List[SheetStream] = []
+
+    def add_sheet(self, title: str, columns: Sequence[str],
+                  column_formats: Optional[Dict[str, str]] = None) -> SheetStream:
+        number_styles = {}
+        for idx, col in enumerate(columns):
+            fmt = (column_formats or {}).get(col)
+            if fmt is None:
+                continue
+            if fmt not in self._formats:
+                self._formats.append(fmt)
+            number_styles[idx] = _FIRST_NUMFMT_STYLE + self._formats.index(fmt)
+        sheet = SheetStream(title, columns, number_styles)
+        self._sheets.append(sheet)
+        return sheet
+
+    def close(self, output: Optional[IO[bytes]] = None) -> IO[bytes]:
+        """Assembles the workbook into output (a new BytesIO by default, or e.g. an open file)."""
+        if output is None:
+            output = io.BytesIO()
+        with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+            zf.writestr('[Content_Types].xml', self._content_types())
+            zf.writestr('_rels/.rels', _ROOT_RELS)
+            zf.writestr('xl/workbook.xml', self._workbook())
+            zf.writestr('xl/_rels/workbook.xml.rels', self._workbook_rels())
+            zf.writestr('xl/styles.xml', self._styles())
+            for n, sheet in enumerate(self._sheets, start=1):
+                sheet._write_to(zf, f'xl/worksheets/sheet{n}.xml')
+        if output.seekable():
+            output.seek(0)
+        return output
+
+    def _content_types(self) -> str:
+        sheets = ''.join(
+            f'<Override PartName="/xl/worksheets/sheet{n}.xml" '
+            f'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            for n in range(1, len(self._sheets) + 1)
+        )
+        return _CONTENT_TYPES_HEAD + sheets + '</Types>'
+
+    def _workbook(self) -> str:
+        sheets = ''.join(
+            f'<sheet name="{_xml_text(sheet.title, {chr(34): "&quot;"})}" sheetId="{n}" r:id="rId{n}"/>'
+            for n, sheet in enumerate(self._sheets, start=1)
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets>{sheets}</sheets></workbook>'
+        )
+
+    def _workbook_rels(self) -> str:
+        rels = ''.join(
+            f'<Relationship Id="rId{n}" '
+            f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+            f'Target="worksheets/sheet{n}.xml"/>'
+            for n in range(1, len(self._sheets) + 1)
+        )
+        n = len(self._sheets) + 1
+        rels += (
+            f'<Relationship Id="rId{n}" '
+            f'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+            f'Target="styles.xml"/>'
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'{rels}</Relationships>'
+        )
+
+    def _styles(self) -> str:
+        num_fmts = ''.join(
+            f'<numFmt numFmtId="{_FIRST_CUSTOM_NUMFMT_ID + i}" formatCode="{escape(fmt, {chr(34): "&quot;"})}"/>'
+            for i, fmt in enumerate(self._formats)
+        )
+        xfs = ''.join(
+            f'<xf numFmtId="{_FIRST_CUSTOM_NUMFMT_ID + i}" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+            for i in range(len(self._formats))
+        )
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f'<numFmts count="{len(self._formats)}">{num_fmts}</numFmts>'
+            '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+            '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+            '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+            '<fill><patternFill patternType="gray125"/></fill></fills>'
+            '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            f'<cellXfs count="{_FIRST_NUMFMT_STYLE + len(self._formats)}">'
+            '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+            '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+            f'{xfs}</cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            '</styleSheet>'
+        )
@@ -0,0 +1,55 @@
+"""
+Отчет о паритете движка с фиксированной точкой (packaging_pricing.fixed_point)
+с float-расчетом на случайном корпусе заказов.
+
+Для каждого поля CalculationResult: число расхождений float/int64, максимальная
+разница в единицах последнего знака, расхождения обоих движков с эталоном
+в Decimal (на выборке) и время расчета.
+
+Запуск:
+    python parity_report.py --orders 1000000 --exact-sample 20000 --output parity_report.json
+    python parity_report.py --config config.yaml       # конфиг из файла (по умолчанию — встроенный DEFAULT_CONFIG)
+"""
+import argparse
+import json
+import sys
+
+from packaging_pricing.config_source import load_config_file
+from packaging_pricing.defaults import DEFAULT_CONFIG
+from packaging_pricing.fixed_point import parity_report
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=100_000, help="Размер корпуса заказов")
+    parser.add_argument("--exact-sample", type=int, default=10_000, help="Заказов для сверки с Decimal")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--config", help="Файл конфига (JSON/YAML)")
+    parser.add_argument("--output", help="Файл с отчетом (JSON)")
+    args = parser.parse_args(argv)
+
+    if args.config:
+        config = load_config_file(args.config)
+    else:
+        config = DEFAULT_CONFIG
+
+    report = parity_report(config, n=args.orders, seed=args.seed, exact_sample=args.exact_sample)
+
+    print(f"Заказов: {report['orders']}, с расхождением float/int64: {report['orders_with_mismatch']}")
+    print(f"{'Поле':<20}{'расхожд.':>10}{'макс. ед.':>10}{'float≠Decimal':>15}{'int64≠Decimal':>15}")
+    for name, stats in report['fields'].items():
+        print(f"{name:<20}{stats['mismatches']:>10}{stats['max_last_digit_units']:>10}"
+              f"{stats['float_vs_exact']:>15}{stats['fixed_vs_exact']:>15}")
+    per_order = report['decimal_seconds_per_order']
+    print(f"\nfloat: {report['float_seconds']} с, int64: {report['fixed_seconds']} с"
+          + (f", Decimal: {per_order * report['orders']:.1f} с (оценка по выборке)" if per_order else ""))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"Отчет записан в {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,15 +2,7 @@
 Тестовые расчёты с параметрами от экономиста и специалиста ОП.
 """
 from packaging_pricing.models import OrderInput, PricingConfig, BagType, Features
-from packaging_pricing.pipeline import PricingPipeline
-from packaging_pricing.scraps import TableBasedScrapProvider
-from packaging_pricing.steps import (
-    GeometryCalculationStep,
-    ScrapCalculationStep,
-    LaborCostStep,
-    MaterialCostStep,
-    PricingStep
-)
+from packaging_pricing.registry import build_pipeline
 
 # ============================================================
 # Параметры от экономиста
@@ -40,15 +32,7 @@ config = PricingConfig(
 )
 
 # Создаём пайплайн
-scrap_provider = TableBasedScrapProvider()
-steps = [
-    GeometryCalculationStep(),
-    ScrapCalculationStep(provider=scrap_provider),
-    LaborCostStep(),
-    MaterialCostStep(),
-    PricingStep()
-]
-pipeline = PricingPipeline(steps=steps, config=config)
+pipeline = build_pipeline(config)
 
 
 def print_result(result, label: str):
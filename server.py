@@ -1,135 +1,947 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, StreamingResponse, RedirectResponse
-from packaging_pricing.models import OrderInput, PricingConfig, CalculationResult
-from packaging_pricing.pipeline import PricingPipeline
-from packaging_pricing.steps import (
-    GeometryCalculationStep,
-    ScrapCalculationStep,
-    LaborCostStep,
-    MaterialCostStep,
-    PricingStep
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect, Body, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, StreamingResponse, RedirectResponse, JSONResponse, Response
+from packaging_pricing.models import DEFAULT_STEPS, ConfigProfile, OrderInput, PricingConfig, CalculationResult, EffectiveConfig
+from typing import Any, Dict, List, Literal, Optional, Tuple, Union
+from packaging_pricing.registry import resolve_pipeline
+from packaging_pricing.export import (
+    generate_excel_bytes,
+    generate_row_data,
+    generate_proposal_excel_bytes,
+    iter_delimited,
+    iter_row_data,
+    Quote
 )
-from packaging_pricing.scraps import TableBasedScrapProvider
-from packaging_pricing.export import generate_excel_bytes, generate_row_data
+from packaging_pricing.cache import LRUCache, order_fingerprint, request_fingerprint
+from packaging_pricing.coalesce import SingleFlight
+from packaging_pricing.session import QuoteSession
+from packaging_pricing.prepared import PreparedConfig, order_columns
+from packaging_pricing.fixed_point import FixedPointEngine
+from packaging_pricing.quantity_breaks import quantity_segments, breakpoints
+from packaging_pricing.simulation import RiskScenario, scenario_errors, simulate_risk
+from packaging_pricing.config_diff import ConfigDiff, report_columns
+from packaging_pricing.errors import CalculationError, CalculationFailed
+from packaging_pricing.defaults import DEFAULT_CONFIG
+from packaging_pricing.config_source import (
+    ConfigSnapshot, ConfigStore, ConfigFileWatcher, load_config_file, load_pipeline_file, write_config_file
+)
+from packaging_pricing.schedule import ConfigSchedule
+from packaging_pricing.profiles import ProfileRegistry, ProfileState
+from packaging_pricing.batch import BatchValidation, validate_columns, rows_to_columns, price_groups
+from packaging_pricing.tracing import tracer, extract, inject, remote_parent, InMemorySpanExporter, JsonLinesSpanExporter
+from packaging_pricing.warmup import WarmUp
+from packaging_pricing.static_assets import AssetStaticFiles, ResponseCompressionMiddleware
+from pydantic import BaseModel, Field, ValidationError
+from starlette.background import BackgroundTask
+from contextlib import asynccontextmanager
+from datetime import date
+import numpy as np
+import asyncio
+import io
+import tempfile
 import uvicorn
 import os
 
-app = FastAPI(title="Packaging Cost Engine")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config_watcher is not None:
+        config_watcher.start()
+    warmup.start()
+    yield
+    if config_watcher is not None:
+        config_watcher.stop()
+
+
+app = FastAPI(title="Packaging Cost Engine", lifespan=lifespan)
+
+# Mount static files (frontend): the build from build_static.py (content-hashed,
+# precompressed, immutable caching) when present, the source static/ otherwise
+STATIC_BUILD_DIR = os.environ.get("STATIC_BUILD_DIR", "static_build")
+STATIC_DIR = STATIC_BUILD_DIR if os.path.isdir(STATIC_BUILD_DIR) else "static"
+app.mount("/ui", AssetStaticFiles(directory=STATIC_DIR, html=True), name="static")
+
+# On-the-fly gzip for large JSON/NDJSON/CSV API responses
+app.add_middleware(ResponseCompressionMiddleware, minimum_size=int(os.environ.get("GZIP_MIN_BYTES", "1024")))
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next):
+    """Root span per HTTP request; continues the caller's trace from a W3C traceparent header."""
+    if not tracer.enabled:
+        return await call_next(request)
+    with remote_parent(extract(request.headers)):
+        with tracer.start_as_current_span(
+            f"{request.method} {request.url.path}",
+            {"http.method": request.method, "http.route": request.url.path}
+        ) as span:
+            response = await call_next(request)
+            span.set_attribute("http.status_code", response.status_code)
+            inject(response.headers)
+    return response
 
-# Mount static files (frontend)
-app.mount("/ui", StaticFiles(directory="static", html=True), name="static")
 
 @app.get("/")
 def read_root():
     return RedirectResponse(url="/ui/index.html")
 
-# Global state for configuration (In-memory storage)
-current_config = PricingConfig(
-    material_price_bopp=200.0,
-    material_price_cpp=220.0, 
-    k1_salary_coeff=3.6,
-    box_cost=50.0,
-    scrap_return_price=10.0,
-    k2_margin_divisor=2.3,
-    k3_margin_multiplier=1.7,
-    rop_overhead=6.0,
-    feature_rates={
-        "glue": 0.5,
-        "dead_glue": 0.3,
-        "euroslot_pvd": 1.5,
-        "euroslot_bopp": 1.2,
-        "clips": 2.0
-    },
-    electricity_rate=0.0095,
-    salary_std_small=0.04,
-    salary_std_large=0.053,
-    salary_wicket_small=0.075,
-    salary_wicket_large=0.078
+# Pipeline declared by step names from the registry (PIPELINE_FILE, JSON/YAML); resolved
+# once, optional steps and providers are imported only if listed. Every config snapshot
+# builds it, and single orders are priced by it. With the standard steps the PreparedConfig
+# tables of the snapshots (built with the pipeline's scrap provider) price the batch paths
+# in one vectorized pass; with custom steps or step_options batches are priced row by row
+# by the pipeline itself (ConfigSnapshot.batch), and the paths that need the standard
+# formulas (fixed engine, quantity breaks, risk simulation, config diff) answer 400.
+pipeline_factory = resolve_pipeline(
+    load_pipeline_file(os.environ["PIPELINE_FILE"]) if os.environ.get("PIPELINE_FILE") else None
+)
+
+# Step-level memoization shared by the pipelines of all snapshots:
+# weight by geometry tuple, roll layout by lane width and roll widths,
+# scrap rate by quantity tier of the pipeline's scrap provider
+geometry_cache = LRUCache(maxsize=2048)
+layout_cache = LRUCache(maxsize=2048)
+scrap_cache = LRUCache(maxsize=64)
+PIPELINE_RESOURCES = {
+    "geometry": {"cache": geometry_cache},
+    "roll_layout": {"cache": layout_cache},
+    "scrap": {"cache": scrap_cache},
+}
+
+# Active config snapshot: config, version (content hash, used for ETags and cache keys)
+# its pipeline and the coefficient tables for the batch paths. Handlers read config_store.current once
+# (a plain attribute read, no lock) and use that snapshot for the whole request, so a
+# reload never mixes two configs within one request.
+# CONFIG_FILE (JSON or YAML) makes the file the source of truth: it is watched and
+# reloaded on change, and POST /api/config writes it back.
+CONFIG_FILE = os.environ.get("CONFIG_FILE")
+if CONFIG_FILE and os.path.exists(CONFIG_FILE):
+    config_store = ConfigStore(load_config_file(CONFIG_FILE), source=f"file:{CONFIG_FILE}",
+                               factory=pipeline_factory, resources=PIPELINE_RESOURCES)
+else:
+    config_store = ConfigStore(DEFAULT_CONFIG, factory=pipeline_factory, resources=PIPELINE_RESOURCES)
+config_watcher = ConfigFileWatcher(CONFIG_FILE, config_store, interval=float(os.environ.get("CONFIG_POLL_SECONDS", "1.0"))) if CONFIG_FILE else None
+
+# Time-effective config versions (e.g. a resin price change from a given date).
+# Requests with an as-of date are priced with the version valid on that date;
+# dates outside every scheduled interval use the active config.
+config_schedule = ConfigSchedule(pipeline_factory, PIPELINE_RESOURCES)
+
+# Named price profiles (dealers, key accounts, export): overrides on top of the
+# active or dated config, chosen per request with ?profile= (or "profile" in the
+# body). Hot profiles keep their own tables and result cache within one memory
+# budget; cold ones are evicted (LRU) and rebuilt on demand.
+profile_registry = ProfileRegistry(
+    memory_budget=int(os.environ.get("PROFILE_MEMORY_MB", "64")) * 2 ** 20,
+    results_per_profile=int(os.environ.get("PROFILE_RESULT_CACHE", "256"))
 )
 
+# (result, unrounded intermediates) keyed by order fingerprint (order + config version)
+result_cache = LRUCache(maxsize=4096)
+
+# Identical concurrent requests (same order + config version) share one computation
+inflight = SingleFlight()
+
+# Integer fixed-point engines for batch pricing (?engine=fixed), one per config version
+fixed_engines = LRUCache(maxsize=16)
+
+# Tracing: recent spans are kept in memory (GET /api/traces/{trace_id});
+# TRACE_FILE additionally appends them as JSON lines, TRACING=0 turns tracing off
+span_store = InMemorySpanExporter(maxlen=10000)
+if os.environ.get("TRACING", "1") != "0":
+    tracer.add_exporter(span_store)
+    if os.environ.get("TRACE_FILE"):
+        tracer.add_exporter(JsonLinesSpanExporter(os.environ["TRACE_FILE"]))
+
+XLSX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Live quote socket: field edits arriving within this window are merged into one recalculation
+QUOTE_DEBOUNCE_SECONDS = 0.15
+
+# Synthetic order for the startup warm-up
+WARMUP_ORDER = OrderInput(product_type="BOPP", width=20, fold=3, length=30, flap=4, thickness=25, quantity=50000,
+                          features={"glue_tape": True})
+
+
+def _etag(value: str) -> str:
+    return f'"{value}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """Checks If-None-Match against the ETag (weak validators match too)."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def _not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def _warm_pricing() -> None:
+    """Step caches of the active config's pipeline and the coefficient tables of the vectorized path."""
+    snapshot = config_store.current
+    snapshot.pipeline.calculate(WARMUP_ORDER)
+    snapshot.prepared.price_results(order_columns([WARMUP_ORDER] * 64))
+
+
+def _warm_export() -> None:
+    """First Excel export imports openpyxl and initializes the pandas writer."""
+    snapshot = config_store.current
+    config = snapshot.config
+    context = snapshot.pipeline.run(WARMUP_ORDER)
+    result, intermediates = context.final_result, context.intermediates
+    generate_excel_bytes(WARMUP_ORDER, result, config.k2_margin_divisor, config.k3_margin_multiplier, intermediates)
+
+
+# Startup warm-up in a background thread: /readyz reports ready only after it,
+# so the container healthcheck holds traffic until the first export is cheap.
+# WARMUP=0 skips it (ready immediately).
+warmup = WarmUp(
+    [("pricing", _warm_pricing), ("export", _warm_export)] if os.environ.get("WARMUP", "1") != "0" else []
+)
+
+
+def _snapshot_for(as_of: Optional[date], profile: Optional[str] = None) -> ConfigSnapshot:
+    """
+    Config snapshot for a quote date (the active config when no date or no scheduled
+    version), with the price profile applied on top when one is given.
+    """
+    return _pricing_target(as_of, profile)[0]
+
+
+def _pricing_target(as_of: Optional[date], profile: Optional[str]) -> Tuple[ConfigSnapshot, LRUCache]:
+    """Config snapshot and the result cache that belongs to it (the profile's own cache)."""
+    snapshot = config_store.current
+    if as_of is not None:
+        snapshot = config_schedule.resolve(as_of) or snapshot
+    if profile is None:
+        return snapshot, result_cache
+    state = _profile_state(profile, snapshot)
+    return state.snapshot, state.results
+
+
+def _profile_state(profile: str, base: ConfigSnapshot) -> ProfileState:
+    try:
+        return profile_registry.resolve(profile, base)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown price profile: {profile!r}")
+
+
+# (result, unrounded intermediates) or the data error that prevents pricing the order
+QuoteOutcome = Union[Tuple[CalculationResult, Dict[str, Any]], CalculationError]
+
+
+def _cached_quote(order: OrderInput, key: str, snapshot: ConfigSnapshot,
+                  cache: LRUCache = result_cache) -> QuoteOutcome:
+    """
+    Returns the cached outcome for the order or runs the pipeline once.
+    Data errors are returned, not raised, and cached like results (they are
+    deterministic for the order and config version).
+    """
+    quote = cache.get(key)
+    if quote is None:
+        quote = inflight.do(("quote", key), lambda: _compute_quote(order, key, snapshot, cache))
+    return quote
+
+
+def _compute_quote(order: OrderInput, key: str, snapshot: ConfigSnapshot, cache: LRUCache) -> QuoteOutcome:
+    with tracer.start_as_current_span("quote.compute"):
+        quote = snapshot.try_quote(order)
+    cache.put(key, quote)
+    return quote
+
+
+def _error_response(*errors: CalculationError, loc_prefix: Tuple[Any, ...] = ()) -> JSONResponse:
+    """422 in the shape of FastAPI validation errors ({"detail": [{type, loc, msg}]})."""
+    detail = [{**e.to_dict(), "loc": ["body", *loc_prefix, *e.loc]} for e in errors]
+    return JSONResponse(status_code=422, content={"detail": detail})
+
+
 @app.get("/api/config", response_model=PricingConfig)
-def get_config():
+def get_config(request: Request):
     """Returns the current pricing configuration."""
-    return current_config
+    snapshot = config_store.current
+    etag = _etag(f"cfg-{snapshot.version}")
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+    return JSONResponse(
+        content=snapshot.config.model_dump(mode="json"),
+        headers={"ETag": etag, "Cache-Control": "no-cache"}
+    )
 
 @app.post("/api/config", response_model=PricingConfig)
 def update_config(config: PricingConfig):
-    """Updates the global pricing configuration."""
-    global current_config
-    current_config = config
-    return current_config
+    """Updates the global pricing configuration (and the config file, if one is used)."""
+    if CONFIG_FILE:
+        write_config_file(CONFIG_FILE, config)
+        return config_store.publish(config, source=f"file:{CONFIG_FILE}").config
+    return config_store.publish(config).config
 
-@app.post("/api/calculate", response_model=CalculationResult)
-def calculate_price(order: OrderInput):
-    """Calculates the price for a given order using current config."""
-    
-    # Build Pipeline
-    scrap_provider = TableBasedScrapProvider()
-    steps = [
-        GeometryCalculationStep(),
-        ScrapCalculationStep(provider=scrap_provider),
-        LaborCostStep(),
-        MaterialCostStep(),
-        PricingStep()
+@app.get("/api/config/versions")
+def list_config_versions():
+    """Scheduled config versions, ordered by valid_from."""
+    snapshots = config_schedule.snapshots
+    return [
+        {**version.model_dump(mode="json"), "version": snapshot.version}
+        for version, snapshot in zip(config_schedule.versions, snapshots)
     ]
-    
-    pipeline = PricingPipeline(steps=steps, config=current_config)
-    
+
+@app.post("/api/config/versions")
+def add_config_version(version: EffectiveConfig):
+    """Schedules a config version for [valid_from, valid_to]; overlapping intervals are rejected."""
     try:
-        result = pipeline.calculate(order)
-        return result
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=str(e))
+        snapshot = config_schedule.add(version)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {**version.model_dump(mode="json"), "version": snapshot.version}
+
+@app.delete("/api/config/versions/{valid_from}")
+def delete_config_version(valid_from: date):
+    """Removes the scheduled version starting on valid_from."""
+    if not config_schedule.remove(valid_from):
+        raise HTTPException(status_code=404, detail="Config version not found")
+    return {"removed": valid_from.isoformat()}
+
+@app.get("/api/profiles")
+def list_profiles():
+    """Price profiles (overrides on top of the base config) and memory usage of the hot ones."""
+    return {
+        "profiles": {name: p.model_dump(mode="json", exclude_none=True) for name, p in profile_registry.profiles.items()},
+        "stats": profile_registry.stats()
+    }
+
+@app.put("/api/profiles/{name}")
+def put_profile(name: str, profile: ConfigProfile):
+    """Creates or replaces a price profile; its cached tables and results are dropped."""
+    profile_registry.set(name, profile)
+    return {"name": name, **profile.model_dump(mode="json", exclude_none=True)}
+
+@app.delete("/api/profiles/{name}")
+def delete_profile(name: str):
+    if not profile_registry.remove(name):
+        raise HTTPException(status_code=404, detail="Price profile not found")
+    return {"removed": name}
+
+@app.post("/api/calculate", response_model=CalculationResult)
+def calculate_price(order: OrderInput, request: Request, as_of: Optional[date] = None, profile: Optional[str] = None):
+    """Calculates the price for a given order using current config (or a price profile)."""
+    snapshot, cache = _pricing_target(as_of, profile)
+    key = order_fingerprint(order, snapshot.version)
+    etag = _etag(key)
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    outcome = _cached_quote(order, key, snapshot, cache)
+    if isinstance(outcome, CalculationError):
+        return _error_response(outcome)
+    result, _ = outcome
+
+    return JSONResponse(
+        content=result.model_dump(mode="json"),
+        headers={"ETag": etag, "Cache-Control": "no-cache"}
+    )
 
 @app.post("/api/preview_table")
-def preview_table(order: OrderInput):
+def preview_table(order: OrderInput, request: Request, as_of: Optional[date] = None, profile: Optional[str] = None):
     """Returns the Excel row data as JSON for UI preview."""
-    # Perform calculation
-    scrap_provider = TableBasedScrapProvider()
-    steps = [
-        GeometryCalculationStep(),
-        ScrapCalculationStep(provider=scrap_provider),
-        LaborCostStep(),
-        MaterialCostStep(),
-        PricingStep()
-    ]
-    pipeline = PricingPipeline(steps, current_config)
-    
+    snapshot, cache = _pricing_target(as_of, profile)
+    config = snapshot.config
+    key = order_fingerprint(order, snapshot.version)
+    etag = _etag(key)
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    outcome = _cached_quote(order, key, snapshot, cache)
+    if isinstance(outcome, CalculationError):
+        return _error_response(outcome)
+    result, intermediates = outcome
+    row_data = generate_row_data(order, result, config.k2_margin_divisor, config.k3_margin_multiplier, intermediates)
+
+    return JSONResponse(content=row_data, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+@app.post("/api/quote")
+def quote(order: OrderInput, request: Request, as_of: Optional[date] = None, profile: Optional[str] = None):
+    """
+    Single pipeline run for the UI: the result, the Excel row and the unrounded
+    intermediates together. The row breakdown is derived from the unrounded
+    values, so it adds up to the price.
+    """
+    snapshot, cache = _pricing_target(as_of, profile)
+    config = snapshot.config
+    key = order_fingerprint(order, snapshot.version)
+    etag = _etag(key)
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    outcome = _cached_quote(order, key, snapshot, cache)
+    if isinstance(outcome, CalculationError):
+        return _error_response(outcome)
+    result, intermediates = outcome
+    row_data = generate_row_data(
+        order, result, config.k2_margin_divisor, config.k3_margin_multiplier,
+        intermediates=intermediates
+    )
+
+    return JSONResponse(
+        content={
+            "result": result.model_dump(mode="json"),
+            "row": row_data,
+            # the roll layout is a dataclass
+            "intermediates": jsonable_encoder(intermediates)
+        },
+        headers={"ETag": etag, "Cache-Control": "no-cache"}
+    )
+
+@app.post("/api/quantity_breaks")
+def quantity_breaks(order: OrderInput, as_of: Optional[date] = None, profile: Optional[str] = None):
+    """
+    Unit price vs quantity for the order: the price is piecewise constant between
+    the scrap tier boundaries, so the curve is returned as exact segments
+    (priced in one vectorized pass) and the quantities where the price drops.
+    The order's own quantity only selects the current segment.
+    """
+    snapshot = _snapshot_for(as_of, profile)
     try:
-        result = pipeline.calculate(order)
-        row_data = generate_row_data(order, result, current_config.k2_margin_divisor, current_config.k3_margin_multiplier)
-        return row_data
-    except Exception as e:
+        segments = quantity_segments(_standard_prepared(snapshot, "Quantity breaks"), order, snapshot.pipeline)
+    except (ValueError, NotImplementedError) as e:
+        # Formulas that read quantity, or a scrap provider without quantity tiers
         raise HTTPException(status_code=400, detail=str(e))
+    if isinstance(segments, CalculationError):
+        return _error_response(segments)
+
+    current = next(
+        i for i, s in enumerate(segments)
+        if s.max_quantity is None or order.quantity <= s.max_quantity
+    )
+    return {
+        "segments": [s.to_dict() for s in segments],
+        "breakpoints": breakpoints(segments),
+        "current_segment": current,
+        "config_version": snapshot.version
+    }
+
+
+class RiskSimulationRequest(RiskScenario):
+    """An order (or an order book) plus input distributions for the margin-risk simulation."""
+    orders: List[OrderInput] = Field(..., min_length=1, max_length=5000)
+    as_of: Optional[date] = None
+    profile: Optional[str] = None
+
+
+@app.post("/api/simulate_risk")
+def simulate_risk_endpoint(request: RiskSimulationRequest):
+    """
+    Monte Carlo margin risk: resin prices, the scrap return price and the scrap
+    rate are drawn from the given distributions, while quoted prices stay fixed
+    at the effective config. Returns per-order and order-book percentiles of the
+    model unit price and of the margin, plus the probability of a loss.
+    """
+    snapshot = _snapshot_for(request.as_of, request.profile)
+    prepared = _standard_prepared(snapshot, "Risk simulation")
+    errors = scenario_errors(request, snapshot.config)
+    for i, order in enumerate(request.orders):
+        outcome = snapshot.try_quote(order)
+        if isinstance(outcome, CalculationError):
+            errors.append(CalculationError(outcome.type, outcome.msg, ("orders", i, *outcome.loc)))
+    if errors:
+        return _error_response(*errors)
+
+    columns = order_columns(request.orders)
+    with tracer.start_as_current_span("simulate.risk", {"simulate.orders": len(request.orders),
+                                                        "simulate.draws": request.draws}):
+        try:
+            report = simulate_risk(prepared, columns, columns['quantity'], request)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    report["config_version"] = snapshot.version
+    return report
+
+
+async def _receive_delta(websocket: WebSocket) -> Optional[Dict[str, Any]]:
+    """
+    Next field delta from the quote socket. A frame that is not a JSON object is
+    answered with an error message in the validation-error shape and skipped (None).
+    """
+    try:
+        delta = await websocket.receive_json()
+    except (ValueError, KeyError):  # not JSON, or a binary frame
+        error = {"type": "json_invalid", "loc": [], "msg": "JSON decode error"}
+    else:
+        if isinstance(delta, dict) and isinstance(delta.get("features", {}), dict):
+            return delta
+        if isinstance(delta, dict):
+            error = {"type": "model_type", "loc": ["features"], "msg": "Input should be a valid dictionary"}
+        else:
+            error = {"type": "model_type", "loc": [], "msg": "Input should be a valid dictionary"}
+    await websocket.send_json({"error": [error]})
+    return None
+
+
+@app.websocket("/ws/quote")
+async def quote_session(websocket: WebSocket):
+    """
+    Live recalculation for the pricing form.
+    The client sends field deltas ({"width": 12} or {"features": {"glue_tape": true}});
+    the server keeps the order draft, re-runs only the affected steps and pushes
+    one message with the result and the preview row per debounce window.
+    """
+    await websocket.accept()
+    snapshot = config_store.current
+    session = QuoteSession(snapshot.pipeline)
+
+    try:
+        while True:
+            delta = await _receive_delta(websocket)
+            if delta is None:
+                continue
+            # Debounce: merge everything that arrives while the user keeps typing
+            while True:
+                try:
+                    more = await asyncio.wait_for(_receive_delta(websocket), QUOTE_DEBOUNCE_SECONDS)
+                except asyncio.TimeoutError:
+                    break
+                if more is None:
+                    continue
+                features = {**delta.get("features", {}), **more.get("features", {})}
+                delta.update(more)
+                if features:
+                    delta["features"] = features
+
+            # O(1) version check: a reloaded config rebuilds the session pipeline
+            if config_store.current is not snapshot:
+                snapshot = config_store.current
+                session.reset(snapshot.pipeline)
+
+            try:
+                result = session.apply(delta)
+                row_data = generate_row_data(
+                    session.order, result, snapshot.config.k2_margin_divisor, snapshot.config.k3_margin_multiplier,
+                    intermediates=session.context.intermediates
+                )
+            except ValidationError as e:
+                await websocket.send_json({"error": e.errors(include_url=False, include_context=False)})
+                continue
+            except CalculationFailed as e:
+                await websocket.send_json({"error": [e.error.to_dict()]})
+                continue
+            except Exception as e:
+                await websocket.send_json({"error": str(e)})
+                continue
+
+            await websocket.send_json({
+                "result": result.model_dump(mode="json"),
+                "preview": row_data,
+                "recalculated": session.last_executed
+            })
+    except WebSocketDisconnect:
+        pass
 
 @app.post("/api/export_excel")
-def export_excel(order: OrderInput):
+def export_excel(order: OrderInput, as_of: Optional[date] = None, profile: Optional[str] = None):
     """Generates Excel export for the order."""
-    # Perform calculation first
-    scrap_provider = TableBasedScrapProvider()
-    steps = [
-        GeometryCalculationStep(),
-        ScrapCalculationStep(provider=scrap_provider),
-        LaborCostStep(),
-        MaterialCostStep(),
-        PricingStep()
-    ]
-    pipeline = PricingPipeline(steps, current_config)
-    result = pipeline.calculate(order)
-    
-    # Generate Excel
-    excel_file = generate_excel_bytes(order, result, current_config.k2_margin_divisor, current_config.k3_margin_multiplier)
-    
+    snapshot, cache = _pricing_target(as_of, profile)
+    key = order_fingerprint(order, snapshot.version)
+    config = snapshot.config
+
+    # Perform calculation first (reuses a cached result if the order was just priced)
+    outcome = _cached_quote(order, key, snapshot, cache)
+    if isinstance(outcome, CalculationError):
+        return _error_response(outcome)
+    result, intermediates = outcome
+
+    def build() -> bytes:
+        return generate_excel_bytes(
+            order, result, config.k2_margin_divisor, config.k3_margin_multiplier, intermediates
+        ).getvalue()
+
+    # Concurrent exports of the same order build the workbook once
+    content = inflight.do(("xlsx", key), build)
+
     headers = {
         'Content-Disposition': 'attachment; filename="calculation_export.xlsx"'
     }
+    return Response(content=content, media_type=XLSX_MEDIA_TYPE, headers=headers)
+
+
+def _price_orders(orders: List[OrderInput], snapshot: ConfigSnapshot) -> Tuple[List[Quote], List[CalculationError]]:
+    """
+    Prices every order of a multi-order request before anything is built or streamed:
+    (order, result, intermediates) quotes for the export rows. Data errors (features,
+    no roll layout, config formulas) are located by order index.
+    """
+    quotes, errors = [], []
+    for i, order in enumerate(orders):
+        outcome = snapshot.try_quote(order)
+        if isinstance(outcome, CalculationError):
+            errors.append(CalculationError(outcome.type, outcome.msg, ("orders", i, *outcome.loc)))
+        else:
+            quotes.append((order, *outcome))
+    return quotes, errors
+
+
+class ProposalRequest(BaseModel):
+    """Orders for a multi-sheet price proposal."""
+    orders: List[OrderInput] = Field(..., min_length=1)
+    group_by: Literal["product_type", "print_scheme"] = "product_type"
+    as_of: Optional[date] = None
+    profile: Optional[str] = None
+
+
+@app.post("/api/export_proposal")
+def export_proposal(request: ProposalRequest):
+    """Generates one workbook for many orders: a sheet per group plus a summary sheet."""
+    snapshot = _snapshot_for(request.as_of, request.profile)
+    config = snapshot.config
+    quotes, errors = _price_orders(request.orders, snapshot)
+    if errors:
+        return _error_response(*errors)
+
+    def build() -> bytes:
+        with tracer.start_as_current_span("export.proposal", {"export.orders": len(request.orders)}):
+            return generate_proposal_excel_bytes(
+                quotes, config.k2_margin_divisor, config.k3_margin_multiplier, group_by=request.group_by
+            ).getvalue()
+
+    content = inflight.do(("proposal", request_fingerprint(request, snapshot.version)), build)
+
+    headers = {
+        'Content-Disposition': 'attachment; filename="price_proposal.xlsx"'
+    }
+    return Response(content=content, media_type=XLSX_MEDIA_TYPE, headers=headers)
+
+
+DelimitedEncoding = Literal["utf-8-sig", "utf-8", "cp1251"]
+DecimalSeparator = Literal[".", ","]
+
+_CHARSETS = {"utf-8-sig": "utf-8", "utf-8": "utf-8", "cp1251": "windows-1251"}
+_DELIMITED_TYPES = {"csv": "text/csv", "tsv": "text/tab-separated-values"}
+
+
+class BatchExportRequest(BaseModel):
+    """Orders for a flat CSV/TSV export, one row per order."""
+    orders: List[OrderInput] = Field(..., min_length=1)
+    as_of: Optional[date] = None
+    profile: Optional[str] = None
+
+
+def _delimited_response(rows, fmt: str, delimiter: str, encoding: str, decimal: str, filename: str) -> StreamingResponse:
+    return StreamingResponse(
+        iter_delimited(rows, delimiter=delimiter, encoding=encoding, decimal=decimal),
+        media_type=f"{_DELIMITED_TYPES[fmt]}; charset={_CHARSETS[encoding]}",
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{fmt}"'}
+    )
+
+
+def _single_order_rows(order: OrderInput, as_of: Optional[date],
+                       profile: Optional[str]) -> Union[List[dict], CalculationError]:
+    snapshot, cache = _pricing_target(as_of, profile)
+    config = snapshot.config
+    outcome = _cached_quote(order, order_fingerprint(order, snapshot.version), snapshot, cache)
+    if isinstance(outcome, CalculationError):
+        return outcome
+    result, intermediates = outcome
+    return [generate_row_data(order, result, config.k2_margin_divisor, config.k3_margin_multiplier, intermediates)]
+
+
+def _batch_export(request: BatchExportRequest, fmt: str, delimiter: str, encoding: str, decimal: str):
+    # Priced up front (data errors are a 422, not a broken stream); rows are written while the response streams
+    snapshot = _snapshot_for(request.as_of, request.profile)
+    config = snapshot.config
+    quotes, errors = _price_orders(request.orders, snapshot)
+    if errors:
+        return _error_response(*errors)
+    rows = iter_row_data(quotes, config.k2_margin_divisor, config.k3_margin_multiplier)
+    return _delimited_response(rows, fmt, delimiter, encoding, decimal, "batch_export")
+
+
+@app.post("/api/export_csv")
+def export_csv(order: OrderInput,
+               delimiter: str = Query(";", pattern=r'^[^"\r\n]$'),
+               encoding: DelimitedEncoding = "utf-8-sig",
+               decimal: DecimalSeparator = ".",
+               as_of: Optional[date] = None,
+               profile: Optional[str] = None):
+    """Streams the export row (COLUMNS order) as CSV."""
+    rows = _single_order_rows(order, as_of, profile)
+    if isinstance(rows, CalculationError):
+        return _error_response(rows)
+    return _delimited_response(rows, "csv", delimiter, encoding, decimal, "calculation_export")
+
+
+@app.post("/api/export_tsv")
+def export_tsv(order: OrderInput, encoding: DelimitedEncoding = "utf-8-sig", decimal: DecimalSeparator = ".",
+               as_of: Optional[date] = None, profile: Optional[str] = None):
+    """Streams the export row (COLUMNS order) as TSV."""
+    rows = _single_order_rows(order, as_of, profile)
+    if isinstance(rows, CalculationError):
+        return _error_response(rows)
+    return _delimited_response(rows, "tsv", "\t", encoding, decimal, "calculation_export")
+
+
+@app.post("/api/export_csv/batch")
+def export_csv_batch(request: BatchExportRequest,
+                     delimiter: str = Query(";", pattern=r'^[^"\r\n]$'),
+                     encoding: DelimitedEncoding = "utf-8-sig",
+                     decimal: DecimalSeparator = "."):
+    """Streams one CSV row per order; rows are written as the response is sent."""
+    return _batch_export(request, "csv", delimiter, encoding, decimal)
+
+
+@app.post("/api/export_tsv/batch")
+def export_tsv_batch(request: BatchExportRequest, encoding: DelimitedEncoding = "utf-8-sig", decimal: DecimalSeparator = "."):
+    """Streams one TSV row per order; rows are written as the response is sent."""
+    return _batch_export(request, "tsv", "\t", encoding, decimal)
+
+
+def _payload_columns(payload: Dict[str, Any]) -> Dict[str, Any]:
+    if "columns" in payload:
+        return payload["columns"]
+    if "rows" in payload:
+        return rows_to_columns(payload["rows"])
+    raise HTTPException(status_code=400, detail='Expected "columns" or "rows"')
+
+
+def _validate_batch(payload: Dict[str, Any]) -> BatchValidation:
+    columns = _payload_columns(payload)
+    try:
+        with tracer.start_as_current_span("batch.validate"):
+            return validate_columns(columns)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _parse_date(value: Any) -> Optional[date]:
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=f"Invalid as_of date: {value!r}")
+
+
+def _standard_prepared(snapshot: ConfigSnapshot, feature: str) -> PreparedConfig:
+    """
+    Coefficient tables of the snapshot for paths built on the standard step formulas
+    (no row-by-row fallback); 400 if the declared pipeline has other steps or step_options.
+    """
+    if not snapshot.standard_steps:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{feature} requires the standard pipeline steps ({', '.join(DEFAULT_STEPS)}) "
+                   f"without step_options, the pipeline declares {pipeline_factory.step_names}"
+        )
+    return snapshot.prepared
+
+
+def _fixed_engine(snapshot: ConfigSnapshot) -> FixedPointEngine:
+    prepared = _standard_prepared(snapshot, "engine=fixed")
+    engine = fixed_engines.get(snapshot.version)
+    if engine is None:
+        try:
+            engine = FixedPointEngine(snapshot.config, prepared.scrap_provider)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        fixed_engines.put(snapshot.version, engine)
+    return engine
+
+
+def _batch_groups(as_of: Any, n: int, profile: Optional[str] = None) -> List[Tuple[ConfigSnapshot, np.ndarray]]:
+    """
+    Rows grouped by effective config version. as_of is one ISO date for the
+    whole batch or a list with a date (or null) per row; versions are resolved
+    for all rows at once and every group is priced with its own snapshot
+    (with the price profile applied, if any).
+    """
+    if not isinstance(as_of, list):
+        return [(_snapshot_for(_parse_date(as_of), profile), np.ones(n, dtype=bool))]
+    if len(as_of) != n:
+        raise HTTPException(status_code=400, detail=f"as_of has {len(as_of)} dates for {n} rows")
+
+    dates = np.array(
+        [np.datetime64(_parse_date(v), 'D') if v is not None else np.datetime64('NaT', 'D') for v in as_of],
+        dtype='datetime64[D]'
+    )
+    version_index = config_schedule.resolve_many(dates)
+    snapshots = config_schedule.snapshots
+    active = config_store.current
+    groups = [
+        (snapshots[idx] if idx >= 0 else active, version_index == idx)
+        for idx in np.unique(version_index).tolist()
+    ]
+    if profile is not None:
+        groups = [(_profile_state(profile, snapshot).snapshot, rows) for snapshot, rows in groups]
+    return groups
+
+
+@app.post("/api/batch/calculate")
+def batch_calculate(payload: Dict[str, Any] = Body(...), engine: Literal["float", "fixed"] = "float"):
+    """
+    Bulk pricing for internal callers without building an OrderInput per row.
+    Body: {"columns": {"width": [...], ...}} (flat, feature flags as columns)
+    or {"rows": [<OrderInput-shaped objects>]}, plus optional "as_of": one date
+    or a date per row (rows are then priced in groups by effective config version)
+    and an optional price "profile".
+    Bad rows do not fail the batch: their result values are null and their
+    errors are listed with row indexes. engine=fixed prices in scaled int64
+    with half-up rounding (see packaging_pricing.fixed_point).
+    """
+    validation = _validate_batch(payload)
+    groups = _batch_groups(payload.get("as_of"), len(validation.valid), payload.get("profile"))
+    pricers = [
+        (_fixed_engine(snapshot) if engine == "fixed" else snapshot.batch, rows)
+        for snapshot, rows in groups
+    ]
+    with tracer.start_as_current_span("batch.price", {"batch.rows": len(validation.valid), "batch.groups": len(groups),
+                                                      "batch.engine": engine}):
+        priced = price_groups(pricers, validation)
+
+    return {
+        "rows": len(validation.valid),
+        "valid": int(validation.valid.sum()),
+        "config_versions": {snapshot.version: int(rows.sum()) for snapshot, rows in groups},
+        "columns": {
+            name: [None if v != v else v for v in values.tolist()]
+            for name, values in priced.items()
+        },
+        "error": validation.error_labels(),
+        "errors": validation.errors
+    }
+
+
+@app.post("/api/batch/arrow")
+def batch_arrow(payload: Dict[str, Any] = Body(...), format: Literal["arrow", "parquet"] = "arrow"):
+    """
+    Same input as /api/batch/calculate; returns the priced batch as a columnar table
+    (row index, CalculationResult fields, export row columns; nulls in invalid rows).
+    format=arrow streams Arrow IPC record batches, format=parquet returns a Parquet file.
+    Validation errors are available from /api/batch/calculate. "as_of" must be
+    a single date here (the export row columns depend on the config). Requires pyarrow.
+    """
+    try:
+        from packaging_pricing.columnar import (
+            arrow_table, iter_arrow_stream, write_parquet, ARROW_STREAM_MEDIA_TYPE, PARQUET_MEDIA_TYPE
+        )
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise HTTPException(status_code=501, detail="Arrow export requires the pyarrow package")
+
+    as_of = payload.get("as_of")
+    if isinstance(as_of, list):
+        raise HTTPException(status_code=400, detail="as_of must be a single date for Arrow export")
+    prepared = _snapshot_for(_parse_date(as_of), payload.get("profile")).batch
+    validation = _validate_batch(payload)
+    with tracer.start_as_current_span("batch.arrow_table", {"batch.rows": len(validation.valid)}):
+        table = arrow_table(prepared, validation)
+
+    if format == "parquet":
+        buffer = io.BytesIO()
+        with tracer.start_as_current_span("batch.parquet"):
+            write_parquet(table, buffer)
+        return Response(content=buffer.getvalue(), media_type=PARQUET_MEDIA_TYPE,
+                        headers={'Content-Disposition': 'attachment; filename="batch.parquet"'})
+    return StreamingResponse(iter_arrow_stream(table), media_type=ARROW_STREAM_MEDIA_TYPE)
+
+
+@app.post("/api/config/diff")
+def config_diff(payload: Dict[str, Any] = Body(...), format: Literal["json", "csv", "xlsx"] = "json",
+                top: int = Query(100, ge=0, le=10000)):
+    """
+    Impact of a candidate config on an order book before publishing it.
+    Body: {"candidate": <PricingConfig>, "columns"/"rows": <orders as in /api/batch/calculate>,
+    optional "as_of"/"profile" for the current side}. Both configs price every row in one
+    pass (volume, table keys and scrap rate are shared); rows are ordered by the absolute
+    change of final_price. format=json returns the aggregate statistics and the top rows,
+    csv/xlsx the full report (xlsx has an "Итоги" sheet with the statistics).
+    For books larger than a request body use config_diff_report.py on a file.
+    """
+    try:
+        candidate = PricingConfig.model_validate(payload.get("candidate"))
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    as_of = payload.get("as_of")
+    if isinstance(as_of, list):
+        raise HTTPException(status_code=400, detail="as_of must be a single date for a config diff")
+    current = _standard_prepared(_snapshot_for(_parse_date(as_of), payload.get("profile")), "Config diff")
+    columns = _payload_columns(payload)
+
+    diff = ConfigDiff(current, PreparedConfig(candidate, current.scrap_provider))
+    try:
+        with tracer.start_as_current_span("config.diff", {"diff.format": format}):
+            diff.add(columns)
+            if format == "json":
+                rows = []
+                for row in diff.records():
+                    if len(rows) >= top:
+                        break
+                    rows.append(dict(zip(report_columns(), row)))
+                return {"stats": diff.stats(), "rows": rows}
+
+            report = tempfile.SpooledTemporaryFile(max_size=16 * 1024 * 1024)
+            if format == "csv":
+                diff.write_csv(report)
+            else:
+                diff.write_xlsx(report)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        diff.close()
+
+    report.seek(0)
+    media_type = XLSX_MEDIA_TYPE if format == "xlsx" else "text/csv; charset=utf-8"
     return StreamingResponse(
-        excel_file, 
-        media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 
-        headers=headers
+        iter(lambda: report.read(1024 * 1024), b""),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="config_diff.{format}"'},
+        background=BackgroundTask(report.close)
     )
 
+
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: 200 once the startup warm-up has finished, 503 while it is running."""
+    status = warmup.status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+
+@app.get("/api/stats")
+def stats():
+    """Cache and request-coalescing counters."""
+    snapshot = config_store.current
+    return {
+        "config_version": snapshot.version,
+        "config_source": snapshot.source,
+        "config_reload_error": config_watcher.last_error if config_watcher else None,
+        "result_cache": result_cache.stats(),
+        "profiles": profile_registry.stats(),
+        "coalescing": inflight.stats(),
+        "pipeline": {
+            "steps": pipeline_factory.step_names,
+            "scrap_provider": pipeline_factory.definition.scrap_provider
+        },
+        "step_cache": {
+            "geometry": geometry_cache.stats(),
+            "layout": layout_cache.stats(),
+            "scrap": scrap_cache.stats()
+        }
+    }
+
+@app.get("/api/traces/{trace_id}")
+def get_trace(trace_id: str):
+    """Finished spans of one trace (from the in-memory exporter), in start order."""
+    spans = sorted(span_store.get_finished_spans(trace_id.lower()), key=lambda s: s.start_ns)
+    if not spans:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return [span.to_dict() for span in spans]
+
 if __name__ == "__main__":
     # Launch server
     print("Starting server on http://localhost:8000")
@@ -1,6 +1,8 @@
 const API_CALC = "/api/calculate";
+const API_QUOTE = "/api/quote";
 const API_CONFIG = "/api/config";
 const API_EXPORT = "/api/export_excel";
+const WS_QUOTE = "/ws/quote";
 
 document.addEventListener("DOMContentLoaded", () => {
     // 1. Initial Load
@@ -23,6 +25,11 @@ document.addEventListener("DOMContentLoaded", () => {
         await calculate();
     });
 
+    // 3a. Live recalculation over WebSocket (server debounces and re-runs only affected steps)
+    openQuoteSocket();
+    document.getElementById("calcForm").addEventListener("input", sendQuoteDelta);
+    document.getElementById("calcForm").addEventListener("change", sendQuoteDelta);
+
     // 4. Config Save
     document.getElementById("configForm").addEventListener("submit", async (e) => {
         e.preventDefault();
@@ -135,7 +142,8 @@ document.addEventListener("DOMContentLoaded", () => {
 
 async function fetchConfig() {
     try {
-        const res = await fetch(API_CONFIG);
+        // "no-cache" makes the browser revalidate with If-None-Match (304 if unchanged)
+        const res = await fetch(API_CONFIG, { cache: "no-cache" });
         const config = await res.json();
         populateSettingsForm(config);
     } catch (e) {
@@ -242,36 +250,131 @@ function getPayloadFromForm() {
     };
 }
 
+let quoteSocket = null;
+let lastSentPayload = {};
+// Outcome of the live session: the last error (null after a result), whether a delta
+// is still unanswered and whether the manager pressed "Calculate" and waits for it
+let lastQuoteError = null;
+let quoteInFlight = false;
+let quoteSubmitPending = false;
+
+function openQuoteSocket() {
+    if (!("WebSocket" in window)) return;
+    const proto = window.location.protocol === "https:" ? "wss:" : "ws:";
+    const socket = new WebSocket(`${proto}//${window.location.host}${WS_QUOTE}`);
+
+    socket.addEventListener("open", () => {
+        lastSentPayload = {};
+        quoteInFlight = false;
+    });
+    socket.addEventListener("message", (event) => {
+        const msg = JSON.parse(event.data);
+        quoteInFlight = false;
+        if (msg.error) {
+            lastQuoteError = msg.error;
+            if (quoteSubmitPending) {
+                quoteSubmitPending = false;
+                showQuoteError(msg.error);
+            } else {
+                // Draft is incomplete while the manager is typing; keep the last result
+                console.debug("Quote draft not valid yet", msg.error);
+            }
+            return;
+        }
+        lastQuoteError = null;
+        quoteSubmitPending = false;
+        renderResult(msg.result);
+        renderPreviewTable(msg.preview);
+    });
+    socket.addEventListener("close", () => {
+        quoteSocket = null;
+        // Reconnect later; the submit button falls back to HTTP meanwhile
+        setTimeout(openQuoteSocket, 5000);
+    });
+    quoteSocket = socket;
+}
+
+function diffPayload(prev, next) {
+    const delta = {};
+    Object.keys(next).forEach(key => {
+        if (JSON.stringify(prev[key]) !== JSON.stringify(next[key])) {
+            delta[key] = next[key];
+        }
+    });
+    return delta;
+}
+
+function sendQuoteDelta() {
+    if (!quoteSocket || quoteSocket.readyState !== WebSocket.OPEN) return false;
+    const payload = getPayloadFromForm();
+    const delta = diffPayload(lastSentPayload, payload);
+    if (Object.keys(delta).length === 0) return true;
+    quoteSocket.send(JSON.stringify(delta));
+    lastSentPayload = payload;
+    quoteInFlight = true;
+    return true;
+}
+
+function formatQuoteError(error) {
+    if (!Array.isArray(error)) return String(error);
+    return error.map(e => `${(e.loc || []).join(".")}: ${e.msg}`).join("\n");
+}
+
+function showQuoteError(error) {
+    alert("Ошибка расчета:\n" + formatQuoteError(error));
+}
+
+// Last response per endpoint: { etag, data }. Lets the server answer 304 for a repeated order.
+const etagCache = {};
+
+async function postWithETag(url, payload) {
+    const headers = { "Content-Type": "application/json" };
+    const cached = etagCache[url];
+    if (cached) headers["If-None-Match"] = cached.etag;
+
+    const res = await fetch(url, {
+        method: "POST",
+        headers: headers,
+        body: JSON.stringify(payload)
+    });
+
+    if (res.status === 304 && cached) {
+        return { ok: true, data: cached.data };
+    }
+    if (!res.ok) {
+        return { ok: false, data: null };
+    }
+
+    const data = await res.json();
+    const etag = res.headers.get("ETag");
+    if (etag) etagCache[url] = { etag: etag, data: data };
+    return { ok: true, data: data };
+}
+
 async function calculate() {
     const payload = getPayloadFromForm();
     try {
-        // Parallel requests: Calc + Preview
-        const [resCalc, resPreview] = await Promise.all([
-            fetch(API_CALC, {
-                method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify(payload)
-            }),
-            fetch("/api/preview_table", {
-                method: "POST",
-                headers: { "Content-Type": "application/json" },
-                body: JSON.stringify(payload)
-            })
-        ]);
-
-        if (!resCalc.ok) {
-            alert("Ошибка расчета");
+        // Live session already has the draft: an empty delta means the last message is current
+        if (sendQuoteDelta()) {
+            if (quoteInFlight) {
+                quoteSubmitPending = true;
+            } else if (lastQuoteError) {
+                showQuoteError(lastQuoteError);
+            }
             return;
         }
 
-        const data = await resCalc.json();
-        renderResult(data);
+        // One request, one pipeline run: result + preview row
+        const res = await postWithETag(API_QUOTE, payload);
 
-        if (resPreview.ok) {
-            const previewData = await resPreview.json();
-            renderPreviewTable(previewData);
+        if (!res.ok) {
+            alert("Ошибка расчета");
+            return;
         }
 
+        renderResult(res.data.result);
+        renderPreviewTable(res.data.row);
+
     } catch (e) {
         console.error(e);
     }
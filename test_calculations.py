@@ -3,15 +3,7 @@
 """
 import json
 from packaging_pricing.models import OrderInput, PricingConfig, BagType, Features
-from packaging_pricing.pipeline import PricingPipeline
-from packaging_pricing.scraps import TableBasedScrapProvider
-from packaging_pricing.steps import (
-    GeometryCalculationStep,
-    ScrapCalculationStep,
-    LaborCostStep,
-    MaterialCostStep,
-    PricingStep
-)
+from packaging_pricing.registry import build_pipeline
 
 config = PricingConfig(
     density=0.91,
@@ -38,15 +30,7 @@ config = PricingConfig(
 )
 
 # Сборка pipeline
-scrap_provider = TableBasedScrapProvider()
-steps = [
-    GeometryCalculationStep(),
-    ScrapCalculationStep(provider=scrap_provider),
-    LaborCostStep(),
-    MaterialCostStep(),
-    PricingStep()
-]
-pipeline = PricingPipeline(steps=steps, config=config)
+pipeline = build_pipeline(config)
 
 print("=" * 60)
 print("ТЕСТ 1: Пакет BOPP с клеевым клапаном")
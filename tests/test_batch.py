@@ -0,0 +1,199 @@
+"""
+Пакетная проверка заказов по колонкам: паритет с OrderInput и расчет валидных строк.
+Запуск: pytest tests/test_batch.py -v
+"""
+import random
+import numpy as np
+import pytest
+from pydantic import ValidationError
+from packaging_pricing.models import OrderInput, PricingConfig
+from packaging_pricing.prepared import PreparedConfig
+from packaging_pricing.registry import build_pipeline
+from packaging_pricing.batch import validate_columns, rows_to_columns, price_validated
+
+
+def _pydantic_errors(row):
+    try:
+        return OrderInput(**row), []
+    except ValidationError as e:
+        return None, [(x['type'], tuple(x['loc']), x['msg']) for x in e.errors()]
+
+
+def _batch_errors(validation):
+    by_row = {}
+    for e in validation.errors:
+        by_row.setdefault(e['row'], []).append((e['type'], tuple(e['loc']), e['msg']))
+    return by_row
+
+
+def _random_rows(seed, n):
+    rng = random.Random(seed)
+    pick = rng.choice
+    rows = []
+    for _ in range(n):
+        row = {
+            'product_type': pick(['BOPP', 'CPP', 'bopp', None, 3]),
+            'width': pick([10, 12.5, '15', 'abc', None, -1, 0, float('nan'), '1_0', True]),
+            'length': pick([20, 30.0, '40', 0, -5]),
+            'thickness': pick([25, 30]),
+            'quantity': pick([100, 30000, 2.0, 1.5, '7', ' 8 ', '1.0', '1.5', 'x', None, 0, -3, float('inf'), True]),
+        }
+        if rng.random() < .3:
+            row['fold'] = pick([0, 3, -1, '2'])
+        if rng.random() < .3:
+            row['flap'] = pick([0, 4, None])
+        if rng.random() < .2:
+            row['print_scheme'] = pick(['1+0', 5, None])
+        if rng.random() < .1:
+            row['unknown'] = 1
+        if rng.random() < .05:
+            del row['width']
+        if rng.random() < .7:
+            features = {}
+            for key in ('is_wicket', 'glue_tape', 'dead_tape', 'clips'):
+                if rng.random() < .5:
+                    features[key] = pick([True, False, 0, 1, 'yes', 'no', 'maybe', 2, 0.5, None, 1.0])
+            if rng.random() < .3:
+                features['euroslot'] = pick(['pvd', 'bopp', None, 5])
+            row['features'] = features
+        if rng.random() < .02:
+            row['features'] = None
+        rows.append(row)
+    return rows
+
+
+class TestValidationParity:
+    """Ошибки и нормализованные значения совпадают с OrderInput."""
+
+    def test_random_corpus(self):
+        rows = _random_rows(seed=3, n=2000)
+        validation = validate_columns(rows_to_columns(rows))
+        by_row = _batch_errors(validation)
+
+        for idx, row in enumerate(rows):
+            order, expected = _pydantic_errors(row)
+            assert by_row.get(idx, []) == expected, (idx, row)
+            assert bool(validation.valid[idx]) == (order is not None)
+            if order is not None:
+                c = validation.columns
+                assert c['width'][idx] == order.width
+                assert c['quantity'][idx] == order.quantity
+                assert c['product_type'][idx] == order.product_type.value
+                assert c['clips'][idx] == order.features.clips
+                assert c['euroslot'][idx] == order.features.euroslot
+
+    @pytest.mark.parametrize("row", [
+        {'width': '1_0'},
+        {'width': ' 1_0 '},
+        {'quantity': '1.'},
+        {'quantity': '1_000'},
+        {'quantity': 2.5},
+        {'quantity': 10 ** 20},
+        {'quantity': -10 ** 20},
+        {'quantity': 2 ** 63 - 1},
+        {'quantity': 1e20},
+        {'quantity': str(10 ** 20)},
+        {'quantity': '١٢'},
+        {'features': {'is_wicket': 'yes'}},
+        {'features': {'is_wicket': ' yes'}},
+        {'features': {'is_wicket': 0.5}},
+        {'features': {'glue_tape': True, 'dead_tape': True}},
+        {'features': 'none'},
+        {'extra_field': 1},
+    ])
+    def test_edge_values(self, row):
+        base = {'product_type': 'BOPP', 'width': 10, 'length': 20, 'thickness': 25, 'quantity': 1000}
+        base.update(row)
+        _, expected = _pydantic_errors(base)
+        validation = validate_columns(rows_to_columns([base]))
+        assert _batch_errors(validation).get(0, []) == expected
+
+    def test_missing_required_column(self):
+        validation = validate_columns({'product_type': ['BOPP'], 'width': [10], 'length': [20], 'thickness': [25]})
+        assert not validation.valid[0]
+        assert validation.errors == [{'row': 0, 'type': 'missing', 'loc': ('quantity',), 'msg': 'Field required'}]
+
+    def test_numpy_columns(self):
+        validation = validate_columns({
+            'product_type': np.array(['BOPP', 'CPP']),
+            'width': np.array([10.0, -1.0]),
+            'length': np.array([20.0, 20.0]),
+            'thickness': np.array([25, 25]),
+            'quantity': np.array([1000, 1000]),
+        })
+        assert validation.valid.tolist() == [True, False]
+        assert validation.error_count == 1
+
+    @pytest.mark.parametrize("quantities", [
+        [1000, 10 ** 20, -10 ** 20, 2 ** 63 - 1],
+        [1000, 10 ** 20, 2.0, 2 ** 53 + 1],
+        [1000.0, 1e20, -1e20, -2.0 ** 63, 3.0],
+        ['1000', str(10 ** 20), str(-10 ** 20), 1e20],
+    ])
+    def test_quantity_out_of_int64(self, quantities):
+        rows = [{'product_type': 'BOPP', 'width': 10, 'length': 20, 'thickness': 25, 'quantity': q}
+                for q in quantities]
+        validation = validate_columns(rows_to_columns(rows))
+        by_row = _batch_errors(validation)
+        for idx, row in enumerate(rows):
+            order, expected = _pydantic_errors(row)
+            assert by_row.get(idx, []) == expected, row
+            if order is not None:
+                assert validation.columns['quantity'][idx] == order.quantity
+
+    def test_unequal_lengths(self):
+        with pytest.raises(ValueError):
+            validate_columns({'width': [1, 2], 'length': [1]})
+
+
+@pytest.fixture
+def prepared():
+    return PreparedConfig(PricingConfig(
+        material_price_bopp=186.0,
+        material_price_cpp=201.5,
+        box_cost=23.20,
+        feature_rates={"glue": 0.003, "dead_glue": 0.0207, "euroslot_pvd": 0.0137, "euroslot_bopp": 0.0012, "clips": 0.8}
+    ))
+
+
+class TestPriceValidated:
+    def test_matches_single_order(self, prepared):
+        rows = [
+            {'product_type': 'BOPP', 'width': 10, 'length': 25, 'flap': 3, 'thickness': 25, 'quantity': 30000,
+             'features': {'glue_tape': True}},
+            {'product_type': 'CPP', 'width': 0, 'length': 25, 'thickness': 25, 'quantity': 30000},
+            {'product_type': 'CPP', 'width': 30, 'fold': 4, 'length': 40, 'thickness': 30, 'quantity': 120000,
+             'features': {'is_wicket': True, 'euroslot': 'pvd'}},
+        ]
+        priced = price_validated(prepared, validate_columns(rows_to_columns(rows)))
+
+        assert np.isnan(priced['final_price'][1])
+        for idx in (0, 2):
+            expected = build_pipeline(prepared.config).calculate(OrderInput(**rows[idx]))
+            for name, values in priced.items():
+                assert values[idx] == pytest.approx(getattr(expected, name), abs=1e-9)
+
+    def test_all_invalid(self, prepared):
+        validation = validate_columns(rows_to_columns([{'width': 1}]))
+        priced = price_validated(prepared, validation)
+        assert set(priced) == {'weight_grams', 'scrap_rate_percent', 'material_cost', 'scrap_cost', 'labor_cost',
+                               'overhead_cost', 'options_cost', 'variable_cost', 'final_price'}
+        assert np.isnan(priced['final_price']).all()
+
+
+class TestErrorColumn:
+    def test_codes_and_labels(self):
+        rows = [
+            {'product_type': 'BOPP', 'width': 10, 'length': 25, 'thickness': 25, 'quantity': 100},
+            {'product_type': 'BOPP', 'width': -1, 'length': 25, 'thickness': 25, 'quantity': 100},
+            {'product_type': 'BOPP', 'width': 10, 'length': 25, 'thickness': 25, 'quantity': 100,
+             'features': {'euroslot': 'metal'}},
+            {'product_type': 'CPP', 'width': 0, 'length': 25, 'thickness': 25, 'quantity': 100},
+        ]
+        validation = validate_columns(rows_to_columns(rows))
+        codes, labels = validation.error_column()
+
+        assert validation.valid.tolist() == [True, False, False, False]
+        assert codes.tolist() == [-1, 0, 1, 0]
+        assert labels == ['width: greater_than', 'features.euroslot: unknown_euroslot']
+        assert validation.error_labels()[0] is None
@@ -0,0 +1,143 @@
+"""
+Тесты кэша результатов, отпечатков заказа/конфига и мемоизации шагов.
+Запуск: pytest tests/test_cache.py -v
+"""
+import threading
+import time
+import pytest
+from packaging_pricing.cache import LRUCache, config_fingerprint, order_fingerprint
+from packaging_pricing.coalesce import SingleFlight
+from packaging_pricing.models import OrderInput, PricingConfig, BagType, Features
+from packaging_pricing.pipeline import PricingPipeline
+from packaging_pricing.scraps import TableBasedScrapProvider
+from packaging_pricing.steps import (
+    GeometryCalculationStep,
+    ScrapCalculationStep,
+    LaborCostStep,
+    MaterialCostStep,
+    PricingStep
+)
+
+
+def make_order(**overrides):
+    data = dict(product_type=BagType.BOPP, width=10, length=25, flap=3, thickness=25, quantity=30000)
+    data.update(overrides)
+    return OrderInput(**data)
+
+
+class TestLRUCache:
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")
+        cache.put("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_stats(self):
+        cache = LRUCache(maxsize=4)
+        cache.put("a", 1)
+        cache.get("a")
+        cache.get("missing")
+        assert cache.stats() == {"hits": 1, "misses": 1, "size": 1, "maxsize": 4}
+
+
+class TestFingerprints:
+
+    def test_same_order_same_fingerprint(self):
+        assert order_fingerprint(make_order(), "v1") == order_fingerprint(make_order(), "v1")
+
+    def test_fingerprint_depends_on_order_and_config(self):
+        base = order_fingerprint(make_order(), "v1")
+        assert order_fingerprint(make_order(quantity=30001), "v1") != base
+        assert order_fingerprint(make_order(features=Features(glue_tape=True)), "v1") != base
+        assert order_fingerprint(make_order(), "v2") != base
+
+    def test_config_fingerprint_tracks_content(self):
+        a = PricingConfig(material_price_bopp=186.0, material_price_cpp=186.0, box_cost=23.2)
+        b = PricingConfig(material_price_bopp=186.0, material_price_cpp=186.0, box_cost=23.2)
+        c = PricingConfig(material_price_bopp=190.0, material_price_cpp=186.0, box_cost=23.2)
+        assert config_fingerprint(a) == config_fingerprint(b)
+        assert config_fingerprint(a) != config_fingerprint(c)
+
+
+class TestSingleFlight:
+
+    def test_concurrent_calls_share_one_execution(self):
+        flight = SingleFlight()
+        executions = []
+        results = []
+        started = threading.Event()
+
+        def compute():
+            executions.append(1)
+            started.set()
+            time.sleep(0.2)
+            return "xlsx"
+
+        def call():
+            results.append(flight.do("key", compute))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        started.wait()
+        followers = [threading.Thread(target=call) for _ in range(4)]
+        for t in followers:
+            t.start()
+        for t in [leader] + followers:
+            t.join()
+
+        assert results == ["xlsx"] * 5
+        assert len(executions) == 1
+        assert flight.stats() == {"calls": 5, "executions": 1, "coalesced": 4, "in_flight": 0}
+
+    def test_error_is_not_cached(self):
+        flight = SingleFlight()
+        with pytest.raises(ValueError):
+            flight.do("key", lambda: (_ for _ in ()).throw(ValueError("bad")))
+        assert flight.do("key", lambda: 42) == 42
+
+
+class TestStepMemoization:
+
+    @staticmethod
+    def build(config, geometry_cache=None, scrap_cache=None):
+        return PricingPipeline(steps=[
+            GeometryCalculationStep(cache=geometry_cache),
+            ScrapCalculationStep(provider=TableBasedScrapProvider(), cache=scrap_cache),
+            LaborCostStep(),
+            MaterialCostStep(),
+            PricingStep()
+        ], config=config)
+
+    def test_catalogue_matches_plain_pipeline(self):
+        config = PricingConfig(material_price_bopp=186.0, material_price_cpp=186.0, box_cost=23.2)
+        geometry_cache, scrap_cache = LRUCache(maxsize=16), LRUCache(maxsize=16)
+        memoized = self.build(config, geometry_cache, scrap_cache)
+        plain = self.build(config)
+
+        orders = [
+            make_order(width=width, quantity=quantity)
+            for width in (10, 20, 30)
+            for quantity in (1000, 20000, 40000, 80000, 200000, 500000, 900000)
+        ]
+        for order in orders:
+            assert memoized.calculate(order) == plain.calculate(order)
+
+        # 3 геометрии, 5 ступеней тиража
+        assert geometry_cache.stats()["misses"] == 3
+        assert geometry_cache.stats()["hits"] == len(orders) - 3
+        assert len(scrap_cache) == len(TableBasedScrapProvider.TIERS)
+        assert scrap_cache.stats()["hits"] == len(orders) - len(TableBasedScrapProvider.TIERS)
+
+    def test_geometry_key_includes_density(self):
+        prices = dict(material_price_bopp=186.0, material_price_cpp=186.0, box_cost=23.2)
+        cache = LRUCache(maxsize=16)
+        light = self.build(PricingConfig(density=0.91, **prices), geometry_cache=cache)
+        heavy = self.build(PricingConfig(density=0.95, **prices), geometry_cache=cache)
+
+        assert light.calculate(make_order()).weight_grams < heavy.calculate(make_order()).weight_grams
+        assert len(cache) == 2
@@ -0,0 +1,82 @@
+"""
+Колоночная выгрузка расчета пакета (Arrow / Parquet).
+Запуск: pytest tests/test_columnar.py -v
+"""
+import io
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from packaging_pricing import columnar
+from packaging_pricing.batch import validate_columns, rows_to_columns
+from packaging_pricing.columnar import arrow_table, iter_arrow_stream, write_parquet
+from packaging_pricing.export import COLUMNS, generate_row_data
+from packaging_pricing.models import OrderInput, PricingConfig
+from packaging_pricing.prepared import PreparedConfig, RESULT_FIELDS
+from packaging_pricing.registry import build_pipeline
+
+
+@pytest.fixture
+def prepared():
+    return PreparedConfig(PricingConfig(material_price_bopp=186.0, material_price_cpp=201.5, box_cost=23.20))
+
+
+ROWS = [
+    {'product_type': 'BOPP', 'width': 10, 'length': 25, 'flap': 3, 'thickness': 25, 'quantity': 30000,
+     'features': {'glue_tape': True}},
+    {'product_type': 'CPP', 'width': -1, 'length': 25, 'thickness': 25, 'quantity': 30000},
+    {'product_type': 'CPP', 'width': 30, 'fold': 4, 'length': 40, 'thickness': 30, 'quantity': 120000,
+     'print_scheme': '1+0', 'features': {'is_wicket': True}},
+]
+
+
+class TestArrowTable:
+
+    def test_columns_match_scalar_export(self, prepared):
+        table = arrow_table(prepared, validate_columns(rows_to_columns(ROWS)))
+        assert table.column_names == ['row', 'error'] + list(RESULT_FIELDS) + COLUMNS
+        assert table.column('final_price').null_count == 1
+
+        data = table.to_pylist()
+        pipeline = build_pipeline(prepared.config)
+        for idx in (0, 2):
+            order = OrderInput(**ROWS[idx])
+            context = pipeline.run(order)
+            expected = generate_row_data(order, context.final_result, prepared.config.k2_margin_divisor,
+                                         prepared.config.k3_margin_multiplier, context.intermediates)
+            assert data[idx]['final_price'] == context.final_result.final_price
+            assert {column: data[idx][column] for column in COLUMNS} == expected
+        assert data[1]['Продукция'] is None
+
+    def test_numeric_columns_not_copied(self, prepared, monkeypatch):
+        priced = {}
+
+        def row_columns(orders, results, *args):
+            priced.update(results)
+            return export_row_columns(orders, results, *args)
+
+        export_row_columns = columnar.row_columns
+        monkeypatch.setattr(columnar, "row_columns", row_columns)
+        validation = validate_columns(rows_to_columns(ROWS))
+        table = arrow_table(prepared, validation)
+
+        # Буферы данных Arrow — те же массивы NumPy (NaN под null-маской невалидной строки)
+        for name, source in (('final_price', priced['final_price']), ('Тираж', validation.columns['quantity'])):
+            chunk = table.column(name).chunk(0)
+            assert chunk.buffers()[1].address == source.ctypes.data, name
+
+    def test_ipc_stream_round_trip(self, prepared):
+        rows = ROWS * 10
+        table = arrow_table(prepared, validate_columns(rows_to_columns(rows)))
+        chunks = list(iter_arrow_stream(table, max_chunksize=7))
+        assert len(chunks) > 3
+        restored = pa.ipc.open_stream(b''.join(chunks)).read_all()
+        assert restored.equals(table)
+
+    def test_parquet_round_trip(self, prepared):
+        pq = pytest.importorskip("pyarrow.parquet")
+        table = arrow_table(prepared, validate_columns(rows_to_columns(ROWS)))
+        buffer = io.BytesIO()
+        write_parquet(table, buffer)
+        buffer.seek(0)
+        assert pq.read_table(buffer).equals(table)
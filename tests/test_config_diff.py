@@ -0,0 +1,144 @@
+"""
+Сравнение конфигов на книге заказов: совпадение с расчетом, внешняя сортировка, статистика, файлы отчета.
+Запуск: pytest tests/test_config_diff.py -v
+"""
+import csv
+import io
+import json
+import zipfile
+import pytest
+from packaging_pricing.config_diff import ConfigDiff, iter_order_file, report_columns
+from packaging_pricing.models import OrderInput, PricingConfig
+from packaging_pricing.prepared import PreparedConfig, order_columns
+from packaging_pricing.registry import build_pipeline
+
+
+def make_config(**overrides):
+    params = dict(
+        material_price_bopp=186.0,
+        material_price_cpp=201.5,
+        box_cost=23.20,
+        feature_rates={"glue": 0.003, "dead_glue": 0.0207, "euroslot_pvd": 0.0137, "euroslot_bopp": 0.0012, "clips": 0.8},
+        roll_widths=[40, 60, 80],
+        roll_edge_trim=2
+    )
+    params.update(overrides)
+    return PricingConfig(**params)
+
+
+def make_orders(n=60):
+    orders = []
+    for i in range(n):
+        orders.append(OrderInput(
+            product_type="BOPP" if i % 3 else "CPP",
+            width=10 + i % 25, fold=i % 4, length=20 + i % 17, flap=i % 5,
+            thickness=20 + i % 15, quantity=1000 + 997 * i,
+            features={"glue_tape": bool(i % 2)}
+        ))
+    return orders
+
+
+def as_columns(orders):
+    columns = order_columns(orders)
+    return {name: list(values) for name, values in columns.items()}
+
+
+def run_diff(current, candidate, orders, chunk=1000):
+    diff = ConfigDiff(PreparedConfig(current), PreparedConfig(candidate))
+    columns = as_columns(orders)
+    n = len(orders)
+    for start in range(0, n, chunk):
+        diff.add({name: values[start:start + chunk] for name, values in columns.items()})
+    return diff
+
+
+class TestConfigDiff:
+    def test_matches_both_configs(self):
+        current, candidate = make_config(), make_config(material_price_bopp=210.0, material_price_cpp=230.0)
+        orders = make_orders()
+        with run_diff(current, candidate, orders) as diff:
+            rows = [dict(zip(report_columns(), row)) for row in diff.records()]
+            stats = diff.stats()
+        assert sorted(r['row'] for r in rows) == list(range(len(orders)))
+        old, new = build_pipeline(current), build_pipeline(candidate)
+        for r in rows:
+            order = orders[r['row']]
+            assert r['final_price_current'] == old.calculate(order).final_price
+            assert r['final_price_candidate'] == new.calculate(order).final_price
+        assert stats['priced'] == len(orders)
+        assert 0 < stats['final_price_increased'] == stats['final_price_changed']
+        assert stats['revenue_candidate'] > stats['revenue_current']
+
+    def test_sorted_across_runs(self):
+        candidate = make_config(material_price_bopp=150.0, material_price_cpp=260.0)
+        with run_diff(make_config(), candidate, make_orders(), chunk=7) as diff:
+            # Маленький буфер слияния: каждая серия дочитывается много раз
+            blocks = list(diff.record_blocks(merge_rows=1))
+            rows = [dict(zip(report_columns(), row)) for row in diff.records()]
+        assert sum(len(block) for block in blocks) == len(rows)
+        keys = [(-abs(r['final_price_delta']), r['row']) for r in rows]
+        assert keys == sorted(keys)
+
+    def test_no_layout_first_and_invalid_counted(self):
+        orders = make_orders(20)
+        columns = as_columns(orders)
+        columns['width'][5] = 85      # в рулоны кандидата не помещается
+        columns['thickness'][7] = -1  # не проходит проверку
+        diff = ConfigDiff(PreparedConfig(make_config(roll_widths=[60, 80, 100])), PreparedConfig(make_config()))
+        with diff:
+            diff.add(columns)
+            rows = [dict(zip(report_columns(), row)) for row in diff.records()]
+            stats = diff.stats()
+        assert rows[0]['row'] == 5
+        assert rows[0]['final_price_candidate'] is None and rows[0]['final_price_current'] is not None
+        assert stats['rows'] == 20 and stats['invalid'] == 1 and stats['priced'] == 18
+        assert stats['no_roll_layout'] == {'current': 0, 'candidate': 1}
+        assert 7 not in {r['row'] for r in rows}
+
+    def test_formula_errors_counted_apart_from_layout(self):
+        orders = make_orders(20)
+        columns = as_columns(orders)
+        columns['width'][5] = 85  # не помещается в рулоны обоих конфигов
+        candidate = make_config(formulas={"final_price": "variable_cost * 2 if is_bopp else variable_cost / (fold - fold)"})
+        with ConfigDiff(PreparedConfig(make_config()), PreparedConfig(candidate)) as diff:
+            diff.add(columns)
+            stats = diff.stats()
+        cpp = sum(1 for i, order in enumerate(orders) if order.product_type == "CPP" and i != 5)
+        assert stats['no_roll_layout'] == {'current': 1, 'candidate': 1}
+        assert stats['formula_error'] == {'current': 0, 'candidate': cpp}
+        assert stats['priced'] == 19 - cpp
+
+    def test_csv_and_xlsx(self):
+        with run_diff(make_config(), make_config(box_cost=30.0), make_orders(10), chunk=4) as diff:
+            out = io.BytesIO()
+            diff.write_csv(out)
+            xlsx = io.BytesIO()
+            diff.write_xlsx(xlsx)
+        lines = list(csv.reader(io.StringIO(out.getvalue().decode('utf-8-sig')), delimiter=';'))
+        assert lines[0] == report_columns()
+        assert len(lines) == 11
+        with zipfile.ZipFile(xlsx) as archive:
+            assert 'xl/worksheets/sheet2.xml' in archive.namelist()
+
+
+class TestIterOrderFile:
+    def test_csv_and_jsonl(self, tmp_path):
+        orders = make_orders(5)
+        path = tmp_path / "orders.csv"
+        path.write_text(
+            "product_type,width,fold,length,flap,thickness,quantity,glue_tape\n"
+            + "".join(f"{o.product_type.value},{o.width},{o.fold},{o.length},{o.flap},{o.thickness},{o.quantity},"
+                      f"{'true' if o.features.glue_tape else ''}\n" for o in orders),
+            encoding="utf-8"
+        )
+        jsonl = tmp_path / "orders.jsonl"
+        jsonl.write_text("\n".join(json.dumps(o.model_dump(mode="json")) for o in orders), encoding="utf-8")
+
+        for source in (path, jsonl):
+            chunks = list(iter_order_file(str(source), chunk_rows=2))
+            assert [len(chunk['width']) for chunk in chunks] == [2, 2, 1]
+            with ConfigDiff(PreparedConfig(make_config()), PreparedConfig(make_config())) as diff:
+                for chunk in chunks:
+                    diff.add(chunk)
+                assert diff.stats()['priced'] == 5
+                assert diff.stats()['final_price_changed'] == 0
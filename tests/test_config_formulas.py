@@ -0,0 +1,153 @@
+"""
+Свои формулы конфига (PricingConfig.formulas): компиляция, совпадение пайплайна
+и векторного PreparedConfig, ошибки формул в одиночном и пакетном расчете.
+Запуск: pytest tests/test_config_formulas.py -v
+"""
+import pytest
+from pydantic import ValidationError
+from packaging_pricing.batch import price_validated, validate_columns
+from packaging_pricing.errors import CalculationError
+from packaging_pricing.fixed_point import FixedPointEngine
+from packaging_pricing.formulas import DEFAULT_FORMULAS, compile_formula
+from packaging_pricing.models import OrderInput, PricingConfig
+from packaging_pricing.prepared import PreparedConfig, order_columns, result_columns
+from packaging_pricing.quantity_breaks import quantity_segments
+from packaging_pricing.registry import build_pipeline
+from packaging_pricing.session import QuoteSession
+
+
+def make_config(**overrides):
+    params = dict(
+        material_price_bopp=186.0,
+        material_price_cpp=201.5,
+        box_cost=23.20,
+        feature_rates={"glue": 0.003, "dead_glue": 0.0207, "euroslot_pvd": 0.0137, "euroslot_bopp": 0.0012, "clips": 0.8},
+        roll_widths=[40, 60, 80],
+        roll_edge_trim=2
+    )
+    params.update(overrides)
+    return PricingConfig(**params)
+
+
+ORDERS = [
+    OrderInput(
+        product_type="BOPP" if i % 3 else "CPP",
+        width=10 + i % 25, fold=i % 4, length=20 + i % 17, flap=i % 5,
+        thickness=20 + i % 15, quantity=1000 + 997 * i,
+        features={"glue_tape": bool(i % 2), "is_wicket": i % 5 == 0}
+    )
+    for i in range(40)
+]
+
+CUSTOM = {
+    "overhead_cost": "weight * 0.05 if quantity > 20000 else weight * 0.08",
+    "final_price": "max(variable_cost * 1.3 + overhead_cost, 1) + (0.2 if glue_tape and not is_bopp else 0)",
+}
+
+
+def assert_paths_agree(config):
+    pipeline = build_pipeline(config)
+    prepared = PreparedConfig(config)
+    columns = result_columns(prepared.price_columns(order_columns(ORDERS)))
+    for i, order in enumerate(ORDERS):
+        expected = pipeline.calculate(order)
+        assert columns['final_price'][i] == expected.final_price
+        assert columns['overhead_cost'][i] == expected.overhead_cost
+        assert columns['variable_cost'][i] == expected.variable_cost
+
+
+class TestFormulas:
+    def test_default_formulas_reproduce_builtin(self):
+        builtin = build_pipeline(make_config())
+        config = make_config(formulas=DEFAULT_FORMULAS)
+        assert_paths_agree(config)
+        for order in ORDERS:
+            assert build_pipeline(config).calculate(order).final_price == builtin.calculate(order).final_price
+
+    def test_custom_formulas_agree(self):
+        config = make_config(formulas=CUSTOM)
+        assert_paths_agree(config)
+        order = ORDERS[3]  # CPP, с клеевой лентой
+        result = build_pipeline(config).calculate(order)
+        assert result.final_price == round(max(result.variable_cost * 1.3 + result.overhead_cost, 1) + 0.2, 2)
+
+    @pytest.mark.parametrize("target,text", [
+        ("final_price", "variable_cost + nope"),
+        ("final_price", "glue_tape + 1"),
+        ("variable_cost", "final_price * 0.5"),
+        ("overhead_cost", "__import__('os')"),
+        ("margin", "1"),
+    ])
+    def test_invalid_formulas_rejected(self, target, text):
+        with pytest.raises(ValidationError):
+            make_config(formulas={target: text})
+
+    def test_compiled_once(self):
+        assert compile_formula("final_price", "variable_cost * 2") is compile_formula("final_price", "variable_cost * 2")
+
+
+class TestFormulaErrors:
+    def test_division_by_zero(self):
+        config = make_config(formulas={"final_price": "variable_cost / (fold - fold)"})
+        error = build_pipeline(config).try_run(ORDERS[1])
+        assert isinstance(error, CalculationError) and error.type == "formula_error"
+
+        columns = order_columns(ORDERS[:3])
+        columns['width'] = [10, 85, 12]  # вторая строка не помещается в рулоны
+        validation = validate_columns(columns)
+        price_validated(PreparedConfig(config), validation)
+        assert sorted((e['row'], e['type']) for e in validation.errors) == [
+            (0, 'formula_error'), (1, 'no_roll_layout'), (2, 'formula_error')
+        ]
+
+    def test_unsupported_engines(self):
+        config = make_config(formulas={"overhead_cost": "weight * quantity / 1e6"})
+        with pytest.raises(ValueError):
+            FixedPointEngine(config)
+        with pytest.raises(ValueError):
+            quantity_segments(PreparedConfig(config), ORDERS[1], build_pipeline(config))
+        config = make_config(formulas={"final_price": "variable_cost * 2"})
+        segments = quantity_segments(PreparedConfig(config), ORDERS[1], build_pipeline(config))
+        assert all(s.unit_price == round(s.variable_cost * 2, 2) for s in segments)
+
+    def test_session_reruns_pricing_on_formula_field(self):
+        pipeline = build_pipeline(make_config(roll_widths=[], formulas={"final_price": "variable_cost * 2 + flap / 100"}))
+        session = QuoteSession(pipeline)
+        session.apply(ORDERS[1].model_dump(mode="json"))
+        result = session.apply({"flap": 9})
+        assert "PricingStep" in session.last_executed
+        assert result == pipeline.calculate(OrderInput(**session.draft))
+
+    @pytest.mark.parametrize("text", [
+        "variable_cost + box_cost / (1 - rop_overhead)",
+        "variable_cost + 10 ** 400",
+        "variable_cost + 10 ** (rop_overhead * 400)",
+    ])
+    def test_constant_errors_scalar_vector_parity(self, text):
+        config = make_config(rop_overhead=1.0, formulas={"final_price": text})
+        assert build_pipeline(config).try_run(ORDERS[1]).type == "formula_error"
+
+        validation = validate_columns(order_columns(ORDERS[:2]))
+        price_validated(PreparedConfig(config), validation)
+        assert [(e['row'], e['type']) for e in validation.errors] == [(0, 'formula_error'), (1, 'formula_error')]
+
+    @pytest.mark.parametrize("text", [
+        "variable_cost * 2 if is_bopp else 1.0 / 0.0",
+        "variable_cost if is_bopp else 10 ** 400",
+        "(1 / (1 - rop_overhead)) if not is_bopp else variable_cost",
+    ])
+    def test_untaken_branch_errors_only_its_rows(self, text):
+        # Скалярный вариант не вычисляет невыбранную ветвь; векторный вычисляет обе
+        config = make_config(rop_overhead=1.0, formulas={"final_price": text})
+        pipeline = build_pipeline(config)
+        validation = validate_columns(order_columns(ORDERS))
+        priced = price_validated(PreparedConfig(config), validation)
+        errors = {e['row']: e['type'] for e in validation.errors}
+        for i, order in enumerate(ORDERS):
+            outcome = pipeline.try_run(order)
+            if isinstance(outcome, CalculationError):
+                assert errors[i] == outcome.type == "formula_error"
+            else:
+                assert i not in errors
+                assert priced['final_price'][i] == outcome.final_result.final_price
+        assert 0 < len(errors) < len(ORDERS)
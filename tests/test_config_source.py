@@ -0,0 +1,93 @@
+"""
+Тесты файлового источника конфига: атомарная замена снимка и перечитывание файла.
+Запуск: pytest tests/test_config_source.py -v
+"""
+import json
+import pytest
+from packaging_pricing.config_source import ConfigStore, ConfigFileWatcher, load_config_file, write_config_file
+from packaging_pricing.models import PricingConfig
+from packaging_pricing.registry import resolve_pipeline
+
+
+def make_config(**overrides):
+    data = dict(material_price_bopp=186.0, material_price_cpp=190.0, box_cost=23.2)
+    data.update(overrides)
+    return PricingConfig(**data)
+
+
+class TestConfigStore:
+
+    def test_publish_swaps_snapshot(self):
+        store = ConfigStore(make_config())
+        old = store.current
+        new = store.publish(make_config(material_price_bopp=200.0))
+        assert store.current is new
+        assert new.version != old.version
+        assert new.prepared.config is new.config
+        # Снимок, взятый запросом раньше, не меняется
+        assert old.config.material_price_bopp == 186.0
+
+    def test_same_config_keeps_snapshot(self):
+        store = ConfigStore(make_config())
+        old = store.current
+        assert store.publish(make_config()) is old
+
+
+    def test_pipeline_factory_kept_across_publish(self):
+        factory = resolve_pipeline()
+        store = ConfigStore(make_config(), factory=factory)
+        assert store.current.prepared.scrap_provider is factory.scrap_provider
+        snapshot = store.publish(make_config(material_price_bopp=200.0))
+        assert snapshot.factory is factory and snapshot.prepared.scrap_provider is factory.scrap_provider
+        assert snapshot.pipeline.config is snapshot.config
+
+
+class TestConfigFiles:
+
+    def test_json_round_trip(self, tmp_path):
+        path = str(tmp_path / "pricing.json")
+        write_config_file(path, make_config(rop_overhead=7.5))
+        assert load_config_file(path) == make_config(rop_overhead=7.5)
+        assert [p.name for p in tmp_path.iterdir()] == ["pricing.json"]
+
+    def test_yaml_round_trip(self, tmp_path):
+        pytest.importorskip("yaml")
+        path = str(tmp_path / "pricing.yaml")
+        write_config_file(path, make_config(k3_margin_multiplier=1.9))
+        assert load_config_file(path).k3_margin_multiplier == 1.9
+
+
+class TestConfigFileWatcher:
+
+    def test_reloads_changed_file(self, tmp_path):
+        path = tmp_path / "pricing.json"
+        write_config_file(str(path), make_config())
+        store = ConfigStore(make_config())
+        watcher = ConfigFileWatcher(str(path), store)
+
+        assert watcher.check() is False
+        write_config_file(str(path), make_config(material_price_cpp=210.0))
+        assert watcher.check() is True
+        assert store.current.config.material_price_cpp == 210.0
+        assert store.current.source == f"file:{path}"
+        # Файл не менялся — повторный опрос ничего не делает
+        assert watcher.check() is False
+
+    def test_invalid_file_keeps_active_config(self, tmp_path):
+        path = tmp_path / "pricing.json"
+        write_config_file(str(path), make_config())
+        store = ConfigStore(make_config())
+        watcher = ConfigFileWatcher(str(path), store)
+        watcher.check()
+        before = store.current
+
+        data = make_config().model_dump(mode="json")
+        data["material_price_bopp"] = "дорого"
+        path.write_text(json.dumps(data), encoding="utf-8")
+        assert watcher.check() is False
+        assert store.current is before
+        assert "material_price_bopp" in watcher.last_error
+
+        write_config_file(str(path), make_config(material_price_bopp=250.0))
+        assert watcher.check() is True
+        assert watcher.last_error is None
@@ -0,0 +1,69 @@
+"""
+Ошибки расчета (CalculationError): возврат из пайплайна и ответы 422
+эндпоинтов одного заказа в формате ошибок проверки FastAPI.
+Запуск: pytest tests/test_errors.py -v
+"""
+import pytest
+from packaging_pricing.errors import CalculationError, CalculationFailed
+from packaging_pricing.models import OrderInput, PricingConfig
+from packaging_pricing.pipeline import PricingPipeline
+from packaging_pricing.registry import build_pipeline
+
+
+def make_config(**overrides):
+    return PricingConfig(material_price_bopp=186.0, material_price_cpp=190.0, box_cost=23.20, **overrides)
+
+
+ORDER = {"product_type": "BOPP", "width": 10, "length": 25, "flap": 3, "thickness": 25, "quantity": 30000}
+
+
+class TestPipelineErrors:
+    def test_missing_intermediate_is_returned(self):
+        pipeline = build_pipeline(make_config())
+        broken = PricingPipeline(steps=pipeline.steps[1:], config=pipeline.config)
+        outcome = broken.try_run(OrderInput(**ORDER))
+        assert isinstance(outcome, CalculationError)
+        assert outcome.type == "missing_intermediate"
+        assert outcome.loc == ("intermediates", "weight")
+        with pytest.raises(CalculationFailed):
+            broken.calculate(OrderInput(**ORDER))
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Клиент сервера с подмененным активным конфигом."""
+    from fastapi.testclient import TestClient
+    import server
+    from packaging_pricing.config_source import ConfigStore
+
+    def client(config):
+        monkeypatch.setattr(server, "config_store", ConfigStore(config))
+        return TestClient(server.app)
+    return client
+
+
+PATHS = ["/api/calculate", "/api/preview_table", "/api/quote", "/api/export_excel"]
+
+
+class TestEndpointErrors:
+    @pytest.mark.parametrize("path", PATHS)
+    def test_unknown_euroslot_is_422(self, api, path):
+        response = api(make_config()).post(path, json={**ORDER, "features": {"euroslot": "metal"}})
+        assert response.status_code == 422
+        [error] = response.json()["detail"]
+        assert error["type"] == "unknown_euroslot" and error["loc"] == ["body", "features", "euroslot"]
+
+    @pytest.mark.parametrize("path", PATHS)
+    def test_no_roll_layout_is_422(self, api, path):
+        client = api(make_config(roll_widths=[30]))
+        response = client.post(path, json={**ORDER, "width": 40})
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["type"] == "no_roll_layout"
+        assert client.post(path, json=ORDER).status_code == 200
+
+    @pytest.mark.parametrize("path", PATHS)
+    def test_formula_error_is_422(self, api, path):
+        response = api(make_config(formulas={"final_price": "variable_cost / (width - 10)"})).post(path, json=ORDER)
+        assert response.status_code == 422
+        [error] = response.json()["detail"]
+        assert error["type"] == "formula_error" and error["loc"] == ["body", "formulas", "final_price"]
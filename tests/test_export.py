@@ -0,0 +1,158 @@
+"""
+Тесты выгрузки коммерческого предложения (несколько заказов, листы по группам)
+и потоковой выгрузки CSV/TSV.
+Запуск: pytest tests/test_export.py -v
+"""
+import csv
+import io
+import openpyxl
+import pytest
+from packaging_pricing.export import (
+    COLUMNS,
+    SUMMARY_COLUMNS,
+    generate_proposal_excel_bytes,
+    generate_row_data,
+    iter_delimited,
+    iter_row_data
+)
+from packaging_pricing.models import OrderInput, PricingConfig, BagType, Features
+from packaging_pricing.registry import build_pipeline
+
+
+@pytest.fixture
+def pipeline():
+    config = PricingConfig(material_price_bopp=186.0, material_price_cpp=190.0, box_cost=23.20)
+    return build_pipeline(config)
+
+
+@pytest.fixture
+def quotes(pipeline):
+    orders = [
+        OrderInput(product_type=BagType.BOPP, width=10, length=25, thickness=25, quantity=30000, print_scheme="б/печати"),
+        OrderInput(product_type=BagType.CPP, width=20, length=30, thickness=25, quantity=60000, print_scheme="1+0"),
+        OrderInput(product_type=BagType.BOPP, width=30, length=40, thickness=30, quantity=200000, print_scheme="1+0",
+                   features=Features(is_wicket=True)),
+    ]
+    return [(order, pipeline.calculate(order)) for order in orders]
+
+
+class TestProposalExport:
+
+    def test_sheets_grouped_by_product_type(self, quotes):
+        wb = openpyxl.load_workbook(generate_proposal_excel_bytes(quotes))
+        assert wb.sheetnames == ['Сводка', 'BOPP', 'CPP']
+        bopp = list(wb['BOPP'].values)
+        assert list(bopp[0]) == COLUMNS
+        assert len(bopp) == 3
+
+    def test_invalid_sheet_characters_replaced(self, quotes):
+        wb = openpyxl.load_workbook(generate_proposal_excel_bytes(quotes, group_by='print_scheme'))
+        assert wb.sheetnames == ['Сводка', 'б_печати', '1+0']
+
+    def test_xml_illegal_characters_dropped(self, quotes):
+        order, result = quotes[1]
+        order = order.model_copy(update={"print_scheme": "1\x00+0\x1f\tлак\n"})
+        wb = openpyxl.load_workbook(generate_proposal_excel_bytes([quotes[0], (order, result)]))
+        row = dict(zip(COLUMNS, list(wb['CPP'].values)[1]))
+        assert row['Схема печати'] == "1+0\tлак\n"
+
+    def test_summary_totals(self, quotes):
+        wb = openpyxl.load_workbook(generate_proposal_excel_bytes(quotes))
+        rows = list(wb['Сводка'].values)
+        assert list(rows[0]) == SUMMARY_COLUMNS
+        total = dict(zip(SUMMARY_COLUMNS, rows[-1]))
+        assert total['Группа'] == 'ИТОГО'
+        assert total['Заказов'] == 3
+        assert total['Тираж итого'] == 290000
+
+        revenue = sum(r.final_price * o.quantity for o, r in quotes)
+        margin = sum((r.final_price - r.variable_cost - r.overhead_cost) * o.quantity for o, r in quotes)
+        assert abs(total['Выручка'] - revenue) < 0.01
+        assert abs(total['Средневзвешенная маржа, %'] - margin / revenue * 100) < 0.01
+
+    def test_unknown_grouping(self, quotes):
+        with pytest.raises(ValueError):
+            generate_proposal_excel_bytes(quotes, group_by='color')
+
+
+class TestDelimitedExport:
+
+    def test_rows_in_column_order(self, quotes):
+        content = b''.join(iter_delimited(iter_row_data(quotes), delimiter='\t', encoding='utf-8'))
+        rows = list(csv.reader(io.StringIO(content.decode('utf-8')), delimiter='\t'))
+        assert rows[0] == COLUMNS
+        assert len(rows) == len(quotes) + 1
+        order, result = quotes[1]
+        expected = generate_row_data(order, result)
+        assert rows[2] == [str(expected[c]) for c in COLUMNS]
+
+    def test_bom_written_once(self, quotes):
+        chunks = list(iter_delimited(iter_row_data(quotes * 3), encoding='utf-8-sig', chunk_rows=2))
+        assert len(chunks) > 1
+        content = b''.join(chunks)
+        assert content.startswith(b'\xef\xbb\xbf')
+        assert content.count(b'\xef\xbb\xbf') == 1
+
+    def test_cp1251_with_decimal_comma(self, quotes):
+        content = b''.join(iter_delimited(iter_row_data(quotes[:1]), delimiter=';', encoding='cp1251', decimal=','))
+        header, row = content.decode('cp1251').splitlines()
+        assert header.split(';') == COLUMNS
+        weight = row.split(';')[COLUMNS.index('Вес')]
+        assert ',' in weight and '.' not in weight
+
+    def test_unknown_encoding_rejected(self, quotes):
+        with pytest.raises(ValueError):
+            next(iter_delimited(iter_row_data(quotes), encoding='koi8-r'))
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Клиент сервера с подмененным активным конфигом (без прогрева при старте)."""
+    from fastapi.testclient import TestClient
+    import server
+    from packaging_pricing.config_source import ConfigStore
+
+    def client(config):
+        monkeypatch.setattr(server, "config_store", ConfigStore(config))
+        return TestClient(server.app)
+    return client
+
+
+class TestMultiOrderExportErrors:
+    ORDERS = [
+        {"product_type": "BOPP", "width": 10, "length": 25, "thickness": 25, "quantity": 30000},
+        {"product_type": "CPP", "width": 40, "length": 30, "thickness": 25, "quantity": 60000},
+    ]
+
+    @pytest.mark.parametrize("path", ["/api/export_proposal", "/api/export_csv/batch", "/api/export_tsv/batch"])
+    def test_no_roll_layout_is_422(self, api, path):
+        client = api(PricingConfig(material_price_bopp=186.0, material_price_cpp=190.0, box_cost=23.20, roll_widths=[30]))
+        response = client.post(path, json={"orders": self.ORDERS})
+        assert response.status_code == 422
+        [error] = response.json()["detail"]
+        assert error["type"] == "no_roll_layout" and error["loc"][:3] == ["body", "orders", 1]
+
+        ok = client.post(path, json={"orders": self.ORDERS[:1]})
+        assert ok.status_code == 200
+
+    @pytest.mark.parametrize("path", ["/api/export_proposal", "/api/export_csv/batch"])
+    def test_formula_error_is_422(self, api, path):
+        client = api(PricingConfig(material_price_bopp=186.0, material_price_cpp=190.0, box_cost=23.20,
+                                   formulas={"final_price": "variable_cost / (width - 40)"}))
+        response = client.post(path, json={"orders": self.ORDERS})
+        assert response.status_code == 422
+        [error] = response.json()["detail"]
+        assert error["type"] == "formula_error" and error["loc"] == ["body", "orders", 1, "formulas", "final_price"]
+
+
+class TestPreviewMatchesExport:
+    def test_preview_row_equals_xlsx_row(self, api):
+        client = api(PricingConfig(material_price_bopp=186.0, material_price_cpp=190.0, box_cost=23.20))
+        order = {"product_type": "CPP", "width": 20, "length": 30, "flap": 4, "thickness": 25, "quantity": 30000,
+                 "features": {"is_wicket": True}}
+        preview = client.post("/api/preview_table", json=order).json()
+        quote = client.post("/api/quote", json=order).json()["row"]
+        sheet = openpyxl.load_workbook(io.BytesIO(client.post("/api/export_excel", json=order).content)).active
+        exported = dict(zip(COLUMNS, next(sheet.iter_rows(min_row=2, values_only=True))))
+        for column in ("Сырье", "Постоянные расходы ГУ", "Постоянные расходы", "Риски", "Общая себестоимость"):
+            assert preview[column] == quote[column] == exported[column]
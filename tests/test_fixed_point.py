@@ -0,0 +1,75 @@
+"""
+Движок с фиксированной точкой: округление, точность относительно Decimal, паритет с float.
+Запуск: pytest tests/test_fixed_point.py -v
+"""
+import numpy as np
+import pytest
+from packaging_pricing.batch import price_groups, validate_columns
+from packaging_pricing.fixed_point import FixedPointEngine, div_round, parity_report, to_fixed, _mul
+from packaging_pricing.models import OrderInput, PricingConfig
+from packaging_pricing.registry import build_pipeline
+
+
+@pytest.fixture
+def config():
+    return PricingConfig(
+        material_price_bopp=186.0,
+        material_price_cpp=190.0,
+        box_cost=23.20,
+        feature_rates={"glue": 0.003, "dead_glue": 0.0207, "euroslot_pvd": 0.0137, "euroslot_bopp": 0.0012, "clips": 0.8}
+    )
+
+
+class TestRounding:
+    def test_half_away_from_zero(self):
+        assert div_round(np.array([15, 25, -15, 14, -14]), 10).tolist() == [2, 3, -2, 1, -1]
+
+    def test_to_fixed_uses_decimal_notation(self):
+        # 0.0137 * 1e9 во float дает 13699999.999999998
+        assert to_fixed(0.0137, 10 ** 9) == 13_700_000
+        assert to_fixed(2.675, 100) == 268
+
+    def test_overflow_is_detected_per_row(self):
+        overflow = np.zeros(2, dtype=bool)
+        product = _mul(np.array([2 ** 40, 3]), 2 ** 30, overflow)
+        assert overflow.tolist() == [True, False] and product[1] == 3 * 2 ** 30
+
+
+class TestFixedPointEngine:
+    def test_tie_is_rounded_up(self, config):
+        # 0.0137 руб/см * 8.5 см = 0.11645 ровно; float-путь округляет 0.116449999... вниз
+        order = OrderInput(product_type="BOPP", width=8.5, length=25, thickness=25, quantity=30000,
+                           features={"euroslot": "pvd"})
+        assert FixedPointEngine(config).calculate(order).options_cost == 0.1165
+        assert build_pipeline(config).calculate(order).options_cost == 0.1164
+
+    def test_close_to_float_pipeline(self, config):
+        order = OrderInput(product_type="CPP", width=30, fold=4, length=40, flap=3, thickness=30, quantity=120000,
+                           features={"is_wicket": True, "glue_tape": True})
+        fixed = FixedPointEngine(config).calculate(order)
+        expected = build_pipeline(config).calculate(order)
+        assert fixed.details == pytest.approx(expected.details)
+        assert fixed.final_price == pytest.approx(expected.final_price, abs=0.01)
+        assert fixed.variable_cost == pytest.approx(expected.variable_cost, abs=1e-4)
+
+    def test_oversized_row_does_not_fail_batch(self, config):
+        # Допустимый схемой, но не помещающийся в int64 заказ считается float-путем
+        validation = validate_columns({
+            "product_type": ["BOPP", "CPP"], "width": [10000, 20], "length": [10000, 30],
+            "thickness": [1000, 25], "quantity": [30000, 50000]
+        })
+        results = price_groups([(FixedPointEngine(config), validation.valid.copy())], validation)
+        assert validation.errors == []
+        pipeline = build_pipeline(config)
+        big = OrderInput(product_type="BOPP", width=10000, length=10000, thickness=1000, quantity=30000)
+        assert results['final_price'][0] == pipeline.calculate(big).final_price
+        assert FixedPointEngine(config).calculate(big) == pipeline.calculate(big)
+        assert np.isfinite(results['final_price'][1])
+
+    @pytest.mark.parametrize("roll_widths", [[], [60, 80, 100]])
+    def test_parity_report(self, config, roll_widths):
+        config = config.model_copy(update={"roll_widths": roll_widths, "roll_edge_trim": 2})
+        report = parity_report(config, n=5000, seed=3, exact_sample=1000)
+        for name, stats in report['fields'].items():
+            assert stats['fixed_vs_exact'] == 0, name
+            assert stats['max_last_digit_units'] <= 1, name
@@ -4,15 +4,7 @@
 """
 import pytest
 from packaging_pricing.models import OrderInput, PricingConfig, BagType, Features
-from packaging_pricing.pipeline import PricingPipeline
-from packaging_pricing.scraps import TableBasedScrapProvider
-from packaging_pricing.steps import (
-    GeometryCalculationStep,
-    ScrapCalculationStep,
-    LaborCostStep,
-    MaterialCostStep,
-    PricingStep
-)
+from packaging_pricing.registry import build_pipeline
 
 
 # Фикстура: конфигурация экономиста
@@ -45,15 +37,7 @@ def config():
 
 @pytest.fixture
 def pipeline(config):
-    scrap_provider = TableBasedScrapProvider()
-    steps = [
-        GeometryCalculationStep(),
-        ScrapCalculationStep(provider=scrap_provider),
-        LaborCostStep(),
-        MaterialCostStep(),
-        PricingStep()
-    ]
-    return PricingPipeline(steps=steps, config=config)
+    return build_pipeline(config)
 
 
 # ============================================================
@@ -294,3 +278,30 @@ class TestInvariants:
         result_high = pipeline.calculate(high_qty)
         
         assert result_high.scrap_rate_percent < result_low.scrap_rate_percent
+
+
+# ============================================================
+# ТЕСТ 8: Строка экспорта из неокругленных значений
+# ============================================================
+class TestExportRow:
+
+    def test_breakdown_adds_up_to_price(self, pipeline, config):
+        """ВЗ + Постоянные + РОП + Риски = Цена (до округления цены)"""
+        from packaging_pricing.export import generate_row_data
+
+        order = OrderInput(
+            product_type=BagType.CPP,
+            width=20, length=30, flap=4, thickness=25,
+            quantity=30000,
+            features=Features(is_wicket=True)
+        )
+        context = pipeline.run(order)
+        i = context.intermediates
+        row = generate_row_data(
+            order, context.final_result, config.k2_margin_divisor, config.k3_margin_multiplier,
+            intermediates=i
+        )
+
+        total = i['variable_cost'] + row['Постоянные расходы'] + row['Постоянные расходы ГУ'] + row['Риски']
+        assert abs(total - i['final_price']) < 0.0005
+        assert row['Общая себестоимость'] == context.final_result.final_price
@@ -0,0 +1,107 @@
+"""
+Раскладка на рукав/рулон: выбор ширины, обрезь в переменных затратах, кэш решений.
+Запуск: pytest tests/test_layout.py -v
+"""
+import numpy as np
+import pytest
+from packaging_pricing.batch import price_validated, rows_to_columns, validate_columns
+from packaging_pricing.cache import LRUCache
+from packaging_pricing.errors import CalculationError
+from packaging_pricing.layout import Layout, solve_layout, solve_layouts
+from packaging_pricing.models import OrderInput, PricingConfig
+from packaging_pricing.prepared import PreparedConfig
+from packaging_pricing.registry import build_pipeline
+from packaging_pricing.session import QuoteSession
+
+
+@pytest.fixture
+def config():
+    return PricingConfig(
+        material_price_bopp=186.0,
+        material_price_cpp=201.5,
+        box_cost=23.20,
+        feature_rates={"glue": 0.003, "dead_glue": 0.0207, "euroslot_pvd": 0.0137, "euroslot_bopp": 0.0012, "clips": 0.8},
+        roll_widths=[60, 80, 100],
+        roll_edge_trim=2
+    )
+
+
+def layout_pipeline(config, cache=None):
+    return build_pipeline(config, resources={'roll_layout': {'cache': cache}})
+
+
+ORDER = {"product_type": "BOPP", "width": 22, "fold": 3, "length": 30, "flap": 4, "thickness": 25, "quantity": 50000}
+
+
+class TestSolveLayout:
+    def test_least_trim_share(self):
+        # ручей 25: 60 -> 2 ручья (обрезь 10), 80 -> 3 (5), 100 -> 3 (25, кромка 2 не дает 4-й)
+        assert solve_layout(25, [60, 80, 100], edge_trim=2) == Layout(roll_width=80, lanes=3, trim_width=5)
+
+    def test_tie_prefers_narrow_roll(self):
+        assert solve_layout(20, [80, 40]) == Layout(roll_width=40, lanes=2, trim_width=0)
+
+    def test_does_not_fit(self):
+        assert solve_layout(99, [60, 100], edge_trim=2) is None
+
+    def test_vectorized_solves_each_width_once(self):
+        memo = LRUCache()
+        roll, lanes, trim = solve_layouts(np.array([25, 25, 99, 25]), [60, 80, 100], 2, memo=memo)
+        assert lanes.tolist() == [3, 3, 0, 3]
+        assert roll.tolist() == [80, 80, 0, 80]
+        assert memo.stats()["size"] == 2
+
+
+class TestRollLayoutStep:
+    def test_trim_is_added_to_variable_cost(self, config):
+        context = layout_pipeline(config).run(OrderInput(**ORDER))
+        plain = layout_pipeline(config.model_copy(update={"roll_widths": []})).run(OrderInput(**ORDER))
+
+        weight = context.intermediates['weight']
+        trim_weight = weight * 5 / (3 * 25)
+        assert context.intermediates['trim_weight'] == pytest.approx(trim_weight)
+        assert context.intermediates['variable_cost'] == pytest.approx(
+            plain.intermediates['variable_cost'] + trim_weight / 1000 * (186.0 - 10.0)
+        )
+        assert context.final_result.details['layout_lanes'] == 3
+        assert 'layout_lanes' not in plain.final_result.details
+
+    def test_no_layout_is_error(self, config):
+        outcome = layout_pipeline(config).try_run(OrderInput(**{**ORDER, "width": 97}))
+        assert isinstance(outcome, CalculationError)
+        assert outcome.type == "no_roll_layout"
+
+    def test_cache_is_reused(self, config):
+        cache = LRUCache()
+        pipeline = layout_pipeline(config, cache)
+        for quantity in (10000, 50000, 200000):
+            pipeline.calculate(OrderInput(**{**ORDER, "quantity": quantity}))
+        assert cache.stats()["misses"] == 1
+        assert cache.stats()["hits"] == 2
+
+    def test_session_reruns_layout_on_width_change(self, config):
+        session = QuoteSession(layout_pipeline(config))
+        session.apply(ORDER)
+        session.apply({"quantity": 120000})
+        assert "RollLayoutStep" not in session.last_executed
+        result = session.apply({"width": 30})
+        assert "RollLayoutStep" in session.last_executed
+        assert result == layout_pipeline(config).calculate(OrderInput(**session.draft))
+
+
+class TestPreparedLayout:
+    def test_batch_matches_pipeline(self, config):
+        pipeline = layout_pipeline(config)
+        prepared = PreparedConfig(config)
+        rows = [{**ORDER, "width": w, "fold": f} for w in (10, 18.5, 22, 40) for f in (0, 3)]
+        rows.append({**ORDER, "width": 97})
+
+        validation = validate_columns(rows_to_columns(rows))
+        priced = price_validated(prepared, validation)
+        for idx, row in enumerate(rows[:-1]):
+            expected = pipeline.calculate(OrderInput(**row))
+            assert priced['variable_cost'][idx] == pytest.approx(expected.variable_cost, abs=1e-4)
+
+        assert np.isnan(priced['final_price'][-1])
+        assert not validation.valid[-1]
+        assert validation.errors[-1]['type'] == "no_roll_layout"
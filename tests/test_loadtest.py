@@ -0,0 +1,59 @@
+"""
+Дымовой тест нагрузочного генератора (loadtest.py): несколько секунд open-loop
+нагрузки на сервер в потоке и сводка задержек и ошибок по эндпоинтам.
+Запуск: pytest tests/test_loadtest.py -v
+"""
+import socket
+import threading
+import time
+import pytest
+from packaging_pricing.models import PricingConfig
+
+uvicorn = pytest.importorskip("uvicorn")
+
+import loadtest
+
+
+@pytest.fixture
+def live_server(monkeypatch):
+    """server.app под uvicorn в фоновом потоке на свободном порту (без прогрева)."""
+    import server
+    from packaging_pricing.config_source import ConfigStore
+
+    # Узкие рулоны: широкие заказы получают 422 no_roll_layout и попадают в ошибки сводки
+    monkeypatch.setattr(server, "config_store", ConfigStore(PricingConfig(
+        material_price_bopp=186.0, material_price_cpp=190.0, box_cost=23.20, roll_widths=[40]
+    )))
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    instance = uvicorn.Server(uvicorn.Config(server.app, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=instance.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    deadline = time.time() + 10
+    while not instance.started and time.time() < deadline:
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{port}"
+    instance.should_exit = True
+    thread.join(timeout=10)
+    sock.close()
+
+
+class TestLoadGenerator:
+    def test_report_counts_latencies_and_errors(self, live_server):
+        mix = loadtest.parse_mix("calculate=60,preview=40")
+        recorder, elapsed = loadtest.run_load(live_server, rps=40, duration=1.0, mix=mix, seed=3,
+                                              concurrency=4, arrivals="uniform")
+        report = loadtest.build_report(recorder, elapsed, {"target_rps": 40})
+
+        total = report["total"]
+        assert total["requests"] == 40
+        assert sum(e["requests"] for e in report["endpoints"].values()) == total["requests"]
+        assert 0 < total["errors"] < total["requests"]
+        assert total["error_rate"] == round(total["errors"] / total["requests"], 4)
+        for name, endpoint in report["endpoints"].items():
+            # Ошибки — только ответы 422 (не помещающиеся в рулон заказы), без сбоев соединения
+            assert set(endpoint["error_kinds"]) <= {"HTTP 422"}, name
+            latency = endpoint["latency_ms"]
+            assert 0 < latency["p50"] <= latency["p95"] <= latency["p99"], name
+            assert endpoint["service_time_ms"]["p50"] <= latency["p50"], name
@@ -0,0 +1,110 @@
+"""
+Паритет предрасчитанного конфига (PreparedConfig) с эталонным пайплайном.
+Запуск: pytest tests/test_prepared.py -v
+"""
+import random
+import numpy as np
+import pytest
+from packaging_pricing.errors import CalculationError, CalculationFailed
+from packaging_pricing.models import OrderInput, PricingConfig, BagType, Features
+from packaging_pricing.batch import validate_columns
+from packaging_pricing.prepared import PreparedConfig, order_columns
+from packaging_pricing.registry import build_pipeline
+from packaging_pricing.scraps import TableBasedScrapProvider
+
+
+@pytest.fixture
+def config():
+    return PricingConfig(
+        material_price_bopp=186.0,
+        material_price_cpp=201.5,
+        box_cost=23.20,
+        feature_rates={"glue": 0.003, "dead_glue": 0.0207, "euroslot_pvd": 0.0137, "euroslot_bopp": 0.0012, "clips": 0.8}
+    )
+
+
+@pytest.fixture
+def pipeline(config):
+    return build_pipeline(config)
+
+
+def random_orders(n, seed=7):
+    rng = random.Random(seed)
+    orders = []
+    for _ in range(n):
+        is_wicket = rng.random() < 0.3
+        glue = rng.random() < 0.3
+        orders.append(OrderInput(
+            product_type=rng.choice([BagType.BOPP, BagType.CPP]),
+            width=rng.choice([10, 20, 25, 25.5, 30, 40]),
+            fold=rng.choice([0, 3]),
+            length=rng.uniform(10, 60),
+            flap=rng.choice([0, 3, 4]),
+            thickness=rng.choice([20, 25, 30]),
+            quantity=rng.choice([10000, 30000, 30001, 50000, 75000, 100000, 100001, 300000, 300001, 800000]),
+            features=Features(
+                is_wicket=is_wicket,
+                glue_tape=glue,
+                dead_tape=not glue and rng.random() < 0.2,
+                euroslot=rng.choice([None, None, "pvd", "BOPP"]),
+            )
+        ))
+    return orders
+
+
+class TestPreparedParity:
+
+    def test_columns_match_pipeline(self, config, pipeline):
+        prepared = PreparedConfig(config)
+        orders = random_orders(500)
+        batch = prepared.price_columns(order_columns(orders))
+        results = prepared.price_results(order_columns(orders))
+        for i, order in enumerate(orders):
+            expected = pipeline.run(order)
+            for key, value in expected.intermediates.items():
+                if key in batch:
+                    assert batch[key][i] == value, key
+            assert {name: results[name][i] for name in results} == expected.final_result.model_dump(exclude={'details'})
+
+    def test_weight_operation_order(self, config, pipeline):
+        # вес с константой 2 * плотность / 10000, свернутой заранее, давал 2.8255 вместо 2.8256
+        order = OrderInput(product_type=BagType.CPP, width=28, fold=2, length=21, flap=3, thickness=23, quantity=30000)
+        results = PreparedConfig(config).price_results(order_columns([order]))
+        assert {name: results[name][0] for name in results} == pipeline.calculate(order).model_dump(exclude={'details'})
+
+    def test_raw_columns_match_orders(self, config):
+        prepared = PreparedConfig(config)
+        orders = random_orders(300, seed=11)
+        columns = {
+            'product_type': [o.product_type.value for o in orders],
+            'width': [o.width for o in orders],
+            'fold': [o.fold for o in orders],
+            'length': [o.length for o in orders],
+            'flap': [o.flap for o in orders],
+            'thickness': [o.thickness for o in orders],
+            'quantity': [o.quantity for o in orders],
+            'is_wicket': [o.features.is_wicket for o in orders],
+            'glue_tape': [o.features.glue_tape for o in orders],
+            'dead_tape': [o.features.dead_tape for o in orders],
+            'euroslot': [o.features.euroslot for o in orders],
+        }
+        batch = prepared.price_columns(columns)
+        expected = prepared.price_columns(order_columns(orders))
+        for key in batch:
+            np.testing.assert_array_equal(batch[key], expected[key], err_msg=key)
+
+    def test_unknown_euroslot_is_error(self, pipeline):
+        order = OrderInput(product_type=BagType.BOPP, width=10, length=25, thickness=25, quantity=30000,
+                           features=Features(euroslot="other"))
+        expected = pipeline.try_run(order)
+        assert isinstance(expected, CalculationError)
+        assert expected.type == 'unknown_euroslot'
+        assert [e['type'] for e in validate_columns(order_columns([order])).errors] == ['unknown_euroslot']
+        with pytest.raises(CalculationFailed):
+            pipeline.calculate(order)
+
+    def test_vectorized_scrap_rates_match_table(self):
+        provider = TableBasedScrapProvider()
+        quantities = np.array([1, 30000, 30001, 50000, 50001, 100000, 100001, 300000, 300001, 10**7])
+        expected = [provider.get_scrap_rate(int(q), BagType.BOPP) for q in quantities]
+        assert provider.get_scrap_rates(quantities, [BagType.BOPP] * len(quantities)).tolist() == expected
@@ -0,0 +1,97 @@
+"""
+Прайс-листы (профили): поправки к базовому конфигу, общий бюджет памяти, вытеснение LRU.
+Запуск: pytest tests/test_profiles.py -v
+"""
+import pytest
+from pydantic import ValidationError
+from packaging_pricing.config_source import ConfigSnapshot
+from packaging_pricing.models import ConfigProfile, OrderInput, PricingConfig
+from packaging_pricing.prepared import PreparedConfig
+from packaging_pricing.profiles import ProfileRegistry, RESULT_ENTRY_BYTES, prepared_nbytes
+from packaging_pricing.registry import build_pipeline
+
+
+def make_config(price=186.0):
+    return PricingConfig(
+        material_price_bopp=price,
+        material_price_cpp=201.5,
+        box_cost=23.20,
+        feature_rates={"glue": 0.003, "dead_glue": 0.0207, "euroslot_pvd": 0.0137, "euroslot_bopp": 0.0012, "clips": 0.8}
+    )
+
+
+ORDER = OrderInput(product_type="BOPP", width=22, fold=3, length=30, flap=4, thickness=25, quantity=50000,
+                   features={"glue_tape": True})
+
+
+def registry_for(profiles, budget_profiles=100):
+    # Бюджет в "профилях": таблицы + зарезервированный кэш результатов на 16 записей
+    per_profile = prepared_nbytes(PreparedConfig(make_config())) + 16 * RESULT_ENTRY_BYTES
+    registry = ProfileRegistry(memory_budget=per_profile * budget_profiles, results_per_profile=16)
+    for name, profile in profiles.items():
+        registry.set(name, profile)
+    return registry
+
+
+class TestConfigProfile:
+    def test_overrides_on_top_of_base(self):
+        base = make_config()
+        config = ConfigProfile(k3_margin_multiplier=1.4, feature_rates={"glue": 0.01}).apply(base)
+        assert config.k3_margin_multiplier == 1.4
+        assert config.k2_margin_divisor == base.k2_margin_divisor
+        assert config.feature_rates == {**base.feature_rates, "glue": 0.01}
+
+    def test_unknown_field_rejected(self):
+        with pytest.raises(ValidationError):
+            ConfigProfile(material_price_bopp=100)
+
+
+class TestProfileRegistry:
+    def test_profile_prices_with_own_config(self):
+        registry = registry_for({"export": ConfigProfile(k2_margin_divisor=3.0, k3_margin_multiplier=1.3)})
+        base = ConfigSnapshot.build(make_config())
+        state = registry.resolve("export", base)
+        expected = build_pipeline(ConfigProfile(k2_margin_divisor=3.0, k3_margin_multiplier=1.3).apply(make_config()))
+        assert state.snapshot.pipeline.calculate(ORDER) == expected.calculate(ORDER)
+        assert state.snapshot.pipeline.calculate(ORDER).final_price < base.pipeline.calculate(ORDER).final_price
+        assert registry.resolve("export", base) is state
+        with pytest.raises(KeyError):
+            registry.resolve("missing", base)
+
+    def test_identical_profiles_share_tables_not_caches(self):
+        registry = registry_for({"a": ConfigProfile(k3_margin_multiplier=1.5), "b": ConfigProfile(k3_margin_multiplier=1.5)})
+        base = ConfigSnapshot.build(make_config())
+        a, b = registry.resolve("a", base), registry.resolve("b", base)
+        assert a.snapshot is b.snapshot
+        assert a.results is not b.results
+        assert registry.stats()["snapshots"] == 1
+
+    def test_cold_profiles_are_evicted_within_budget(self):
+        profiles = {f"dealer{i}": ConfigProfile(k3_margin_multiplier=1.0 + i / 100) for i in range(10)}
+        registry = registry_for(profiles, budget_profiles=3)
+        base = ConfigSnapshot.build(make_config())
+        for name in profiles:
+            registry.resolve(name, base)
+        registry.resolve("dealer7", base)
+        registry.resolve("dealer0", base)
+
+        stats = registry.stats()
+        assert stats["materialized"] == 3
+        assert stats["memory_bytes"] <= stats["memory_budget"]
+        builds = stats["builds"]
+        registry.resolve("dealer7", base)
+        assert registry.stats()["builds"] == builds
+        # Вытесненный профиль строится заново по определению
+        registry.resolve("dealer1", base)
+        assert registry.stats()["builds"] == builds + 1
+
+    def test_base_change_and_profile_update(self):
+        registry = registry_for({"key": ConfigProfile(k3_margin_multiplier=1.5)})
+        old, new = ConfigSnapshot.build(make_config()), ConfigSnapshot.build(make_config(price=200.0))
+        state = registry.resolve("key", old)
+        assert registry.resolve("key", new).snapshot.config.material_price_bopp == 200.0
+        assert registry.resolve("key", old) is state
+
+        registry.set("key", ConfigProfile(k3_margin_multiplier=1.6))
+        assert registry.stats()["materialized"] == 0
+        assert registry.resolve("key", old).snapshot.config.k3_margin_multiplier == 1.6
@@ -0,0 +1,75 @@
+"""
+Кривая цены от тиража: сегменты по ступеням брака и точки падения цены.
+Запуск: pytest tests/test_quantity_breaks.py -v
+"""
+import pytest
+from packaging_pricing.errors import CalculationError
+from packaging_pricing.models import BagType, OrderInput, PipelineDefinition, PricingConfig
+from packaging_pricing.prepared import PreparedConfig
+from packaging_pricing.registry import build_pipeline, register_scrap_provider, resolve_pipeline
+from packaging_pricing.quantity_breaks import breakpoints, quantity_segments
+from packaging_pricing.scraps import TableBasedScrapProvider
+
+
+@pytest.fixture
+def prepared():
+    return PreparedConfig(PricingConfig(
+        material_price_bopp=186.0,
+        material_price_cpp=201.5,
+        box_cost=23.20,
+        feature_rates={"glue": 0.003, "dead_glue": 0.0207, "euroslot_pvd": 0.0137, "euroslot_bopp": 0.0012, "clips": 0.8}
+    ))
+
+
+ORDER = {"product_type": "CPP", "width": 30, "fold": 4, "length": 40, "flap": 3, "thickness": 30, "quantity": 75000,
+         "features": {"is_wicket": True, "glue_tape": True}}
+
+
+class TestQuantitySegments:
+    def test_tiers_are_contiguous(self):
+        segments = TableBasedScrapProvider().tier_segments(BagType.BOPP)
+        assert segments[0][0] == 1
+        assert segments[-1][1] is None
+        for (_, upper, _), (lower, _, _) in zip(segments, segments[1:]):
+            assert lower == upper + 1
+
+    def test_segments_match_single_quotes(self, prepared):
+        pipeline = build_pipeline(prepared.config)
+        segments = quantity_segments(prepared, OrderInput(**ORDER), pipeline)
+        # ступени 30000 и 50000 с одной нормой сливаются
+        assert [(s.min_quantity, s.max_quantity) for s in segments] == [
+            (1, 50000), (50001, 100000), (100001, 300000), (300001, None)
+        ]
+        for segment in segments:
+            for quantity in (segment.min_quantity, segment.max_quantity or 10 ** 7):
+                result = pipeline.calculate(OrderInput(**{**ORDER, "quantity": quantity}))
+                assert segment.unit_price == result.final_price
+                assert segment.variable_cost == result.variable_cost
+                assert segment.scrap_rate_percent == result.scrap_rate_percent
+        assert breakpoints(segments) == [50001, 100001, 300001]
+
+    def test_error_is_returned(self, prepared):
+        order = OrderInput(**{**ORDER, "features": {"euroslot": "metal"}})
+        outcome = quantity_segments(prepared, order, build_pipeline(prepared.config))
+        assert isinstance(outcome, CalculationError)
+        assert outcome.type == "unknown_euroslot"
+
+
+class FlatScrapProvider(TableBasedScrapProvider):
+    """Норма без ступеней по тиражу (как ML-провайдер)."""
+    def tier_segments(self, bag_type):
+        return None
+
+
+class TestEndpoint:
+    def test_provider_without_tiers_is_client_error(self, monkeypatch, prepared):
+        from fastapi.testclient import TestClient
+        import server
+        from packaging_pricing.config_source import ConfigStore
+
+        register_scrap_provider("flat", FlatScrapProvider, replace=True)
+        factory = resolve_pipeline(PipelineDefinition(scrap_provider="flat"))
+        monkeypatch.setattr(server, "config_store", ConfigStore(prepared.config, factory=factory))
+        response = TestClient(server.app).post("/api/quantity_breaks", json=ORDER)
+        assert response.status_code == 400
+        assert "ступени" in response.json()["detail"]
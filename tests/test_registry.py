@@ -0,0 +1,170 @@
+"""
+Реестр шагов и провайдеров брака: пайплайн по определению, ленивый импорт, entry points.
+Запуск: pytest tests/test_registry.py -v
+"""
+import sys
+from importlib.metadata import EntryPoint
+import pytest
+from packaging_pricing import registry
+from packaging_pricing.cache import LRUCache
+from packaging_pricing.models import OrderInput, PipelineDefinition, PricingConfig
+from packaging_pricing.prepared import PreparedConfig, order_columns
+from packaging_pricing.registry import Registry, build_pipeline, register_step, resolve_pipeline
+
+
+@pytest.fixture
+def config():
+    return PricingConfig(
+        material_price_bopp=186.0,
+        material_price_cpp=201.5,
+        box_cost=23.20,
+        feature_rates={"glue": 0.003, "dead_glue": 0.0207, "euroslot_pvd": 0.0137, "euroslot_bopp": 0.0012, "clips": 0.8},
+        roll_widths=[60, 80, 100],
+        roll_edge_trim=2
+    )
+
+
+ORDER = OrderInput(product_type="BOPP", width=22, fold=3, length=30, flap=4, thickness=25, quantity=50000)
+
+STEP_MODULE = '''
+from packaging_pricing.interfaces import CalculationStep
+
+class DiscountStep(CalculationStep):
+    requires = frozenset({'variable_cost'})
+
+    def __init__(self, factor=1.0):
+        self.factor = factor
+
+    def execute(self, context):
+        result = context.final_result
+        context.final_result = result.model_copy(update={'final_price': round(result.final_price * self.factor, 2)})
+'''
+
+
+@pytest.fixture
+def step_module(tmp_path, monkeypatch):
+    name = f"custom_steps_{tmp_path.name}"
+    (tmp_path / f"{name}.py").write_text(STEP_MODULE, encoding="utf-8")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield name
+    sys.modules.pop(name, None)
+
+
+class TestPipelineDefinition:
+    def test_default_matches_prepared(self, config):
+        pipeline = build_pipeline(config)
+        assert [type(step).__name__ for step in pipeline.steps] == [
+            "GeometryCalculationStep", "RollLayoutStep", "ScrapCalculationStep",
+            "LaborCostStep", "MaterialCostStep", "PricingStep"
+        ]
+        results = PreparedConfig(config).price_results(order_columns([ORDER]))
+        assert pipeline.calculate(ORDER).model_dump(exclude={"details"}) == {name: results[name][0] for name in results}
+
+    def test_resolved_once_and_resources(self, config):
+        factory = resolve_pipeline(PipelineDefinition())
+        assert resolve_pipeline(PipelineDefinition()) is factory
+        cache = LRUCache(maxsize=8)
+        pipeline = factory.build(config, resources={"scrap": {"cache": cache}, "missing": {"x": 1}})
+        scrap = pipeline.steps[factory.step_names.index("scrap")]
+        assert scrap.provider is factory.scrap_provider and scrap.cache is cache
+        assert factory.build(config).steps[2].provider is factory.scrap_provider
+
+    def test_unknown_names(self):
+        with pytest.raises(KeyError):
+            resolve_pipeline(PipelineDefinition(steps=["geometry", "nope"]))
+        with pytest.raises(KeyError):
+            resolve_pipeline(PipelineDefinition(scrap_provider="nope"))
+        with pytest.raises(ValueError):
+            resolve_pipeline(PipelineDefinition(step_options={"nope": {}}))
+
+
+    def test_standard_steps(self, step_module):
+        assert resolve_pipeline().standard_steps
+        assert resolve_pipeline(PipelineDefinition(scrap_provider="table")).standard_steps
+        assert not resolve_pipeline(PipelineDefinition(steps=["geometry", "scrap", "labor", "material", "pricing"])).standard_steps
+        name = f"discount_{step_module}"
+        register_step(name, f"{step_module}:DiscountStep", replace=True)
+        custom = PipelineDefinition(steps=[*PipelineDefinition().steps, name])
+        assert not resolve_pipeline(custom).standard_steps
+
+
+class TestLazyLoading:
+    def test_module_imported_only_when_used(self, config, step_module):
+        register_step(f"discount_{step_module}", f"{step_module}:DiscountStep")
+        assert step_module not in sys.modules
+        assert "ml" not in registry.scrap_providers.loaded()
+
+        name = f"discount_{step_module}"
+        definition = PipelineDefinition(
+            steps=["geometry", "roll_layout", "scrap", "labor", "material", "pricing", name],
+            step_options={name: {"factor": 0.5}}
+        )
+        price = build_pipeline(config, definition).calculate(ORDER).final_price
+        assert step_module in sys.modules
+        assert price == round(build_pipeline(config).calculate(ORDER).final_price * 0.5, 2)
+
+    def test_entry_points(self, monkeypatch, step_module):
+        entry_point = EntryPoint(name="discount", value=f"{step_module}:DiscountStep", group=registry.STEP_ENTRY_POINTS)
+        monkeypatch.setattr(registry, "entry_points", lambda group: [entry_point] if group == registry.STEP_ENTRY_POINTS else [])
+        steps = Registry("шаг", registry.STEP_ENTRY_POINTS)
+        steps.register("geometry", "packaging_pricing.steps:GeometryCalculationStep")
+        assert steps.names() == ["discount", "geometry"]
+        assert step_module not in sys.modules
+        assert steps.get("discount").__name__ == "DiscountStep"
+        assert steps.loaded() == ["discount"]
+        with pytest.raises(ValueError):
+            steps.register("geometry", "packaging_pricing.steps:PricingStep")
+
+    def test_ml_provider_old_import_path(self):
+        from packaging_pricing.ml_scraps import MLScrapRateProvider
+        from packaging_pricing.scraps import MLScrapRateProvider as legacy
+        assert legacy is MLScrapRateProvider
+        with pytest.raises(ImportError):
+            from packaging_pricing.scraps import NoSuchProvider  # noqa: F401
+
+
+class TestDeclaredPipeline:
+    """Пайплайн со своим шагом: пакеты считаются им построчно, а не таблицами PreparedConfig."""
+
+    @pytest.fixture
+    def factory(self, step_module):
+        name = f"discount_{step_module}"
+        register_step(name, f"{step_module}:DiscountStep", replace=True)
+        return resolve_pipeline(PipelineDefinition(
+            steps=[*PipelineDefinition().steps, name], step_options={name: {"factor": 0.5}}
+        ))
+
+    def test_batch_rows_match_pipeline(self, config, factory):
+        from packaging_pricing.batch import PipelineBatch, price_validated, validate_columns
+
+        pipeline = factory.build(config)
+        wide = ORDER.model_copy(update={"width": 200})
+        validation = validate_columns(order_columns([ORDER, wide, ORDER.model_copy(update={"quantity": 3000})]))
+        results = price_validated(PipelineBatch(pipeline), validation)
+        assert validation.valid.tolist() == [True, False, True]
+        assert [e["type"] for e in validation.errors] == [pipeline.try_run(wide).type]
+        for row, order in ((0, ORDER), (2, ORDER.model_copy(update={"quantity": 3000}))):
+            expected = pipeline.calculate(order).model_dump(exclude={"details"})
+            assert {name: results[name][row] for name in results} == expected
+
+    def test_endpoints_run_declared_pipeline(self, monkeypatch, config, factory):
+        from fastapi.testclient import TestClient
+        import server
+        from packaging_pricing.config_source import ConfigStore
+
+        monkeypatch.setattr(server, "pipeline_factory", factory)
+        monkeypatch.setattr(server, "config_store", ConfigStore(config, factory=factory))
+        monkeypatch.setattr(server, "result_cache", LRUCache(maxsize=16))
+        client = TestClient(server.app)
+        order = ORDER.model_dump(mode="json")
+        price = factory.build(config).calculate(ORDER).final_price
+        assert price == round(build_pipeline(config).calculate(ORDER).final_price * 0.5, 2)
+
+        assert client.post("/api/calculate", json=order).json()["final_price"] == price
+        batch = client.post("/api/batch/calculate", json={"rows": [order]}).json()
+        assert batch["columns"]["final_price"] == [price]
+        for path, params in (("/api/batch/calculate", {"engine": "fixed"}), ("/api/quantity_breaks", None)):
+            body = {"rows": [order]} if params else order
+            response = client.post(path, json=body, params=params)
+            assert response.status_code == 400
+            assert "standard pipeline steps" in response.json()["detail"]
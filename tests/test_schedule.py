@@ -0,0 +1,91 @@
+"""
+Версии конфига по датам действия: поиск версии на дату и пакетный расчет по группам версий.
+Запуск: pytest tests/test_schedule.py -v
+"""
+import random
+from datetime import date, timedelta
+import numpy as np
+import pytest
+from pydantic import ValidationError
+from packaging_pricing.batch import validate_columns, rows_to_columns, price_groups
+from packaging_pricing.models import EffectiveConfig, OrderInput, PricingConfig
+from packaging_pricing.schedule import ConfigSchedule
+
+
+def make_config(price):
+    return PricingConfig(material_price_bopp=price, material_price_cpp=price, box_cost=23.2)
+
+
+@pytest.fixture
+def schedule():
+    schedule = ConfigSchedule()
+    # Добавляем не по порядку: индекс сортируется сам
+    schedule.add(EffectiveConfig(valid_from=date(2026, 3, 1), config=make_config(210.0)))
+    schedule.add(EffectiveConfig(valid_from=date(2026, 1, 1), valid_to=date(2026, 1, 31), config=make_config(190.0)))
+    schedule.add(EffectiveConfig(valid_from=date(2026, 2, 1), valid_to=date(2026, 2, 14), config=make_config(200.0)))
+    return schedule
+
+
+class TestResolve:
+
+    @pytest.mark.parametrize("as_of, price", [
+        (date(2025, 12, 31), None),
+        (date(2026, 1, 1), 190.0),
+        (date(2026, 1, 31), 190.0),
+        (date(2026, 2, 1), 200.0),
+        (date(2026, 2, 14), 200.0),
+        (date(2026, 2, 20), None),
+        (date(2026, 3, 1), 210.0),
+        (date(2030, 1, 1), 210.0),
+    ])
+    def test_interval_bounds(self, schedule, as_of, price):
+        snapshot = schedule.resolve(as_of)
+        assert (snapshot.config.material_price_bopp if snapshot else None) == price
+
+    def test_versions_sorted(self, schedule):
+        assert [v.valid_from for v in schedule.versions] == [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)]
+
+    def test_overlap_rejected(self, schedule):
+        with pytest.raises(ValueError):
+            schedule.add(EffectiveConfig(valid_from=date(2026, 1, 20), valid_to=date(2026, 2, 3), config=make_config(1.0)))
+        with pytest.raises(ValueError):
+            schedule.add(EffectiveConfig(valid_from=date(2027, 1, 1), config=make_config(1.0)))
+        assert len(schedule.versions) == 3
+
+    def test_gap_can_be_filled(self, schedule):
+        schedule.add(EffectiveConfig(valid_from=date(2026, 2, 15), valid_to=date(2026, 2, 28), config=make_config(205.0)))
+        assert schedule.resolve(date(2026, 2, 20)).config.material_price_bopp == 205.0
+
+    def test_invalid_interval(self):
+        with pytest.raises(ValidationError):
+            EffectiveConfig(valid_from=date(2026, 2, 1), valid_to=date(2026, 1, 1), config=make_config(1.0))
+
+    def test_resolve_many_matches_resolve(self, schedule):
+        rng = random.Random(7)
+        days = [date(2025, 12, 1) + timedelta(days=rng.randrange(150)) for _ in range(500)]
+        index = schedule.resolve_many(np.array(days + [None], dtype='datetime64[D]'))
+        snapshots = schedule.snapshots
+        for day, idx in zip(days, index.tolist()):
+            assert (snapshots[idx] if idx >= 0 else None) is schedule.resolve(day)
+        assert index[-1] == -1
+
+    def test_remove(self, schedule):
+        assert schedule.remove(date(2026, 2, 1))
+        assert schedule.resolve(date(2026, 2, 5)) is None
+        assert not schedule.remove(date(2026, 2, 1))
+
+
+class TestPriceGroups:
+
+    def test_groups_priced_with_own_config(self, schedule):
+        rows = [{'product_type': 'BOPP', 'width': 10 + i, 'length': 25, 'thickness': 25, 'quantity': 30000}
+                for i in range(6)]
+        dates = np.array(['2026-01-10', '2026-03-05', '2026-02-02', '2026-01-11', '2026-03-06', '2026-02-03'],
+                         dtype='datetime64[D]')
+        version_index = schedule.resolve_many(dates)
+        groups = [(schedule.snapshots[idx].prepared, version_index == idx) for idx in np.unique(version_index)]
+        priced = price_groups(groups, validate_columns(rows_to_columns(rows)))
+
+        for i, day in enumerate(dates.tolist()):
+            expected = schedule.resolve(day).pipeline.calculate(OrderInput(**rows[i]))
+            assert priced['final_price'][i] == expected.final_price
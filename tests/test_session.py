@@ -0,0 +1,92 @@
+"""
+Тесты инкрементального пересчета в сессии заказа.
+Запуск: pytest tests/test_session.py -v
+"""
+import pytest
+from packaging_pricing.errors import CalculationFailed
+from packaging_pricing.models import OrderInput, PricingConfig
+from packaging_pricing.pipeline import PricingPipeline
+from packaging_pricing.scraps import TableBasedScrapProvider
+from packaging_pricing.session import QuoteSession
+from packaging_pricing.steps import (
+    GeometryCalculationStep,
+    ScrapCalculationStep,
+    LaborCostStep,
+    MaterialCostStep,
+    PricingStep
+)
+
+
+@pytest.fixture
+def pipeline():
+    config = PricingConfig(
+        material_price_bopp=186.0,
+        material_price_cpp=190.0,
+        box_cost=23.20,
+        feature_rates={"glue": 0.003, "dead_glue": 0.0207, "euroslot_pvd": 0.0137, "euroslot_bopp": 0.0012, "clips": 0.8}
+    )
+    steps = [
+        GeometryCalculationStep(),
+        ScrapCalculationStep(provider=TableBasedScrapProvider()),
+        LaborCostStep(),
+        MaterialCostStep(),
+        PricingStep()
+    ]
+    return PricingPipeline(steps=steps, config=config)
+
+
+DRAFT = {"product_type": "BOPP", "width": 10, "length": 25, "flap": 3, "thickness": 25, "quantity": 30000}
+
+
+class TestQuoteSession:
+
+    def test_first_update_runs_all_steps(self, pipeline):
+        session = QuoteSession(pipeline)
+        session.apply(DRAFT)
+        assert len(session.last_executed) == len(pipeline.steps)
+
+    @pytest.mark.parametrize("delta,expected_steps", [
+        ({"quantity": 200000}, ["ScrapCalculationStep", "MaterialCostStep", "PricingStep"]),
+        ({"thickness": 30}, ["GeometryCalculationStep", "MaterialCostStep", "PricingStep"]),
+        ({"features": {"is_wicket": True}}, ["LaborCostStep", "MaterialCostStep", "PricingStep"]),
+        ({"print_scheme": "1+0"}, []),
+    ])
+    def test_delta_reruns_only_affected_steps(self, pipeline, delta, expected_steps):
+        session = QuoteSession(pipeline)
+        session.apply(DRAFT)
+        result = session.apply(delta)
+
+        assert session.last_executed == expected_steps
+        full = pipeline.calculate(OrderInput(**session.draft))
+        assert result == full
+
+    def test_features_are_merged(self, pipeline):
+        session = QuoteSession(pipeline)
+        session.apply({**DRAFT, "features": {"glue_tape": True}})
+        session.apply({"features": {"euroslot": "pvd"}})
+        assert session.order.features.glue_tape
+        assert session.order.features.euroslot == "pvd"
+
+    def test_session_recovers_after_error(self, pipeline):
+        session = QuoteSession(pipeline)
+        session.apply(DRAFT)
+        with pytest.raises(CalculationFailed) as exc:
+            session.apply({"features": {"euroslot": "metal"}})
+        assert exc.value.error.type == "unknown_euroslot"
+
+        result = session.apply({"features": {"euroslot": "pvd"}})
+        assert result == pipeline.calculate(OrderInput(**session.draft))
+
+
+class TestQuoteSocket:
+    def test_malformed_messages_keep_socket_open(self):
+        from fastapi.testclient import TestClient
+        import server
+
+        with TestClient(server.app).websocket_connect("/ws/quote") as ws:
+            for send in (lambda: ws.send_json([1]), lambda: ws.send_json({"features": 1}),
+                         lambda: ws.send_text("{")):
+                send()
+                assert ws.receive_json()["error"][0]["type"] in ("model_type", "json_invalid")
+            ws.send_json({**DRAFT, "features": {"glue_tape": True}})
+            assert ws.receive_json()["result"]["options_cost"] > 0
@@ -0,0 +1,107 @@
+"""
+Монте-Карло риска маржи: вырожденные распределения, блоки, портфель, ошибки параметров.
+Запуск: pytest tests/test_simulation.py -v
+"""
+import numpy as np
+import pytest
+from pydantic import ValidationError
+from packaging_pricing.models import OrderInput, PricingConfig
+from packaging_pricing.prepared import PreparedConfig, order_columns
+from packaging_pricing.registry import build_pipeline
+from packaging_pricing.simulation import Distribution, RiskScenario, scenario_errors, simulate_risk, _sorted_percentiles
+
+
+@pytest.fixture
+def config():
+    return PricingConfig(
+        material_price_bopp=186.0,
+        material_price_cpp=201.5,
+        box_cost=23.20,
+        feature_rates={"glue": 0.003, "dead_glue": 0.0207, "euroslot_pvd": 0.0137, "euroslot_bopp": 0.0012, "clips": 0.8},
+        roll_widths=[60, 80, 100],
+        roll_edge_trim=2
+    )
+
+
+ORDERS = [
+    OrderInput(product_type="BOPP", width=22, fold=3, length=30, flap=4, thickness=25, quantity=50000),
+    OrderInput(product_type="CPP", width=30, fold=4, length=40, flap=3, thickness=30, quantity=120000,
+               features={"is_wicket": True, "glue_tape": True}),
+    OrderInput(product_type="BOPP", width=15, length=20, thickness=35, quantity=8000),
+]
+
+
+def run(config, scenario, chunk_cells=1_000_000):
+    columns = order_columns(ORDERS)
+    return simulate_risk(PreparedConfig(config), columns, columns['quantity'], scenario, chunk_cells=chunk_cells)
+
+
+class TestSimulateRisk:
+    def test_fixed_inputs_reproduce_quote(self, config):
+        report = run(config, RiskScenario(draws=100))
+        pipeline = build_pipeline(config)
+        for order, result in zip(ORDERS, report['orders']):
+            expected = pipeline.calculate(order)
+            assert result['quoted_price'] == expected.final_price
+            assert all(v == pytest.approx(expected.final_price, abs=0.005) for v in result['unit_price'].values())
+            assert all(v == pytest.approx(result['base_margin'], abs=1e-4) for v in result['margin'].values())
+            assert result['loss_probability'] == 0.0
+        assert report['book']['margin']['p50'] == pytest.approx(report['book']['base_margin'], abs=0.01)
+
+    def test_chunking_does_not_change_result(self, config):
+        scenario = RiskScenario(
+            material_price_bopp=Distribution(kind="lognormal", std=25),
+            material_price_cpp=Distribution(kind="normal", std=30),
+            scrap_return_price=Distribution(kind="uniform", low=5, high=15),
+            scrap_rate_factor=Distribution(kind="triangular", low=0.8, mode=1, high=1.5),
+            draws=2000,
+            seed=7
+        )
+        assert run(config, scenario, chunk_cells=2000) == run(config, scenario)
+
+    def test_resin_price_rise_erodes_margin(self, config):
+        scenario = RiskScenario(material_price_bopp=Distribution(kind="uniform", low=186, high=1000), draws=5000, seed=1)
+        report = run(config, scenario)
+        bopp = report['orders'][0]
+        assert bopp['margin']['p5'] < bopp['margin']['p50'] < bopp['base_margin']
+        assert bopp['unit_price']['p95'] > bopp['quoted_price']
+        assert 0 < bopp['loss_probability'] < 1
+        # CPP-заказ от цены BOPP не зависит
+        assert report['orders'][1]['loss_probability'] == 0.0
+        assert report['book']['margin']['p95'] <= report['book']['base_margin']
+
+    def test_sorted_percentiles_match_numpy(self):
+        values = np.sort(np.random.default_rng(0).normal(size=(3, 1001)), axis=1)
+        q = np.array([0, 5, 33.3, 50, 100])
+        assert np.allclose(_sorted_percentiles(values, q), np.percentile(values, q, axis=1).T)
+
+    def test_invalid_distribution(self):
+        with pytest.raises(ValidationError):
+            Distribution(kind="triangular", low=1, mode=3, high=2)
+        with pytest.raises(ValidationError):
+            RiskScenario(percentiles=[5, 120])
+
+    def test_lognormal_needs_positive_config_value(self, config):
+        config = config.model_copy(update={"scrap_return_price": 0.0})
+        scenario = RiskScenario(scrap_return_price=Distribution(kind="lognormal", std=2), draws=100)
+        errors = scenario_errors(scenario, config)
+        assert [(e.type, e.loc) for e in errors] == [("value_error", ("scrap_return_price", "mean"))]
+        with pytest.raises(ValueError):
+            run(config, scenario)
+        assert scenario_errors(RiskScenario(scrap_return_price=Distribution(kind="lognormal", mean=5, std=2)), config) == []
+
+
+class TestEndpoint:
+    def test_lognormal_with_zero_config_value_is_422(self, monkeypatch, config):
+        from fastapi.testclient import TestClient
+        import server
+        from packaging_pricing.config_source import ConfigStore
+
+        monkeypatch.setattr(server, "config_store", ConfigStore(config.model_copy(update={"scrap_return_price": 0.0})))
+        response = TestClient(server.app).post("/api/simulate_risk", json={
+            "orders": [ORDERS[0].model_dump(mode="json")],
+            "scrap_return_price": {"kind": "lognormal", "std": 2},
+            "draws": 100
+        })
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["loc"] == ["body", "scrap_return_price", "mean"]
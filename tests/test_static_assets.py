@@ -0,0 +1,94 @@
+"""
+Статика web-интерфейса: имена с хэшем, сжатые варианты, Cache-Control, сжатие ответов API.
+Запуск: pytest tests/test_static_assets.py -v
+"""
+import gzip
+import json
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Mount, Route
+from starlette.testclient import TestClient
+from packaging_pricing.static_assets import (
+    IMMUTABLE_CACHE_CONTROL, AssetStaticFiles, ResponseCompressionMiddleware, accepted_encodings, build_assets
+)
+
+SCRIPT = "console.log('x');\n" * 200
+STYLE = "body { color: red; }\n" * 100
+
+
+@pytest.fixture
+def built(tmp_path):
+    source = tmp_path / "static"
+    (source / "img").mkdir(parents=True)
+    (source / "index.html").write_text(
+        '<link rel="stylesheet" href="style.css?v=2"><script src="script.js"></script>'
+        '<img src="img/logo.svg"><a href="https://example.com/x.js">x</a>' + "<p>text</p>" * 200,
+        encoding="utf-8"
+    )
+    (source / "script.js").write_text(SCRIPT, encoding="utf-8")
+    (source / "style.css").write_text(STYLE, encoding="utf-8")
+    (source / "img" / "logo.svg").write_text("<svg/>", encoding="utf-8")
+    target = tmp_path / "build"
+    manifest = build_assets(str(source), str(target))
+    return target, manifest
+
+
+def make_client(directory):
+    async def big(request):
+        return JSONResponse({"rows": list(range(2000))})
+
+    async def workbook(request):
+        return Response(b"PK" + b"\0" * 5000, media_type="application/octet-stream")
+
+    app = Starlette(routes=[
+        Route("/api/big", big), Route("/api/file", workbook),
+        Mount("/ui", AssetStaticFiles(directory=str(directory), html=True)),
+    ])
+    app.add_middleware(ResponseCompressionMiddleware, minimum_size=1024)
+    return TestClient(app)
+
+
+class TestBuildAssets:
+    def test_hashed_names_and_links(self, built):
+        target, manifest = built
+        assert set(manifest) == {"script.js", "style.css", "img/logo.svg"}
+        assert manifest == json.loads((target / "manifest.json").read_text(encoding="utf-8"))
+        html = (target / "index.html").read_text(encoding="utf-8")
+        for name in manifest.values():
+            assert f'"{name}"' in html
+        assert "https://example.com/x.js" in html and "?v=2" not in html
+
+    def test_precompressed_variants(self, built):
+        target, manifest = built
+        script = target / manifest["script.js"]
+        assert gzip.decompress((target / f"{manifest['script.js']}.gz").read_bytes()) == script.read_bytes()
+        assert not (target / f"{manifest['img/logo.svg']}.gz").exists()  # слишком мал
+
+    def test_accepted_encodings(self):
+        assert accepted_encodings("gzip, deflate, br;q=0") == {"gzip", "deflate"}
+
+
+class TestServing:
+    def test_static_headers(self, built):
+        target, manifest = built
+        client = make_client(target)
+        response = client.get(f"/ui/{manifest['script.js']}", headers={"accept-encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert response.text == SCRIPT
+        assert client.get(f"/ui/{manifest['script.js']}", headers={
+            "accept-encoding": "gzip", "if-none-match": response.headers["etag"]
+        }).status_code == 304
+
+        page = client.get("/ui/", headers={"accept-encoding": "identity"})
+        assert "content-encoding" not in page.headers
+        assert page.headers["cache-control"] == "no-cache"
+
+    def test_api_compression_by_type(self, built):
+        client = make_client(built[0])
+        response = client.get("/api/big", headers={"accept-encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.json()["rows"][-1] == 1999
+        assert "content-encoding" not in client.get("/api/file", headers={"accept-encoding": "gzip"}).headers
+        assert "content-encoding" not in client.get("/api/big", headers={"accept-encoding": "identity"}).headers
@@ -0,0 +1,158 @@
+"""
+Тесты трассировки: вложенность спанов, traceparent, спаны шагов пайплайна
+(в том числе под спаном HTTP-запроса).
+Запуск: pytest tests/test_tracing.py -v
+"""
+import json
+import pytest
+from packaging_pricing.cache import LRUCache
+from packaging_pricing.models import OrderInput, PricingConfig, BagType
+from packaging_pricing.pipeline import PricingPipeline
+from packaging_pricing.scraps import TableBasedScrapProvider
+from packaging_pricing.steps import (
+    GeometryCalculationStep,
+    ScrapCalculationStep,
+    LaborCostStep,
+    MaterialCostStep,
+    PricingStep
+)
+from packaging_pricing.tracing import (
+    Tracer, InMemorySpanExporter, JsonLinesSpanExporter,
+    tracer, extract, inject, remote_parent, STATUS_ERROR
+)
+
+
+@pytest.fixture
+def exporter():
+    """Подключает экспортер к глобальному трассировщику пакета на время теста."""
+    exporter = InMemorySpanExporter()
+    saved = tracer.exporters
+    tracer.exporters = [exporter]
+    yield exporter
+    tracer.exporters = saved
+
+
+class TestSpans:
+
+    def test_children_share_trace_and_parent(self):
+        exporter = InMemorySpanExporter()
+        local = Tracer([exporter])
+        with local.start_as_current_span("root") as root:
+            with local.start_as_current_span("child", {"k": 1}):
+                pass
+
+        child, finished_root = exporter.get_finished_spans()
+        assert finished_root is root
+        assert child.context.trace_id == root.context.trace_id
+        assert child.parent_id == root.context.span_id
+        assert child.attributes == {"k": 1}
+        assert root.parent_id is None
+
+    def test_exception_marks_span(self):
+        exporter = InMemorySpanExporter()
+        local = Tracer([exporter])
+        with pytest.raises(ValueError):
+            with local.start_as_current_span("boom"):
+                raise ValueError("bad")
+
+        span, = exporter.get_finished_spans()
+        assert span.status == STATUS_ERROR
+        assert span.events[0]["attributes"]["exception.type"] == "ValueError"
+
+    def test_disabled_tracer_records_nothing(self):
+        local = Tracer()
+        with local.start_as_current_span("noop") as span:
+            span.set_attribute("k", 1)
+        assert not span.is_recording()
+
+    def test_file_exporter_writes_json_lines(self, tmp_path):
+        path = tmp_path / "spans.jsonl"
+        local = Tracer([JsonLinesSpanExporter(str(path))])
+        with local.start_as_current_span("a"):
+            pass
+        with local.start_as_current_span("b"):
+            pass
+        names = [json.loads(line)["name"] for line in path.read_text(encoding="utf-8").splitlines()]
+        assert names == ["a", "b"]
+
+
+class TestPropagation:
+
+    def test_extract_and_inject(self):
+        incoming = {"traceparent": "00-" + "ab" * 16 + "-" + "cd" * 8 + "-01"}
+        exporter = InMemorySpanExporter()
+        local = Tracer([exporter])
+        outgoing = {}
+        with remote_parent(extract(incoming)):
+            with local.start_as_current_span("request"):
+                inject(outgoing)
+
+        span, = exporter.get_finished_spans()
+        assert span.context.trace_id == "ab" * 16
+        assert span.parent_id == "cd" * 8
+        assert outgoing["traceparent"] == f"00-{'ab' * 16}-{span.context.span_id}-01"
+
+    @pytest.mark.parametrize("value", [
+        "", "garbage", "00-" + "0" * 32 + "-" + "cd" * 8 + "-01", "00-" + "ab" * 16 + "-" + "cd" * 7 + "-01",
+    ])
+    def test_invalid_header_ignored(self, value):
+        assert extract({"traceparent": value}) is None
+
+
+class TestPipelineSpans:
+
+    def test_step_spans_nested_under_calculate(self, exporter):
+        config = PricingConfig(material_price_bopp=186.0, material_price_cpp=186.0, box_cost=23.2)
+        pipeline = PricingPipeline(steps=[
+            GeometryCalculationStep(),
+            ScrapCalculationStep(provider=TableBasedScrapProvider()),
+            LaborCostStep(),
+            MaterialCostStep(),
+            PricingStep()
+        ], config=config)
+        pipeline.calculate(OrderInput(product_type=BagType.BOPP, width=10, length=25, thickness=25, quantity=30000))
+
+        spans = exporter.get_finished_spans()
+        root = spans[-1]
+        assert root.name == "PricingPipeline.calculate"
+        assert [s.name for s in spans[:-1]] == [
+            "GeometryCalculationStep", "ScrapCalculationStep", "LaborCostStep", "MaterialCostStep", "PricingStep"
+        ]
+        assert all(s.parent_id == root.context.span_id for s in spans[:-1])
+
+
+class TestHttpSpans:
+
+    def test_step_spans_under_request_span(self, monkeypatch):
+        from fastapi.testclient import TestClient
+        import server
+        from packaging_pricing.config_source import ConfigStore
+
+        monkeypatch.setattr(server, "config_store", ConfigStore(PricingConfig(
+            material_price_bopp=186.0, material_price_cpp=186.0, box_cost=23.2
+        )))
+        monkeypatch.setattr(server, "result_cache", LRUCache(maxsize=16))
+        client = TestClient(server.app)
+        trace_id, caller_span = "5e" * 16, "7a" * 8
+        order = {"product_type": "BOPP", "width": 10, "length": 25, "thickness": 25, "quantity": 30000}
+        response = client.post("/api/calculate", json=order, headers={"traceparent": f"00-{trace_id}-{caller_span}-01"})
+        assert response.status_code == 200
+
+        spans = client.get(f"/api/traces/{trace_id}").json()
+        by_id = {span["span_id"]: span for span in spans}
+        request_span = next(span for span in spans if span["name"] == "POST /api/calculate")
+        assert request_span["parent_span_id"] == caller_span
+
+        def ancestors(span):
+            while span["parent_span_id"] in by_id:
+                span = by_id[span["parent_span_id"]]
+                yield span["span_id"]
+
+        steps = [span for span in spans if span["name"].endswith("Step")]
+        assert [span["name"] for span in steps] == [
+            "GeometryCalculationStep", "RollLayoutStep", "ScrapCalculationStep",
+            "LaborCostStep", "MaterialCostStep", "PricingStep"
+        ]
+        for span in steps:
+            assert by_id[span["parent_span_id"]]["name"] == "PricingPipeline.calculate"
+            assert request_span["span_id"] in ancestors(span)
@@ -0,0 +1,31 @@
+"""
+Прогрев перед приемом трафика: порядок фаз, готовность, ошибки фаз.
+Запуск: pytest tests/test_warmup.py -v
+"""
+from packaging_pricing.warmup import WarmUp
+
+
+class TestWarmUp:
+    def test_ready_after_all_phases(self):
+        calls = []
+        warmup = WarmUp([("first", lambda: calls.append(1)), ("second", lambda: calls.append(2))])
+        assert not warmup.ready
+        warmup.start()
+        assert warmup.wait(5)
+        assert calls == [1, 2]
+        status = warmup.status()
+        assert status["ready"] and list(status["phases_ms"]) == ["first", "second"] and status["errors"] == {}
+
+    def test_failed_phase_does_not_block(self):
+        def broken():
+            raise RuntimeError("no openpyxl")
+        calls = []
+        warmup = WarmUp([("export", broken), ("pricing", lambda: calls.append(1))])
+        warmup.run()
+        assert warmup.ready and calls == [1]
+        assert warmup.status()["errors"] == {"export": "RuntimeError: no openpyxl"}
+
+    def test_no_phases(self):
+        warmup = WarmUp([])
+        warmup.run()
+        assert warmup.ready